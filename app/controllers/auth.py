@@ -1,9 +1,12 @@
 from fastapi import HTTPException
 
+from sqlalchemy import select
 from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from database.Identity import Identity
 from datetime import date
 from database.db_connector import DBConnector
+from utils.concurrency_util import ConcurrencyUtils
 from passlib.hash import pbkdf2_sha256
 from datetime import datetime
 import jwt
@@ -12,16 +15,14 @@ import os
 
 load_dotenv()
 
-def register_identity(data, session: Session):
+def new_identity(data, hashed_password: str) -> Identity:
     username = data['username']
     email = data['email']
-    password = data['password']
-    hashed_password = pbkdf2_sha256.hash(password)
     status = True
     created_at = datetime.now()
     updated_at = datetime.now()
 
-    identity = Identity(
+    return Identity(
             username=username,
             email=email,
             password=hashed_password,
@@ -29,20 +30,42 @@ def register_identity(data, session: Session):
             created_at=created_at,
             updated_at=updated_at
         )
+
+
+def register_identity(data, session: Session):
+    identity = new_identity(data, pbkdf2_sha256.hash(data['password']))
     session.add(identity);
     session.commit();
 
 
+async def aregister_identity(data, session: AsyncSession):
+    # pbkdf2 is deliberately slow, keep it off the event loop
+    hashed_password = await ConcurrencyUtils.run_blocking(pbkdf2_sha256.hash, data['password'])
+    session.add(new_identity(data, hashed_password))
+    await session.commit()
+
+
 def login_identity(data, session: Session):
     email = data['email']
     password = data['password']
-    hashed_password = pbkdf2_sha256.hash(password)
     user = session.query(Identity).filter(Identity.email == email).first()
     if not user:
         raise HTTPException(status_code=401, detail="Invalid email")
     if not pbkdf2_sha256.verify(password, user.password):
          raise HTTPException(status_code=401, detail="Invalid password")
     return {"message": "Login successful", "token": create_access_token(user)}
+
+
+async def alogin_identity(data, session: AsyncSession):
+    email = data['email']
+    password = data['password']
+    result = await session.execute(select(Identity).where(Identity.email == email).limit(1))
+    user = result.scalars().first()
+    if not user:
+        raise HTTPException(status_code=401, detail="Invalid email")
+    if not await ConcurrencyUtils.run_blocking(pbkdf2_sha256.verify, password, user.password):
+         raise HTTPException(status_code=401, detail="Invalid password")
+    return {"message": "Login successful", "token": create_access_token(user)}
         
 
 def create_access_token(identity: Identity):
@@ -1,12 +1,11 @@
 import ast
+from fastapi import HTTPException
 from fastapi.responses import StreamingResponse
 from models.chat import GenerativeModel
 from schemas.chat import Message
 from utils.platform_util import PlatformUtils
+from utils.metrics_util import MetricsUtils
 
-from langchain.callbacks import AsyncIteratorCallbackHandler
-from typing import Any
-from langchain.schema import LLMResult
 
 
 import json
@@ -37,19 +36,19 @@ class ChatController:
         self.model = GenerativeModel()
 
 
-    def start_chat(self, data):
+    async def start_chat(self, data):
         model = data.get("model")
         messages = data.get("messages")
         temperature = data.get("temperature")
         top_p = data.get("top_p")
         top_k = data.get("top_k")
         print("controller ")
-        response = self.model.start_chat(model, messages, temperature, top_p, top_k)
+        response = await self.model.start_chat(model, messages, temperature, top_p, top_k)
         return response
     
 
 
-    def start_custom_chat(self, data):
+    async def start_custom_chat(self, data):
         model = data.get("model")
         messages = data.get("messages")
         temperature = data.get("temperature")
@@ -57,14 +56,15 @@ class ChatController:
         top_k = data.get("top_k")
         uuid = data.get("uuid")
         # try:
-        response, platform, model_code = self.model.start_custom_chat(model, messages, temperature, top_p, top_k, uuid)
-        formatted_response = self.standardize_response(model_code, platform, response)
+        response, platform, model_code, usage = await self.model.start_custom_chat(model, messages, temperature, top_p, top_k, uuid)
+        formatted_response = self.standardize_response(model_code, platform, response, usage)
+        MetricsUtils.record(uuid, model_code, usage)
         # except Exception as e:
         #     return {"error": str(e)}
         return formatted_response
     
 
-    def start_chat_with_tool(self, data):
+    async def start_chat_with_tool(self, data):
         model = data.get("model")
         messages = data.get("messages")
         temperature = data.get("temperature")
@@ -73,8 +73,9 @@ class ChatController:
         # uuid = data.get("uuid")
         uuid = "12345678111"
         # try:
-        response, platform, model_code = self.model.start_chat_with_tool(model, messages, temperature, top_p, top_k, uuid)
-        formatted_response = self.standardize_response(model_code, platform, response)
+        response, platform, model_code, usage = await self.model.start_chat_with_tool(model, messages, temperature, top_p, top_k, uuid)
+        formatted_response = self.standardize_response(model_code, platform, response, usage)
+        MetricsUtils.record(uuid, model_code, usage)
         print("==============================")
         print(formatted_response)
         print("==============================")
@@ -84,7 +85,7 @@ class ChatController:
         return formatted_response
     
 
-    def start_chat_with_doc(self, data):
+    async def start_chat_with_doc(self, data):
         try:
             model = data.get("model")
             messages = data.get("messages")
@@ -94,102 +95,48 @@ class ChatController:
             # uuid = data.get("uuid")
             uuid = "12345678111"
             # try:
-            response, platform, model_code = self.model.start_chat_with_doc(model, messages, temperature, top_p, top_k, uuid)
+            response, platform, model_code, usage = await self.model.start_chat_with_doc(model, messages, temperature, top_p, top_k, uuid)
             print("################################")
-            print(response.content)
-            formatted_response = self.standardize_response(model_code, platform, response)
+            print(self.get_response_content(response))
+            formatted_response = self.standardize_response(model_code, platform, response, usage)
+            MetricsUtils.record(uuid, model_code, usage)
 
+        except HTTPException:
+            raise
         except Exception as e:
             return {"error": str(e)}
         return formatted_response
     
 
-    def standardize_response(self, model_code, platform, response):
-        if platform == "groq_platform":
-            standardized_response = {
-                "content": response.content,
-                "response_metadata": {
-                    "token_usage": {
-                        "completion_tokens": 0,
-                        "prompt_tokens": 0,
-                        "total_tokens": 0
-                    },
-                    "model_name": model_code,
-                }
+    def standardize_response(self, model_code, platform, response, usage=None):
+        standardized_response = {
+            "content": self.get_response_content(response),
+            "response_metadata": {
+                "token_usage": {
+                    "completion_tokens": (usage or {}).get("completion_tokens", 0),
+                    "prompt_tokens": (usage or {}).get("prompt_tokens", 0),
+                    "total_tokens": (usage or {}).get("total_tokens", 0)
+                },
+                "model_name": model_code,
             }
-            return standardized_response
-        elif platform == "deepinfra_platform":
-                standardized_response = {
-                    "content": response,
-                    "response_metadata": {
-                        "token_usage": {
-                            "completion_tokens": 0,
-                            "prompt_tokens": 0,
-                            "total_tokens": 0
-                        },
-                        "model_name": model_code,
-                    }
-                }
-                return standardized_response
-        elif platform == "anthropic_platform":
-                standardized_response = {
-                    "content": response,
-                    "response_metadata": {
-                        "token_usage": {
-                            "completion_tokens": 0,
-                            "prompt_tokens": 0,
-                            "total_tokens": 0
-                        },
-                        "model_name": model_code,
-                    }
-                }
-                return standardized_response
-        elif platform == "openai_platform":
-                standardized_response = {
-                    "content": response.content,
-                    "response_metadata": {
-                        "token_usage": {
-                            "completion_tokens": 0,
-                            "prompt_tokens": 0,
-                            "total_tokens": 0
-                        },
-                        "model_name": model_code,
-                    }
-                }
-                return standardized_response
-        elif platform == "gemini_platform":
-            standardized_response = {
-                "content": response.content,
-                "response_metadata": {
-                    "token_usage": {
-                        "completion_tokens": 0,
-                        "prompt_tokens": 0,
-                        "total_tokens": 0
-                    },
-                    "model_name": model_code,
-                }
-            }
-            return standardized_response
-        elif platform == "ollama_platform":
-            standardized_response = {
-                "content": response,
-                "response_metadata": {
-                    "token_usage": {
-                        "completion_tokens": 0,
-                        "prompt_tokens": 0,
-                        "total_tokens": 0
-                    },
-                    "model_name": model_code,
-                }
-                    
-            }
-            return standardized_response
-        else:
-            response = response['response']
+        }
+        return standardized_response
+
+    @staticmethod
+    def get_response_content(response):
+        # chat models return a message, plain LLMs and chains a string, agents a dict
+        if hasattr(response, "content"):
+            return response.content
+        if isinstance(response, dict) and "output" in response:
+            return response["output"]
+        return response
 
 
     def get_llm_platforms(self):
         return self.platform_util.get_llm_platforms()
+
+    def get_llm_platforms_json(self):
+        return self.platform_util.get_llm_platforms_json()
     
 
     async def stream_chat(self, data):
@@ -202,7 +149,7 @@ class ChatController:
         messages = messages_data
         
         try:
-            generator = self.model.start_chat_stream(model, messages, temperature, top_p, top_k)
+            generator = await self.model.start_chat_stream(model, messages, temperature, top_p, top_k)
         except Exception as e:
             raise Exception(f"Error in starting chat stream: {e}")
         
@@ -236,9 +183,8 @@ class ChatController:
         top_k = data.get("top_k")
         
         messages = messages_data
-        callback_handler = AsyncCallbackHandler()
         try:
-            generator = self.model.start_chat_stream_memory_es(model, messages, temperature, top_p, top_k, callback_handler)
+            generator = await self.model.start_chat_stream_memory_es(model, messages, temperature, top_p, top_k)
         except Exception as e:
             raise Exception(f"Error in starting chat stream: {e}")
         
@@ -432,28 +378,3 @@ class ChatController:
         except Exception as e:
             raise Exception(f"Error : {e}")
         return result
-    
-
-
-class AsyncCallbackHandler(AsyncIteratorCallbackHandler):
-    content: str = ""
-    final_answer: bool = False
-
-    async def on_llm_new_token(self, token: str, **kwargs: Any) -> None:
-        self.content += token
-        print("Token: " + token)
-        if self.final_answer:
-            if '"action_input": "' in self.content:
-                if token not in ['"', "}"]:
-                    await self.queue.put(token)
-        elif "Final Answer" in self.content:
-            self.final_answer = True
-            self.content = ""
-
-    async def on_llm_end(self, response: LLMResult, **kwargs: Any) -> None:
-        if self.final_answer:
-            self.content = ""
-            self.final_answer = False
-            await self.queue.put(None)  # Signal the end of the stream
-        else:
-            self.content = ""
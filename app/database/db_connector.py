@@ -3,26 +3,126 @@ from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker, Session
 from dotenv import load_dotenv
 import os
+import threading
 
 load_dotenv()
 
 class DBConnector:
+    """
+    Builds the SQLAlchemy engine once per process and hands out request-scoped sessions.
 
-    @staticmethod
-    def init_engine():
+    The sync engine is always available; with DB_ASYNC=true an async engine
+    (DB_ASYNC_DRIVER, e.g. postgresql+asyncpg) is built next to it and the
+    auth routes use AsyncSession instead.
+    """
+
+    use_async = os.getenv("DB_ASYNC", "false").lower() == "true"
 
+    _lock = threading.Lock()
+    _engine = None
+    _session_factory = None
+    _async_engine = None
+    _async_session_factory = None
+
+    @staticmethod
+    def database_url(driver: str = None) -> str:
         # Fetching the environment variables for database connection
-        DB_CONNECTION = os.getenv("DB_CONNECTION", "postgresql")
+        DB_CONNECTION = driver or os.getenv("DB_CONNECTION", "postgresql")
         DB_HOST = os.getenv("DB_HOST", "127.0.0.1")
         DB_PORT = os.getenv("DB_PORT", "5432")
         DB_DATABASE = os.getenv("DB_DATABASE", "dev_llm_bot")
         DB_USERNAME = os.getenv("DB_USERNAME", "username")
         DB_PASSWORD = os.getenv("DB_PASSWORD", "")
 
+        # SQLite (e.g. as a local stand-in) is a file path, no server or credentials
+        if DB_CONNECTION.startswith("sqlite"):
+            return f"{DB_CONNECTION}:///{DB_DATABASE}"
+
         if not DB_PASSWORD:
             raise ValueError("No database password provided in environment variables.")
 
-        SQLALCHEMY_DATABASE_URL = f"{DB_CONNECTION}://{DB_USERNAME}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_DATABASE}"
+        return f"{DB_CONNECTION}://{DB_USERNAME}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_DATABASE}"
+
+    @staticmethod
+    def engine_options(url: str) -> dict:
+        options = {
+            # set DB_ECHO=true to see SQL logs during development
+            "echo": os.getenv("DB_ECHO", "false").lower() == "true",
+            "pool_pre_ping": True,
+            "pool_recycle": int(os.getenv("DB_POOL_RECYCLE", "1800")),
+        }
+        if url.startswith("sqlite"):
+            # sessions are handed between the event loop and worker threads
+            options["connect_args"] = {"check_same_thread": False}
+        else:
+            options.update(
+                pool_size=int(os.getenv("DB_POOL_SIZE", "10")),
+                max_overflow=int(os.getenv("DB_MAX_OVERFLOW", "20")),
+                pool_timeout=float(os.getenv("DB_POOL_TIMEOUT", "30")),
+            )
+        return options
+
+    @staticmethod
+    def init_engine():
+        """Create a new engine; the app shares the one from get_engine instead."""
+        url = DBConnector.database_url()
+        return create_engine(url, **DBConnector.engine_options(url))
+
+    @classmethod
+    def get_engine(cls):
+        if cls._engine is None:
+            with cls._lock:
+                if cls._engine is None:
+                    cls._engine = cls.init_engine()
+                    cls._session_factory = sessionmaker(bind=cls._engine, expire_on_commit=False)
+        return cls._engine
+
+    @classmethod
+    def get_async_engine(cls):
+        from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+
+        if cls._async_engine is None:
+            with cls._lock:
+                if cls._async_engine is None:
+                    url = cls.database_url(os.getenv("DB_ASYNC_DRIVER", "postgresql+asyncpg"))
+                    options = cls.engine_options(url)
+                    options.pop("connect_args", None)
+                    cls._async_engine = create_async_engine(url, **options)
+                    cls._async_session_factory = async_sessionmaker(bind=cls._async_engine, expire_on_commit=False)
+        return cls._async_engine
+
+    @classmethod
+    def startup(cls):
+        cls.get_engine()
+        if cls.use_async:
+            cls.get_async_engine()
+
+    @classmethod
+    def get_session(cls):
+        """FastAPI dependency: one Session per request, always closed afterwards."""
+        cls.get_engine()
+        session = cls._session_factory()
+        try:
+            yield session
+        finally:
+            session.close()
+
+    @classmethod
+    async def get_async_session(cls):
+        """FastAPI dependency: one AsyncSession per request, always closed afterwards."""
+        cls.get_async_engine()
+        async with cls._async_session_factory() as session:
+            yield session
+
+    @classmethod
+    def session_dependency(cls):
+        return cls.get_async_session if cls.use_async else cls.get_session
 
-        engine = create_engine(SQLALCHEMY_DATABASE_URL, echo=True)  # Use echo=True to see SQL logs during development
-        return engine;
+    @classmethod
+    async def dispose(cls):
+        if cls._async_engine is not None:
+            await cls._async_engine.dispose()
+            cls._async_engine = None
+        if cls._engine is not None:
+            cls._engine.dispose()
+            cls._engine = None
@@ -0,0 +1,20 @@
+import os
+import hmac
+
+from fastapi import Header, HTTPException
+from dotenv import load_dotenv
+
+load_dotenv()
+
+
+def require_metrics_token(authorization: str = Header(default="")):
+    """
+    Guards the internal endpoints. They stay hidden (404) unless METRICS_TOKEN
+    is set, and then need an `Authorization: Bearer <METRICS_TOKEN>` header.
+    """
+    token = os.getenv("METRICS_TOKEN")
+    if not token:
+        raise HTTPException(status_code=404, detail="Not Found")
+    scheme, _, credentials = authorization.partition(" ")
+    if scheme.lower() != "bearer" or not hmac.compare_digest(credentials.encode(), token.encode()):
+        raise HTTPException(status_code=401, detail="Invalid metrics token")
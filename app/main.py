@@ -1,18 +1,64 @@
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
 # from routers.chat import router
 from routers.auth import router as auth_router
 from routers.chat import router as chat_router
+from routers.metrics import router as metrics_router
 from configs.cors_config import configure_cors
+from utils.platform_util import PlatformUtils
+from utils.client_util import ClientUtils
+from utils.concurrency_util import ConcurrencyUtils
+from utils.chat_history_util import RedisChatHistory, UpstashChatHistory, ConversationCache
+from rag.vector_stores.milvus_db import MilvusStore
+from rag.vector_stores.keyword_index import KeywordIndex
+from utils.search_cache_util import SearchCache
+from tools.web_scrapping_tool import WebScrapingTool
+from utils.file_cabinet_util import FileCabinetIndex
+from utils.file_write_util import FileWriteUtils
+from database.db_connector import DBConnector
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    PlatformUtils.load_registry()
+    ConversationCache.start()
+    await ConcurrencyUtils.run_blocking(KeywordIndex.get_instance)
+    await ConcurrencyUtils.run_blocking(FileCabinetIndex.start)
+    try:
+        # open the vector store and load its collection before the first request
+        await MilvusStore.aget_instance()
+    except Exception as e:
+        print(f"Milvus store not opened at startup, will retry on first use: {e}")
+    try:
+        DBConnector.startup()
+    except Exception as e:
+        print(f"Database engine not created at startup, will retry on first use: {e}")
+    yield
+    # write pending chat history before the pools go away
+    await ConversationCache.stop()
+    await ClientUtils.aclose()
+    await WebScrapingTool.aclose()
+    MilvusStore.close()
+    ConcurrencyUtils.shutdown()
+    SearchCache.close()
+    FileCabinetIndex.stop()
+    FileWriteUtils.shutdown()
+    await RedisChatHistory.aclose()
+    await UpstashChatHistory.aclose()
+    await DBConnector.dispose()
+
 
-app = FastAPI()
+app = FastAPI(lifespan=lifespan)
 
 configure_cors(app)
 
 app.include_router(auth_router, prefix="/auth", tags=["auth"])
 app.include_router(chat_router, prefix="/chat", tags=["chat"])
+app.include_router(metrics_router, tags=["metrics"])
 # app.include_router(router)
 
 
 if __name__ == "__main__":
     import uvicorn
-    uvicorn.run(app, host="localhost", port=8000)  # Run the app with localhost
\ No newline at end of file
+    uvicorn.run(app, host="localhost", port=8000)  # Run the app with localhost
@@ -2,7 +2,9 @@ import asyncio
 import ssl
 import os
 from dotenv import load_dotenv
-from typing import AsyncIterable
+from typing import AsyncIterable, List
+from dataclasses import dataclass, field
+from fastapi import HTTPException
 
 from configs.config import safety_settings, generation_settings
 from schemas.chat import Message
@@ -16,20 +18,18 @@ from langchain_nvidia_ai_endpoints import ChatNVIDIA
 
 from langchain.prompts import PromptTemplate
 from langchain.chains import ConversationChain
-from langchain.callbacks import AsyncIteratorCallbackHandler
 
 from utils.platform_util import PlatformUtils
 from utils.memory_util import MemoryUtils
 from utils.session_util import SessionUtils
+from utils.client_util import ClientUtils
+from utils.metrics_util import UsageCallbackHandler, empty_usage
+from utils.response_cache_util import ResponseCache
+from utils.stream_util import StreamUtils, StreamCallbackHandler
 
 
 from typing import Any
-from queue import Queue
 from langchain.agents import AgentType, initialize_agent
-from langchain.callbacks.streaming_aiter import AsyncIteratorCallbackHandler
-from langchain.callbacks.streaming_stdout_final_only import FinalStreamingStdOutCallbackHandler
-from langchain.schema import LLMResult
-from typing import AsyncGenerator
 
 
 from tools.online_search_tool import OnlineSearchTool
@@ -41,6 +41,7 @@ from langchain.agents import AgentExecutor, create_openai_tools_agent, create_to
 from langsmith import Client
 
 from rag.vector_stores.milvus_db import MilvusStore
+from rag.vector_stores.hybrid_retriever import HybridRetriever
 
 # Auto-trace LLM calls in-context
 client = Client(api_key=os.getenv("LANGSMITH_API_KEY"),
@@ -52,15 +53,34 @@ load_dotenv()
 
 
 
+@dataclass
+class ChatContext:
+    """Chain, memory and callbacks owned by a single chat request."""
+    chain: Any = None
+    memory: Any = None
+    callbacks: List[Any] = field(default_factory=list)
+
+    @property
+    def config(self):
+        return {"callbacks": self.callbacks} if self.callbacks else {}
+
+
 class GenerativeModel:
+    # GenerativeModel is shared by every request on the worker, so per-request
+    # state lives in a ChatContext instead of on self
 
     def __init__(self):
         self.platform_utils = PlatformUtils()
         self.memory_util = MemoryUtils()
-        self.chat = None
         # self.memory = self.memory_util.init_buffer_window_memory(uuid)
 
 
+    def get_llm(self, platform, model_code, temperature, top_p, top_k):
+        key = (platform, model_code, temperature, top_p, top_k)
+        return ClientUtils.get_or_create(
+            key, lambda: getattr(self, platform)(model_code, temperature, top_p, top_k)
+        )
+
     def gemini_platform(self, model_code, temperature, top_p, top_k):
         llm = ChatGoogleGenerativeAI(model=model_code, 
                                       google_api_key=os.getenv("GEMINI_API_KEY"),
@@ -79,16 +99,18 @@ class GenerativeModel:
         Answer: Let's think step by step."""
         prompt = PromptTemplate.from_template(template)
         llm = OpenAI(model=model_code, openai_api_key=os.getenv("OPENAI_API_KEY"),
-                     temperature=temperature, top_p=top_p, streaming=True)
+                     temperature=temperature, top_p=top_p, streaming=True,
+                     http_client=ClientUtils.get_http_client(),
+                     http_async_client=ClientUtils.get_http_async_client())
         llm_chain = prompt | llm
         return llm_chain
     
 
     def groq_platform(self, model_code, temperature, top_p, top_k):
-        print(f"temperature: {temperature}")
         llm = ChatGroq(model=model_code, api_key=os.getenv("GROQ_API_KEY"),
-                        temperature=temperature, streaming=True)
-        print(f"Model: {model_code}, Temperature: {temperature}")
+                        temperature=temperature, streaming=True,
+                        http_client=ClientUtils.get_http_client(),
+                        http_async_client=ClientUtils.get_http_async_client())
         # stream=True
         return llm
     
@@ -117,38 +139,54 @@ class GenerativeModel:
 
 
 
-    def start_chat(self, model: str, message: Message, temperature: str, top_p: str, top_k: str):
+    async def start_chat(self, model: str, message: Message, temperature: str, top_p: str, top_k: str):
         model_code, platform = self.platform_utils.load_yaml_and_get_model(model)
         if model_code and platform:
-            self.chat = getattr(self, platform)(model_code, temperature, top_p, top_k)
-            response = self.chat.invoke(message)
+            cache_scope = None
+            if ResponseCache.cacheable(temperature):
+                cache_scope = ResponseCache.scope("chat", model_code, temperature, top_p, top_k)
+                cached = await ResponseCache.aget(cache_scope, message)
+                if cached is not None:
+                    return cached
+            context = ChatContext(chain=self.get_llm(platform, model_code, temperature, top_p, top_k))
+            response = await context.chain.ainvoke(message, config=context.config)
             # print(strresponse))
+            if cache_scope:
+                await ResponseCache.aput(cache_scope, message, str(response))
+        else:
+            raise HTTPException(status_code=400, detail="Model not found")
         return str(response)
 
-    def start_custom_chat(self, model, message: Message, temperature, top_p, top_k, uuid):
+    async def start_custom_chat(self, model, message: Message, temperature, top_p, top_k, uuid):
         model_code, platform = self.platform_utils.load_yaml_and_get_model(model)
         if model_code and platform:
-            print(f"Temperature: {temperature}, Top P: {top_p}, Top K: {top_k}")
-            llm = getattr(self, platform)(model_code, temperature, top_p, top_k)
-            print(llm)
-            self.chat = ConversationChain(llm=llm, memory=self.memory_util.init_buffer_window_memory(uuid)
-        )
+            llm = self.get_llm(platform, model_code, temperature, top_p, top_k)
+            memory = self.memory_util.init_chat_memory(uuid)
+            context = ChatContext(chain=ConversationChain(llm=llm, memory=memory), memory=memory,
+                                  callbacks=[UsageCallbackHandler()])
         else:
-            return {"error": "Model not found"}, 400
+            raise HTTPException(status_code=400, detail="Model not found")
+        cache_scope = None
+        if ResponseCache.cacheable(temperature) and not await memory.chat_memory.aget_messages():
+            # later turns depend on the whole conversation and practically never repeat, only opening turns are cached
+            cache_scope = ResponseCache.scope("custom_chat", model_code, temperature, top_p, top_k)
+            cached = await ResponseCache.aget(cache_scope, message)
+            if cached is not None:
+                await memory.asave_context({"input": message}, {"response": cached})
+                return cached, platform, model_code, empty_usage()
         try:
-            response = self.chat.predict(input=message)
+            response = await context.chain.apredict(input=message, callbacks=context.callbacks or None)
+            if cache_scope:
+                await ResponseCache.aput(cache_scope, message, response)
             # history.add_messages(response)
             print(f"Response: {response}")
         except Exception as e:
-            return {"error": str(e)}
-        finally:
-            print(type(response))
-            # history.add_message(conte)
+            raise HTTPException(status_code=500, detail=str(e))
 
-        return response, platform, model_code
+        return response, platform, model_code, context.callbacks[0].usage
     
 
-    def start_chat_with_tool(self, model, message: Message, temperature, top_p, top_k, uuid="12345678111"):
+    async def start_chat_with_tool(self, model, message: Message, temperature, top_p, top_k, uuid="12345678111"):
         model_code, platform = self.platform_utils.load_yaml_and_get_model(model)
 
         search_tools = OnlineSearchTool().get_tools()
@@ -171,39 +209,48 @@ class GenerativeModel:
         print(prompt)
         print("==========================================================")
 
-        memory = self.memory_util.init_buffer_window_memory(uuid)
+        memory = self.memory_util.init_chat_memory(uuid)
         if model_code and platform:
-            print(f"Temperature: {temperature}, Top P: {top_p}, Top K: {top_k}")
-            llm = getattr(self, platform)(model_code, temperature, top_p, top_k)
+            llm = self.get_llm(platform, model_code, temperature, top_p, top_k)
             # llm = ChatGroq(model="llama-3.1-70b-versatile", api_key=os.getenv("GROQ_API_KEY"))
             # self.chat = ConversationChain(llm=llm, memory=self.memory_util.init_buffer_window_memory(uuid)
             agent = create_tool_calling_agent(llm, tools, prompt)
-            self.chat = AgentExecutor(agent=agent, tools=tools, memory=memory, verbose=True)
-            print(f"Memory before chat start: {memory.load_memory_variables({})}")
+            context = ChatContext(chain=AgentExecutor(agent=agent, tools=tools, memory=memory, verbose=True), memory=memory,
+                                  callbacks=[UsageCallbackHandler()])
         else:
-            return {"error": "Model not found"}, 400
+            raise HTTPException(status_code=400, detail="Model not found")
 
         try:
-            response = self.chat.invoke({"input": message})
+            response = await context.chain.ainvoke({"input": message}, config=context.config)
         except Exception as e:
-            return {"error": str(e)}
+            raise HTTPException(status_code=500, detail=str(e))
         # finally:
             # print(type(response))
             # history.add_message(conte)
 
-        return response, platform, model_code
+        return response, platform, model_code, context.callbacks[0].usage
     
 
-    def start_chat_with_doc(self, model, message: Message, temperature, top_p, top_k, uuid):
+    async def start_chat_with_doc(self, model, message: Message, temperature, top_p, top_k, uuid):
         model_code, platform = self.platform_utils.load_yaml_and_get_model(model)
         if model_code and platform:
-            llm = getattr(self, platform)(model_code, temperature, top_p, top_k)
+            llm = self.get_llm(platform, model_code, temperature, top_p, top_k)
             # self.chat = ConversationChain(llm=llm, memory=self.memory_util.init_buffer_window_memory(uuid))
         else:
-            return {"error": "Model not found"}, 400
+            raise HTTPException(status_code=400, detail="Model not found")
         try:
-            milvus = MilvusStore()
-            context = milvus.document_retriever(query=str(message))
+            milvus = await MilvusStore.aget_instance()
+            retriever = HybridRetriever(milvus)
+            cache_scope = None
+            if ResponseCache.cacheable(temperature):
+                # an ingest on any worker changes what the retriever returns, so scope by the shared corpus version
+                cache_scope = ResponseCache.scope("chat_with_doc", model_code, temperature, top_p, top_k,
+                                                  await ResponseCache.aversion("corpus"))
+                cached = await ResponseCache.aget(cache_scope, str(message))
+                if cached is not None:
+                    return cached, platform, model_code, empty_usage()
+            docs = await retriever.aretrieve(str(message))
+            context = retriever.format_context(docs)
 
             prompt_template = """
                 Please answer the following question:
@@ -221,36 +268,36 @@ class GenerativeModel:
             print("============================")
             print(prompt)
             print("============================")
-            response = llm.invoke(prompt)
+            usage = UsageCallbackHandler()
+            response = await llm.ainvoke(prompt, config={"callbacks": [usage]})
+            if cache_scope:
+                await ResponseCache.aput(cache_scope, str(message), response)
         except Exception as e:
-            return {"error": str(e)}
+            raise HTTPException(status_code=500, detail=str(e))
 
-        return response, platform, model_code
+        return response, platform, model_code, usage.usage
     
 
     async def start_chat_stream(self, model: str, message, temperature: float, top_p: float, top_k: int) -> AsyncIterable[str]:
         model_code, platform = self.platform_utils.load_yaml_and_get_model(model)
-        self.chat = getattr(self, platform)(model_code, temperature)
-        ai_msg = "";
-        stream = self.chat.astream(message)
+        handler = StreamCallbackHandler()
+        context = ChatContext(chain=self.get_llm(platform, model_code, temperature, top_p, top_k), callbacks=[handler])
 
-        try:
-            async for chunk in stream:
-                yield chunk.content
-                ai_msg += chunk.content
-        except Exception as e:
-            print(f"Caught exception: {e}")
-        finally:
-            print(f"AI Message: {ai_msg}")
-            print("Stream completed")
+        async def run():
+            # tokens reach the handler through the callbacks, the chunks themselves aren't needed
+            async for _ in context.chain.astream(message, config=context.config):
+                pass
+
+        return StreamUtils.from_callbacks(run(), handler)
 
 
-    async def start_chat_stream_memory(self, model: str, message: str, temperature: float, top_p: float, top_k: int) -> Any:
+    async def start_chat_stream_memory(self, model: str, message: str, temperature: float, top_p: float, top_k: int) -> AsyncIterable[str]:
         # Load model configuration and initialize LLM
         model_code, platform = self.platform_utils.load_yaml_and_get_model(model)
-        llm = getattr(self, platform)(model_code, temperature, top_p, top_k)
+        llm = self.get_llm(platform, model_code, temperature, top_p, top_k)
 
         # Initialize the agent with the loaded LLM and memory
+        memory = self.memory_util.init_buffer_window_memory("aaaaaa")
         agent = initialize_agent(
             agent=AgentType.CHAT_CONVERSATIONAL_REACT_DESCRIPTION,
             tools=[],
@@ -258,77 +305,21 @@ class GenerativeModel:
             verbose=True,
             max_iterations=3,
             early_stopping_method="generate",
-            memory=self.memory_util.init_buffer_window_memory("aaaaaa"),
+            memory=memory,
             return_intermediate_steps=False
         )
 
-        # print("Agent initialized: " + str(agent))
-
-        # Define the asynchronous callback handler
-        class AsyncCallbackHandler(AsyncIteratorCallbackHandler):
-            content: str = ""
-            final_answer: bool = False
-
-            async def on_llm_new_token(self, token: str, **kwargs: Any) -> None:
-                self.content += token
-                if self.final_answer:
-                    if '"action_input": "' in self.content:
-                        if token not in ['"', "}"]:
-                            await self.queue.put(token)
-                elif "Final Answer" in self.content:
-                    self.final_answer = True
-                    self.content = ""
-
-            async def on_llm_end(self, response: LLMResult, **kwargs: Any) -> None:
-                if self.final_answer:
-                    self.content = ""
-                    self.final_answer = False
-                    await self.queue.put(None)  # Signal the end of the stream
-                else:
-                    self.content = ""
-
-        # Define the function to run the agent call asynchronously
-        async def run_call(message: str, stream_it: AsyncCallbackHandler):
-            # print("Starting agent call...")
-            agent.agent.llm_chain.llm.callbacks = [stream_it]
-            try:
-                result = await agent.acall(inputs={"input": message})
-                # print("Agent call completed:", result)
-            except Exception as e:
-                print("Error in agent call:", e)
-                raise
-
-        # Define the generator function to stream the response tokens
-        async def create_gen(message: str, stream_it: AsyncCallbackHandler):
-            print("Message: " + str(message))
-            task = asyncio.create_task(run_call(message, stream_it))
-            print("Task created: " + str(task))
-
-            async for token in stream_it.aiter():
-                print("Token: " + str(token))
-                yield token
-
-            await task
-
-
-        # Initialize the callback handler and return the generator
-        stream_it = AsyncCallbackHandler()
-        # return await create_gen(message, stream_it)   
-        return create_gen(message, stream_it)
-        
-
-
-    async def start_chat_stream_memory_es(self, model: str, message: str, temperature: float, top_p: float, top_k: int, callback_handler) -> AsyncGenerator[str, None]:
-        model_code, platform = self.platform_utils.load_yaml_and_get_model(model)
-        llm = getattr(self, platform)(model_code, temperature, top_p, top_k, callback_handler)
-        self.chat = ConversationChain(llm=llm, memory=self.memory_util.init_buffer_window_memory("ccccccc"))
-
-        run = asyncio.create_task(self.chat.ainvoke(input=message))
-        print("Messae: " + str(message))
-        print("Run: " + str(run))
-        print("Callback Handler: " + str(callback_handler.aiter()))
-        async for token in callback_handler.aiter():
-            print("Token: " + str(token))
-            yield token
-        await run
+        # the agent answers in JSON, only its final answer is streamed
+        handler = StreamCallbackHandler(agent=True)
+        # pass the handler per call, the llm instance is pooled and shared
+        context = ChatContext(chain=agent, memory=memory, callbacks=[handler])
+        return StreamUtils.from_callbacks(context.chain.acall(inputs={"input": message}, callbacks=context.callbacks), handler)
+
 
+    async def start_chat_stream_memory_es(self, model: str, message: str, temperature: float, top_p: float, top_k: int) -> AsyncIterable[str]:
+        model_code, platform = self.platform_utils.load_yaml_and_get_model(model)
+        llm = self.get_llm(platform, model_code, temperature, top_p, top_k)
+        memory = self.memory_util.init_buffer_window_memory("ccccccc")
+        handler = StreamCallbackHandler()
+        context = ChatContext(chain=ConversationChain(llm=llm, memory=memory), memory=memory, callbacks=[handler])
+        return StreamUtils.from_callbacks(context.chain.ainvoke(input=message, config=context.config), handler)
@@ -27,6 +27,11 @@ class LocalDocsLoader:
         for page in loader.load():
             pages.append(page)
         return pages  
+
+    def pdf_lazy_loader(self, file_path: str):
+        # yields one page at a time instead of holding the whole document
+        loader = PyPDFLoader(file_path)
+        return loader.lazy_load()
     
     def unstructured_loader(self, file_path:str):
         loader = UnstructuredLoader(
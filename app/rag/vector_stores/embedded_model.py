@@ -1,17 +1,46 @@
 from langchain_cohere import CohereEmbeddings
 
 import os
+import yaml
 from dotenv import load_dotenv
 
+from .local_embeddings import LocalEmbeddings
+
 
 load_dotenv()
 
+
+def load_embedding_config():
+    with open('../app/configs/embedding_model.yaml') as f:
+        config = yaml.safe_load(f)
+    # env overrides, e.g. EMBEDDING_PLATFORM=local_platform for offline runs
+    return {
+        "platform": os.getenv("EMBEDDING_PLATFORM", config['platform']),
+        "model": os.getenv("EMBEDDING_MODEL", config['model']),
+        "collection_name": os.getenv("MILVUS_COLLECTION", config.get('collection_name', 'LangChainCollection')),
+    }
+
 class EmbeddedModel:
+    # embedding clients are shared per (platform, model) so their HTTP sessions stay warm
+    _clients = {}
+
     def __init__(self):
         pass
         
 
     def cohere_platform(self, model):
-        cohere_api_key = os.getenv("COHERE_API_KEY")
-        embeddings = CohereEmbeddings(model=model, cohere_api_key=cohere_api_key)
-        return embeddings
+        key = ("cohere_platform", model)
+        if key not in EmbeddedModel._clients:
+            cohere_api_key = os.getenv("COHERE_API_KEY")
+            EmbeddedModel._clients[key] = CohereEmbeddings(model=model, cohere_api_key=cohere_api_key)
+        return EmbeddedModel._clients[key]
+
+    def local_platform(self, model):
+        key = ("local_platform", model)
+        if key not in EmbeddedModel._clients:
+            EmbeddedModel._clients[key] = LocalEmbeddings(
+                model=model,
+                batch_size=int(os.getenv("LOCAL_EMBEDDING_BATCH_SIZE", "64")),
+                max_workers=int(os.getenv("LOCAL_EMBEDDING_WORKERS", "0")) or None,
+            )
+        return EmbeddedModel._clients[key]
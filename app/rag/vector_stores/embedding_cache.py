@@ -0,0 +1,223 @@
+import os
+import hashlib
+import threading
+from collections import OrderedDict
+
+import numpy as np
+from dotenv import load_dotenv
+
+from utils.concurrency_util import ConcurrencyUtils
+
+try:
+    import fcntl
+except ImportError:  # POSIX only, without it the disk tier is off
+    fcntl = None
+
+load_dotenv()
+
+
+class EmbeddingCache:
+    """
+    Cache of query embeddings keyed by (embedding model, normalized query).
+
+    Lookups hit an in-memory LRU first. If EMBEDDING_CACHE_PATH is set, vectors
+    are also kept in a memory-mapped float32 file, a ring of
+    EMBEDDING_CACHE_DISK_ROWS rows shared by every worker on the host, so
+    cached queries survive a restart. Each row carries its key in a parallel
+    `.keys` map and the ring cursor lives in a `.meta` map, so the files never
+    grow. Rows are allocated under an exclusive flock, and a reader only
+    accepts a row whose key still matches after the vector was copied.
+    Disk writes and flushes run on the blocking pool.
+    """
+
+    max_entries = int(os.getenv("EMBEDDING_CACHE_SIZE", "4096"))
+    disk_path = os.getenv("EMBEDDING_CACHE_PATH")
+    disk_rows = int(os.getenv("EMBEDDING_CACHE_DISK_ROWS", "100000"))
+
+    _lock = threading.Lock()
+    _entries = OrderedDict()
+    _stats = {"hits": 0, "disk_hits": 0, "misses": 0}
+
+    # disk tier, opened lazily: row vectors, row keys and [cursor, rows, dim]
+    _disk_lock = threading.Lock()
+    _vectors = None
+    _keys = None
+    _meta = None
+    # key -> row and row -> key as last read from the .keys map; only the rows the cursor
+    # passed since the last lookup are re-read, so finding a row doesn't scan the whole ring
+    _rows_lock = threading.Lock()
+    _rows = {}
+    _row_keys = []
+    _synced_cursor = 0
+
+    @staticmethod
+    def normalize(query: str) -> str:
+        return " ".join(str(query).split()).casefold()
+
+    @classmethod
+    def _key(cls, model: str, query: str) -> str:
+        return hashlib.sha1(f"{model}\x00{cls.normalize(query)}".encode("utf-8")).hexdigest()
+
+    @classmethod
+    def get(cls, model: str, query: str):
+        key = cls._key(model, query)
+        with cls._lock:
+            vector = cls._entries.get(key)
+            if vector is not None:
+                cls._entries.move_to_end(key)
+                cls._stats["hits"] += 1
+                return vector
+        vector = cls._read_disk(key)
+        with cls._lock:
+            if vector is not None:
+                cls._remember(key, vector)
+                cls._stats["disk_hits"] += 1
+                return vector
+            cls._stats["misses"] += 1
+            return None
+
+    @classmethod
+    def put(cls, model: str, query: str, vector) -> None:
+        key = cls._key(model, query)
+        vector = [float(v) for v in vector]
+        with cls._lock:
+            cls._remember(key, vector)
+        if cls._disk_enabled():
+            ConcurrencyUtils.get_executor().submit(cls._write_disk, key, vector)
+
+    @classmethod
+    def embed_query(cls, embeddings, model: str, query: str):
+        vector = cls.get(model, query)
+        if vector is None:
+            vector = embeddings.embed_query(query)
+            cls.put(model, query, vector)
+        return vector
+
+    @classmethod
+    async def aembed_query(cls, embeddings, model: str, query: str):
+        vector = cls.get(model, query)
+        if vector is None:
+            vector = await embeddings.aembed_query(query)
+            cls.put(model, query, vector)
+        return vector
+
+    @classmethod
+    def stats(cls):
+        with cls._lock:
+            lookups = sum(cls._stats.values())
+            hits = cls._stats["hits"] + cls._stats["disk_hits"]
+            return dict(cls._stats, entries=len(cls._entries),
+                        hit_rate=round(hits / lookups, 4) if lookups else 0.0)
+
+    @classmethod
+    def _remember(cls, key, vector):
+        cls._entries[key] = vector
+        cls._entries.move_to_end(key)
+        while len(cls._entries) > cls.max_entries:
+            cls._entries.popitem(last=False)
+
+    @classmethod
+    def _disk_enabled(cls) -> bool:
+        return bool(cls.disk_path) and fcntl is not None
+
+    @classmethod
+    def _flock(cls):
+        lock_file = open(cls.disk_path + ".lock", "a")
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        return lock_file
+
+    @classmethod
+    def _open_disk(cls, dim=None):
+        """Maps the shared files, creating them if `dim` is given; None while there is nothing on disk."""
+        if cls._vectors is not None:
+            return cls._vectors
+        with cls._disk_lock:
+            if cls._vectors is not None:
+                return cls._vectors
+            meta_file = cls.disk_path + ".meta"
+            if not os.path.exists(meta_file) and dim is None:
+                return None
+            directory = os.path.dirname(cls.disk_path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            # creation and sizing happen once, whichever worker gets here first
+            with cls._flock():
+                if os.path.exists(meta_file):
+                    meta = np.memmap(meta_file, dtype=np.int64, mode="r+", shape=(3,))
+                else:
+                    np.memmap(cls.disk_path + ".vec", dtype=np.float32, mode="w+", shape=(cls.disk_rows, dim)).flush()
+                    np.memmap(cls.disk_path + ".keys", dtype="S40", mode="w+", shape=(cls.disk_rows,)).flush()
+                    meta = np.memmap(meta_file, dtype=np.int64, mode="w+", shape=(3,))
+                    meta[:] = (0, cls.disk_rows, dim)
+                    meta.flush()
+                rows, dim = int(meta[1]), int(meta[2])
+                cls._keys = np.memmap(cls.disk_path + ".keys", dtype="S40", mode="r+", shape=(rows,))
+                with cls._rows_lock:
+                    cls._row_keys = cls._keys.tolist()
+                    cls._rows = {stored_key: row for row, stored_key in enumerate(cls._row_keys) if stored_key}
+                    cls._synced_cursor = int(meta[0])
+                cls._meta = meta
+                cls._vectors = np.memmap(cls.disk_path + ".vec", dtype=np.float32, mode="r+", shape=(rows, dim))
+        return cls._vectors
+
+    @classmethod
+    def _find_row(cls, stored_key: bytes):
+        with cls._rows_lock:
+            cursor = int(cls._meta[0])
+            total = len(cls._row_keys)
+            # rows written since the last lookup, plus the newest row: its write may have been
+            # in flight then (the cursor moves before the key is stored)
+            start = (cls._synced_cursor - 1) % total
+            for offset in range((cursor - start) % total or 1):
+                row = (start + offset) % total
+                stored = bytes(cls._keys[row])
+                old = cls._row_keys[row]
+                if old == stored:
+                    continue
+                if old and cls._rows.get(old) == row:
+                    del cls._rows[old]
+                cls._row_keys[row] = stored
+                if stored:
+                    cls._rows[stored] = row
+            cls._synced_cursor = cursor
+            row = cls._rows.get(stored_key)
+        # a ring lapped between two lookups leaves stale entries: check the row still holds
+        # the key (a missed key only costs an embedding)
+        if row is None or cls._keys[row] != stored_key:
+            return None
+        return row
+
+    @classmethod
+    def _read_disk(cls, key):
+        if not cls._disk_enabled() or cls._open_disk() is None:
+            return None
+        stored_key = key.encode()
+        row = cls._find_row(stored_key)
+        if row is None:
+            return None
+        vector = cls._vectors[row].tolist()
+        # another worker may have reused the row while it was copied
+        if cls._keys[row] != stored_key:
+            return None
+        return vector
+
+    @classmethod
+    def _write_disk(cls, key, vector):
+        try:
+            if cls._open_disk(len(vector)) is None or len(vector) != cls._vectors.shape[1]:
+                return
+            stored_key = key.encode()
+            with cls._disk_lock, cls._flock():
+                if cls._find_row(stored_key) is not None:
+                    return
+                row = int(cls._meta[0])
+                cls._meta[0] = (row + 1) % len(cls._keys)
+                # clear the key first so readers never pair the old key with the new vector
+                cls._keys[row] = b""
+                cls._vectors[row] = np.asarray(vector, dtype=np.float32)
+                cls._keys[row] = stored_key
+            cls._vectors.flush()
+            cls._keys.flush()
+            cls._meta.flush()
+        except Exception as e:
+            print(f"Embedding cache disk write failed: {e}")
@@ -0,0 +1,106 @@
+import os
+import asyncio
+import threading
+
+from dotenv import load_dotenv
+
+from utils.concurrency_util import ConcurrencyUtils
+from utils.metrics_util import estimate_tokens
+from .keyword_index import KeywordIndex
+from .text_splitter import chunk_id
+
+try:
+    from sentence_transformers import CrossEncoder
+except ImportError:  # reranking is optional
+    CrossEncoder = None
+
+load_dotenv()
+
+
+class HybridRetriever:
+    """
+    Keyword + vector retrieval over the Milvus collection.
+
+    BM25 hits from the KeywordIndex and vector hits from Milvus are fused with
+    weighted reciprocal rank fusion (the two score scales aren't comparable,
+    their ranks are). If HYBRID_RERANK_MODEL names a cross-encoder, the fused
+    candidates are re-scored with it. The best chunks are then packed into
+    RAG_CONTEXT_TOKENS, so the prompt carries a few relevant chunks instead of
+    a fixed top-k.
+    """
+
+    candidates = int(os.getenv("HYBRID_CANDIDATES", "20"))
+    rrf_k = int(os.getenv("HYBRID_RRF_K", "60"))
+    vector_weight = float(os.getenv("HYBRID_VECTOR_WEIGHT", "1.0"))
+    keyword_weight = float(os.getenv("HYBRID_KEYWORD_WEIGHT", "1.0"))
+    rerank_model = os.getenv("HYBRID_RERANK_MODEL", "")
+    token_budget = int(os.getenv("RAG_CONTEXT_TOKENS", "1500"))
+    max_chunks = int(os.getenv("RAG_MAX_CHUNKS", "6"))
+
+    _rerankers = {}
+    _reranker_lock = threading.Lock()
+
+    def __init__(self, milvus, keyword_index=None):
+        self.milvus = milvus
+        self.keyword_index = keyword_index or KeywordIndex.get_instance()
+
+    async def aretrieve(self, query: str):
+        vector_docs, keyword_hits = await asyncio.gather(
+            self.milvus.adocument_retriever(query, k=self.candidates),
+            ConcurrencyUtils.run_blocking(self.keyword_index.search, query, self.candidates),
+        )
+        candidates = self._fuse(vector_docs, keyword_hits)
+        if self.rerank_model and CrossEncoder is not None and len(candidates) > 1:
+            candidates = await ConcurrencyUtils.run_blocking(self._rerank, query, candidates)
+        return self._pack(candidates)
+
+    def _fuse(self, vector_docs, keyword_hits):
+        scores = {}
+        docs = {}
+        for rank, doc in enumerate(vector_docs):
+            doc_id = doc.metadata.get("pk") or chunk_id(doc.page_content, doc.metadata.get("source", ""))
+            docs[doc_id] = doc
+            scores[doc_id] = scores.get(doc_id, 0.0) + self.vector_weight / (self.rrf_k + rank + 1)
+        for rank, (doc_id, _) in enumerate(keyword_hits):
+            if doc_id not in docs:
+                doc = self.keyword_index.get(doc_id)
+                if doc is None:
+                    continue
+                docs[doc_id] = doc
+            scores[doc_id] = scores.get(doc_id, 0.0) + self.keyword_weight / (self.rrf_k + rank + 1)
+        ranked = sorted(scores, key=scores.get, reverse=True)[:self.candidates]
+        return [docs[doc_id] for doc_id in ranked]
+
+    def _rerank(self, query, docs):
+        scores = self._reranker().predict([(query, doc.page_content) for doc in docs])
+        order = sorted(range(len(docs)), key=lambda i: scores[i], reverse=True)
+        return [docs[i] for i in order]
+
+    def _reranker(self):
+        with self._reranker_lock:
+            if self.rerank_model not in self._rerankers:
+                self._rerankers[self.rerank_model] = CrossEncoder(
+                    self.rerank_model, device=os.getenv("LOCAL_EMBEDDING_DEVICE", "cpu")
+                )
+            return self._rerankers[self.rerank_model]
+
+    def _pack(self, docs):
+        packed = []
+        used = 0
+        for doc in docs:
+            if len(packed) == self.max_chunks:
+                break
+            cost = estimate_tokens(doc.page_content)
+            # the best chunk always goes in, the rest only while they fit
+            if packed and used + cost > self.token_budget:
+                continue
+            packed.append(doc)
+            used += cost
+        return packed
+
+    @staticmethod
+    def format_context(docs) -> str:
+        return "\n\n".join(
+            f"[{i}] (source: {doc.metadata.get('source', 'unknown')})\n{doc.page_content.strip()}"
+            for i, doc in enumerate(docs, 1)
+        )
@@ -0,0 +1,41 @@
+import os
+import re
+import json
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+
+class IngestManifest:
+    """
+    Per-source record of the chunk ids currently stored in Milvus.
+
+    Chunk ids are content hashes, so comparing a new ingest against the
+    manifest tells which chunks are unchanged (skip), new (embed and insert)
+    or gone (delete).
+    """
+
+    directory = os.getenv("INGEST_MANIFEST_DIR", "./rag_manifests")
+
+    @classmethod
+    def _path(cls, source: str) -> str:
+        safe_source = re.sub(r'[^A-Za-z0-9._-]', '_', source)
+        return os.path.join(cls.directory, f"{safe_source}.json")
+
+    @classmethod
+    def load(cls, source: str) -> set:
+        try:
+            with open(cls._path(source), 'r', encoding='utf-8') as f:
+                return set(json.load(f).get("chunk_ids", []))
+        except FileNotFoundError:
+            return set()
+
+    @classmethod
+    def save(cls, source: str, chunk_ids) -> None:
+        os.makedirs(cls.directory, exist_ok=True)
+        path = cls._path(source)
+        tmp_path = path + ".tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({"source": source, "chunk_ids": sorted(chunk_ids)}, f)
+        os.replace(tmp_path, path)
@@ -0,0 +1,217 @@
+import os
+import time
+import asyncio
+import threading
+import contextlib
+from collections import OrderedDict
+from itertools import islice
+from uuid import uuid4
+
+from dotenv import load_dotenv
+
+from rag.document_loaders.local_docs_loader import LocalDocsLoader
+from utils.concurrency_util import ConcurrencyUtils
+from utils.response_cache_util import ResponseCache
+from .milvus_db import MilvusStore
+from .text_splitter import split_pages, chunk_id
+from .ingest_manifest import IngestManifest
+from .keyword_index import KeywordIndex
+
+load_dotenv()
+
+
+class IngestJobs:
+    """In-process registry of ingest job states, newest MAX_JOBS kept."""
+
+    max_jobs = int(os.getenv("INGEST_MAX_JOBS", "100"))
+
+    _lock = threading.Lock()
+    _jobs = OrderedDict()
+
+    @classmethod
+    def create(cls, file_path, source, mode):
+        job = {
+            "job_id": str(uuid4()),
+            "status": "queued",
+            "file": os.path.basename(file_path),
+            "source": source,
+            "mode": mode,
+            "chunks": 0,
+            "skipped": 0,
+            "embedded": 0,
+            "inserted": 0,
+            "deleted": 0,
+            "error": None,
+            "created_at": time.time(),
+            "finished_at": None,
+        }
+        with cls._lock:
+            cls._jobs[job["job_id"]] = job
+            while len(cls._jobs) > cls.max_jobs:
+                cls._jobs.popitem(last=False)
+        return dict(job)
+
+    @classmethod
+    def get(cls, job_id):
+        with cls._lock:
+            job = cls._jobs.get(job_id)
+            return dict(job) if job else None
+
+    @classmethod
+    def update(cls, job_id, **fields):
+        with cls._lock:
+            job = cls._jobs.get(job_id)
+            if job:
+                job.update(fields)
+
+    @classmethod
+    def increment(cls, job_id, field, amount):
+        with cls._lock:
+            job = cls._jobs.get(job_id)
+            if job:
+                job[field] += amount
+
+
+class IngestPipeline:
+    """
+    Streams a PDF into Milvus as a background job.
+
+    Pages are loaded lazily and chunked as they arrive; chunks are embedded in
+    batches of INGEST_EMBED_BATCH_SIZE with at most INGEST_EMBED_CONCURRENCY
+    batches in flight (which also bounds how far ahead of the embedder the
+    reader gets), retried with exponential backoff, and bulk-inserted.
+
+    Chunk ids are content hashes. In "incremental" mode chunks already listed
+    in the source's manifest are skipped and chunks no longer present are
+    deleted afterwards; "full" mode re-embeds everything. The KeywordIndex
+    used for hybrid retrieval is kept in step with Milvus.
+    """
+
+    batch_size = int(os.getenv("INGEST_EMBED_BATCH_SIZE", "96"))
+    concurrency = int(os.getenv("INGEST_EMBED_CONCURRENCY", "4"))
+    max_retries = int(os.getenv("INGEST_MAX_RETRIES", "3"))
+    retry_backoff = float(os.getenv("INGEST_RETRY_BACKOFF", "1.0"))
+
+    _tasks = set()
+
+    @classmethod
+    def submit(cls, file_path, source=None, mode="incremental", delete_file=False):
+        """Starts the ingest job; with `delete_file` the file is removed once the job is over."""
+        source = source or os.path.basename(file_path)
+        job = IngestJobs.create(file_path, source, mode)
+        task = asyncio.create_task(cls.run(job["job_id"], file_path, source, mode, delete_file))
+        cls._tasks.add(task)
+        task.add_done_callback(cls._tasks.discard)
+        return job
+
+    @classmethod
+    async def run(cls, job_id, file_path, source, mode="incremental", delete_file=False):
+        IngestJobs.update(job_id, status="running")
+        tasks = set()
+        stored_ids = None
+        inserted_ids = set()
+        keyword_index = KeywordIndex.get_instance()
+        try:
+            milvus = await MilvusStore.aget_instance()
+            chunks = split_pages(LocalDocsLoader().pdf_lazy_loader(file_path))
+            semaphore = asyncio.Semaphore(cls.concurrency)
+            # Milvus Lite writes to a single local file, keep inserts one at a time
+            insert_lock = asyncio.Lock()
+
+            stored_ids = IngestManifest.load(source)
+            if mode == "full" and stored_ids:
+                await ConcurrencyUtils.run_blocking(milvus.delete_document, ids=list(stored_ids))
+                keyword_index.remove(stored_ids)
+                IngestJobs.increment(job_id, "deleted", len(stored_ids))
+                stored_ids = set()
+            seen_ids = set()
+
+            while True:
+                texts = await ConcurrencyUtils.run_blocking(cls._take, chunks, cls.batch_size)
+                if not texts:
+                    break
+                IngestJobs.increment(job_id, "chunks", len(texts))
+
+                batch_texts, ids = [], []
+                known_texts, known_ids = [], []
+                for text in texts:
+                    text_id = chunk_id(text, source)
+                    if text_id in seen_ids:
+                        continue
+                    seen_ids.add(text_id)
+                    if text_id not in stored_ids:
+                        batch_texts.append(text)
+                        ids.append(text_id)
+                    elif text_id not in keyword_index:
+                        # stored before the keyword index existed, index it without re-embedding
+                        known_texts.append(text)
+                        known_ids.append(text_id)
+                keyword_index.add(known_ids, known_texts, source)
+                IngestJobs.increment(job_id, "skipped", len(texts) - len(batch_texts))
+                if not batch_texts:
+                    continue
+
+                await semaphore.acquire()
+                task = asyncio.create_task(cls._process_batch(job_id, milvus, batch_texts, ids, source, insert_lock, inserted_ids))
+                task.add_done_callback(lambda _: semaphore.release())
+                tasks.add(task)
+                # surface a failed batch before reading any further
+                for done in [t for t in tasks if t.done()]:
+                    tasks.discard(done)
+                    done.result()
+
+            await asyncio.gather(*tasks)
+
+            removed_ids = stored_ids - seen_ids
+            if removed_ids:
+                await ConcurrencyUtils.run_blocking(milvus.delete_document, ids=list(removed_ids))
+                keyword_index.remove(removed_ids)
+                IngestJobs.increment(job_id, "deleted", len(removed_ids))
+            IngestManifest.save(source, seen_ids)
+            await ConcurrencyUtils.run_blocking(keyword_index.save)
+            IngestJobs.update(job_id, status="completed", finished_at=time.time())
+        except Exception as e:
+            for task in tasks:
+                task.cancel()
+            print(f"Ingest job {job_id} failed: {e}")
+            if stored_ids is not None:
+                # record what did make it in, so a retry doesn't insert those chunks twice
+                IngestManifest.save(source, stored_ids | inserted_ids)
+            keyword_index.save()
+            IngestJobs.update(job_id, status="failed", error=str(e), finished_at=time.time())
+        finally:
+            if delete_file:
+                with contextlib.suppress(FileNotFoundError):
+                    os.remove(file_path)
+            # even a failed job may have changed the corpus, cached answers over it are stale
+            await ResponseCache.abump("corpus")
+
+    @staticmethod
+    def _take(iterator, size):
+        return list(islice(iterator, size))
+
+    @classmethod
+    async def _process_batch(cls, job_id, milvus, texts, ids, source, insert_lock, inserted_ids):
+        embeddings = await cls._with_retry(milvus.embedded_model.aembed_documents, texts)
+        IngestJobs.increment(job_id, "embedded", len(texts))
+
+        metadatas = [{"source": source} for _ in texts]
+        async with insert_lock:
+            inserted = await cls._with_retry(
+                ConcurrencyUtils.run_blocking, milvus.add_embeddings, texts, embeddings, metadatas, ids
+            )
+        inserted_ids.update(ids)
+        KeywordIndex.get_instance().add(ids, texts, source)
+        IngestJobs.increment(job_id, "inserted", inserted)
+
+    @classmethod
+    async def _with_retry(cls, func, *args):
+        for attempt in range(cls.max_retries + 1):
+            try:
+                return await func(*args)
+            except Exception as e:
+                if attempt == cls.max_retries:
+                    raise
+                delay = cls.retry_backoff * (2 ** attempt)
+                print(f"Ingest step failed ({e}), retrying in {delay:.1f}s")
+                await asyncio.sleep(delay)
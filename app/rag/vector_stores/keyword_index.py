@@ -0,0 +1,242 @@
+import os
+import re
+import json
+import math
+import time
+import heapq
+import threading
+from collections import Counter
+
+from dotenv import load_dotenv
+from langchain_core.documents import Document
+
+try:
+    import fcntl
+except ImportError:  # POSIX only, without it saves are not serialized across processes
+    fcntl = None
+
+load_dotenv()
+
+
+TOKEN_PATTERN = re.compile(r"\w+", re.UNICODE)
+
+
+def tokenize(text: str):
+    return TOKEN_PATTERN.findall(text.lower())
+
+
+class KeywordIndex:
+    """
+    In-process inverted index over the chunks stored in Milvus, scored with BM25.
+
+    Chunks are keyed by the same content-hash ids as the Milvus rows, so the
+    ingest pipeline keeps both in step. Only chunk text and source are
+    persisted (KEYWORD_INDEX_PATH); postings are rebuilt when the file is loaded.
+
+    The file is shared by every worker on the host. A save merges this
+    worker's changes since the last save into whatever is on disk, under an
+    exclusive flock, and searches reload the index when the file has been
+    replaced by another worker (checked at most every
+    KEYWORD_INDEX_REFRESH_INTERVAL seconds).
+    """
+
+    path = os.getenv("KEYWORD_INDEX_PATH", "./rag_keyword_index.json")
+    refresh_interval = float(os.getenv("KEYWORD_INDEX_REFRESH_INTERVAL", "1"))
+    k1 = 1.5
+    b = 0.75
+
+    _instance = None
+    _instance_lock = threading.Lock()
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._docs = {}
+        self._postings = {}
+        self._total_length = 0
+        # changes not saved yet, replayed on top of the file when it is merged or reloaded
+        self._added = {}
+        self._removed = set()
+        # (mtime_ns, size) of the file last read or written, and when it was last checked
+        self._stamp = None
+        self._checked_at = 0.0
+        self._reload_lock = threading.Lock()
+        # bumped on every change, lets callers tell when the corpus moved
+        self.version = 0
+
+    @classmethod
+    def get_instance(cls):
+        if cls._instance is None:
+            with cls._instance_lock:
+                if cls._instance is None:
+                    index = cls()
+                    index.load()
+                    cls._instance = index
+        return cls._instance
+
+    def __len__(self):
+        return len(self._docs)
+
+    def __contains__(self, doc_id):
+        return doc_id in self._docs
+
+    def add(self, ids, texts, source):
+        with self._lock:
+            for doc_id, text in zip(ids, texts):
+                if doc_id not in self._docs:
+                    self._add(doc_id, text, source)
+                    self._added[doc_id] = (text, source)
+                    self._removed.discard(doc_id)
+                    self.version += 1
+
+    def remove(self, ids):
+        with self._lock:
+            for doc_id in ids:
+                self._added.pop(doc_id, None)
+                # recorded even if this worker never saw the chunk, another one may have saved it
+                self._removed.add(doc_id)
+                doc = self._docs.pop(doc_id, None)
+                if doc is None:
+                    continue
+                for term in doc["terms"]:
+                    postings = self._postings[term]
+                    del postings[doc_id]
+                    if not postings:
+                        del self._postings[term]
+                self._total_length -= doc["length"]
+                self.version += 1
+
+    def search(self, query: str, k: int = 20):
+        """Returns up to k (doc_id, score) pairs, best first."""
+        self.refresh()
+        with self._lock:
+            if not self._docs:
+                return []
+            n = len(self._docs)
+            avg_length = self._total_length / n
+            scores = Counter()
+            for term in set(tokenize(query)):
+                postings = self._postings.get(term)
+                if not postings:
+                    continue
+                idf = math.log(1 + (n - len(postings) + 0.5) / (len(postings) + 0.5))
+                for doc_id, tf in postings.items():
+                    norm = self.k1 * (1 - self.b + self.b * self._docs[doc_id]["length"] / avg_length)
+                    scores[doc_id] += idf * tf * (self.k1 + 1) / (tf + norm)
+            return heapq.nlargest(k, scores.items(), key=lambda item: item[1])
+
+    def get(self, doc_id):
+        doc = self._docs.get(doc_id)
+        if doc is None:
+            return None
+        return Document(page_content=doc["text"], metadata={"source": doc["source"], "pk": doc_id})
+
+    def load(self):
+        """Replaces the index with the file's contents plus this worker's unsaved changes."""
+        with self._reload_lock:
+            stamp, stored = self._read()
+            self._replace(stored, stamp)
+
+    def refresh(self):
+        """Reloads the index if another worker replaced the file since it was last read."""
+        now = time.monotonic()
+        if now - self._checked_at < self.refresh_interval:
+            return
+        self._checked_at = now
+        if self._file_stamp() == self._stamp:
+            return
+        # one reload at a time, other searches keep using the current postings
+        if not self._reload_lock.acquire(blocking=False):
+            return
+        try:
+            stamp, stored = self._read()
+            if stamp != self._stamp:
+                self._replace(stored, stamp)
+        finally:
+            self._reload_lock.release()
+
+    def save(self):
+        with self._lock:
+            if not self._added and not self._removed:
+                return
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with self._reload_lock, self._flock():
+            # merge into what is on disk now, other workers may have saved since this one loaded
+            stamp, stored = self._read()
+            stale = stamp != self._stamp
+            with self._lock:
+                added, removed = dict(self._added), set(self._removed)
+            for doc_id in removed:
+                stored.pop(doc_id, None)
+            for doc_id, (text, source) in added.items():
+                stored[doc_id] = {"text": text, "source": source}
+            tmp_path = f"{self.path}.{os.getpid()}.tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump({"docs": stored}, f)
+            os.replace(tmp_path, self.path)
+            with self._lock:
+                # keep what changed while the file was written for the next save
+                for doc_id, doc in added.items():
+                    if self._added.get(doc_id) == doc:
+                        del self._added[doc_id]
+                self._removed -= removed
+            if stale:
+                # pick up what the other workers saved
+                self._replace(stored, self._file_stamp())
+            else:
+                self._stamp = self._file_stamp()
+
+    def _read(self):
+        """Returns the file's stamp and {doc_id: {"text", "source"}}, empty when there is no file."""
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                stamp = os.fstat(f.fileno())
+                stored = json.load(f)
+        except FileNotFoundError:
+            return None, {}
+        return (stamp.st_mtime_ns, stamp.st_size), stored.get("docs", {})
+
+    def _file_stamp(self):
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
+    def _replace(self, stored, stamp):
+        """Rebuilds the postings from `stored` plus the unsaved changes and swaps them in."""
+        while True:
+            with self._lock:
+                added, removed = dict(self._added), set(self._removed)
+            # build outside the lock, searches keep using the old postings meanwhile
+            fresh = KeywordIndex()
+            for doc_id, doc in stored.items():
+                if doc_id not in removed and doc_id not in added:
+                    fresh._add(doc_id, doc["text"], doc["source"])
+            for doc_id, (text, source) in added.items():
+                fresh._add(doc_id, text, source)
+            with self._lock:
+                if self._added != added or self._removed != removed:
+                    # changed while rebuilding, rebuild with those changes
+                    continue
+                changed = fresh._docs.keys() != self._docs.keys()
+                self._docs, self._postings, self._total_length = fresh._docs, fresh._postings, fresh._total_length
+                self._stamp = stamp
+                if changed:
+                    self.version += 1
+                return
+
+    def _flock(self):
+        lock_file = open(self.path + ".lock", "a")
+        if fcntl is not None:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+        return lock_file
+
+    def _add(self, doc_id, text, source):
+        terms = Counter(tokenize(text))
+        length = sum(terms.values())
+        self._docs[doc_id] = {"text": text, "source": source, "terms": terms, "length": length}
+        for term, tf in terms.items():
+            self._postings.setdefault(term, {})[doc_id] = tf
+        self._total_length += length
@@ -0,0 +1,91 @@
+import os
+import re
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from typing import List
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+try:
+    from sentence_transformers import SentenceTransformer
+except ImportError:  # optional, the hashing encoder below needs nothing but NumPy
+    SentenceTransformer = None
+
+
+HASHING_MODEL = "hashing"
+TOKEN_PATTERN = re.compile(r"\w+", re.UNICODE)
+
+
+class HashingEncoder:
+    """
+    Dependency-free encoder: signed feature hashing of word unigrams and
+    bigrams into a fixed-width, L2-normalized vector. Deterministic across
+    processes, so it works for offline ingestion and end-to-end RAG tests.
+    """
+
+    def __init__(self, dim: int = 512):
+        self.dim = dim
+
+    def _features(self, text: str):
+        tokens = TOKEN_PATTERN.findall(text.lower())
+        return tokens + [f"{a} {b}" for a, b in zip(tokens, tokens[1:])]
+
+    def encode(self, texts: List[str]) -> np.ndarray:
+        rows, cols, signs = [], [], []
+        for row, text in enumerate(texts):
+            for feature in self._features(text):
+                h = zlib.crc32(feature.encode("utf-8"))
+                rows.append(row)
+                cols.append(h % self.dim)
+                signs.append(1.0 if h & 0x80000000 else -1.0)
+        vectors = np.zeros((len(texts), self.dim), dtype=np.float32)
+        if rows:
+            np.add.at(vectors, (np.asarray(rows), np.asarray(cols)), np.asarray(signs, dtype=np.float32))
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        np.divide(vectors, norms, out=vectors, where=norms > 0)
+        return vectors
+
+
+class SentenceTransformerEncoder:
+    def __init__(self, model: str):
+        if SentenceTransformer is None:
+            raise ImportError(f"sentence-transformers is required for local model '{model}'")
+        self.model = SentenceTransformer(model, device=os.getenv("LOCAL_EMBEDDING_DEVICE", "cpu"))
+
+    def encode(self, texts: List[str]) -> np.ndarray:
+        return self.model.encode(texts, batch_size=len(texts), convert_to_numpy=True, normalize_embeddings=True)
+
+
+class LocalEmbeddings(Embeddings):
+    """
+    Embeddings computed in-process, batched and spread over a thread pool.
+
+    `model` is either "hashing" (NumPy feature hashing, no download) or a
+    sentence-transformers model name/path. Inputs are split into batches of
+    `batch_size`, which are encoded in parallel; the heavy lifting happens
+    in NumPy/PyTorch kernels that release the GIL.
+    """
+
+    def __init__(self, model: str = HASHING_MODEL, batch_size: int = 64, max_workers: int = None):
+        self.model = model
+        self.batch_size = batch_size
+        if model == HASHING_MODEL:
+            self.encoder = HashingEncoder(int(os.getenv("LOCAL_EMBEDDING_DIM", "512")))
+        else:
+            self.encoder = SentenceTransformerEncoder(model)
+        self.executor = ThreadPoolExecutor(max_workers=max_workers or os.cpu_count(), thread_name_prefix="embed")
+
+    def _encode(self, texts: List[str]) -> np.ndarray:
+        if not texts:
+            return np.zeros((0, 0), dtype=np.float32)
+        batches = [texts[i:i + self.batch_size] for i in range(0, len(texts), self.batch_size)]
+        if len(batches) == 1:
+            return self.encoder.encode(batches[0])
+        return np.vstack(list(self.executor.map(self.encoder.encode, batches)))
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self._encode(list(texts)).tolist()
+
+    def embed_query(self, text: str) -> List[float]:
+        return self._encode([text])[0].tolist()
@@ -1,24 +1,64 @@
+import threading
+
 from langchain_milvus import Milvus
 from langchain_core.documents import Document
 
-from .embedded_model import EmbeddedModel
+from .embedded_model import EmbeddedModel, load_embedding_config
+from .embedding_cache import EmbeddingCache
+from utils.concurrency_util import ConcurrencyUtils
 
 
 URI = "./milvus_rag.db"
 
 class MilvusStore:
+    # one store per process: opening Milvus Lite and loading the collection is slow
+    _instance = None
+    _lock = threading.Lock()
+
     def __init__(self):
-        self.embedded_model = EmbeddedModel().cohere_platform("embed-multilingual-v3.0")
+        config = load_embedding_config()
+        self.embedding_model_name = f"{config['platform']}:{config['model']}"
+        self.embedded_model = getattr(EmbeddedModel(), config['platform'])(config['model'])
         self.vector_store = Milvus(
              embedding_function=self.embedded_model,
+             collection_name=config['collection_name'],
              connection_args={"uri": URI}
         )
 
+    @classmethod
+    def get_instance(cls):
+        if cls._instance is None:
+            with cls._lock:
+                if cls._instance is None:
+                    cls._instance = cls()
+        return cls._instance
+
+    @classmethod
+    async def aget_instance(cls):
+        if cls._instance is not None:
+            return cls._instance
+        return await ConcurrencyUtils.run_blocking(cls.get_instance)
+
+    @classmethod
+    def close(cls):
+        with cls._lock:
+            if cls._instance is not None:
+                client = getattr(cls._instance.vector_store, "client", None)
+                if client is not None:
+                    client.close()
+                cls._instance = None
+
     def add_document(self, docs, ids):       
         docs = self.vector_store.add_documents(documents=docs, ids=ids)
         return str(len(docs)) + " document(s) added"
 
 
+    def add_embeddings(self, texts, embeddings, metadatas, ids):
+        # vectors were computed by the caller, Milvus only stores them
+        pks = self.vector_store.add_embeddings(texts=texts, embeddings=embeddings, metadatas=metadatas, ids=ids)
+        return len(pks)
+
+
     def search_document(self, query):
         result = self.vector_store.similarity_search(
             query=query,
@@ -26,11 +66,15 @@ class MilvusStore:
         )
         return result
     
-    def document_retriever(self, query):
-        retriever =  self.vector_store.as_retriever(
-            search_type="similarity", 
-            search_kwargs={"k": 4})
-        retrieved_docs = retriever.invoke(query)
+    def document_retriever(self, query, k=4):
+        # repeated questions reuse the cached query vector instead of calling the embedding API
+        embedding = EmbeddingCache.embed_query(self.embedded_model, self.embedding_model_name, query)
+        retrieved_docs = self.vector_store.similarity_search_by_vector(embedding=embedding, k=k)
+        return retrieved_docs
+
+    async def adocument_retriever(self, query, k=4):
+        embedding = await EmbeddingCache.aembed_query(self.embedded_model, self.embedding_model_name, query)
+        retrieved_docs = await self.vector_store.asimilarity_search_by_vector(embedding=embedding, k=k)
         return retrieved_docs
 
 
@@ -2,8 +2,8 @@ from langchain_text_splitters import CharacterTextSplitter
 from langchain_text_splitters import RecursiveCharacterTextSplitter
 from rag.document_loaders.local_docs_loader import LocalDocsLoader
 
-from typing import List, Dict
-from uuid import uuid4
+from typing import Dict, Iterable, Iterator, List
+from hashlib import sha256
 from dataclasses import dataclass
 
 @dataclass
@@ -11,16 +11,25 @@ class Document:
     page_content: str
     metadata: Dict[str, str]
 
+def chunk_id(text: str, source: str) -> str:
+    # deterministic, so re-ingesting the same chunk from the same source maps to the same row
+    return sha256(f"{source}\x00{text}".encode("utf-8")).hexdigest()
+
 def convert_texts_to_documents(texts: List[str], source: str = "pdf") -> tuple[List[Document], List[str]]:
     documents = []
+    uuids = []
+    seen = set()
     for text in texts:
+        doc_id = chunk_id(text, source)
+        if doc_id in seen:
+            continue
+        seen.add(doc_id)
         doc = Document(
             page_content=text,
             metadata={"source": source}
         )
         documents.append(doc)
-    
-    uuids = [str(uuid4()) for _ in range(len(documents))]
+        uuids.append(doc_id)
     
     return documents, uuids
 
@@ -36,3 +45,9 @@ def text_splitter(file_path: str):
     
     return documents, uuids
 
+
+def split_pages(pages: Iterable, chunk_size: int = 1024, chunk_overlap: int = 0) -> Iterator[str]:
+    splitter = RecursiveCharacterTextSplitter(chunk_size=chunk_size, chunk_overlap=chunk_overlap)
+    for page in pages:
+        for text in splitter.split_text(page.page_content):
+            yield text
@@ -1,31 +1,33 @@
 from fastapi import APIRouter, Depends, HTTPException, Request
 from fastapi.responses import JSONResponse
-from controllers.auth import register_identity, login_identity
+from controllers.auth import register_identity, login_identity, aregister_identity, alogin_identity
 from database.db_connector import DBConnector
-from sqlalchemy.orm import Session
+from utils.concurrency_util import ConcurrencyUtils
+from sqlalchemy.ext.asyncio import AsyncSession
 
 
 router = APIRouter()
 
 @router.post('/signup')
-async def create_identity(request: Request):
+async def create_identity(request: Request, session=Depends(DBConnector.session_dependency())):
     data = await request.json()
-    engine= DBConnector.init_engine()
-    session = Session(engine)
-    register_identity(data, session)
+    if isinstance(session, AsyncSession):
+        await aregister_identity(data, session)
+    else:
+        await ConcurrencyUtils.run_blocking(register_identity, data, session)
     return "success"
-        
+
 @router.post('/login')
-async def login_identity_route(request: Request):
+async def login_identity_route(request: Request, session=Depends(DBConnector.session_dependency())):
     data = await request.json()
-    engine = DBConnector.init_engine()
-    session = Session(engine)
     try:
-        result = login_identity(data, session)
+        if isinstance(session, AsyncSession):
+            result = await alogin_identity(data, session)
+        else:
+            result = await ConcurrencyUtils.run_blocking(login_identity, data, session)
         return JSONResponse(content=result, status_code=200)
     except HTTPException as e:
         raise e
     except Exception as e:
         raise HTTPException(status_code=500, detail="Internal server error")
-        
-    
\ No newline at end of file
+
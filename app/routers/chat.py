@@ -2,8 +2,10 @@ from fastapi import APIRouter, Request, Response, HTTPException, UploadFile, Fil
 from fastapi.responses import StreamingResponse
 from controllers.chat import ChatController
 from utils.session_util import SessionUtils
+from utils.stream_util import StreamUtils
 
 import os
+from uuid import uuid4
 
 router = APIRouter()
 chat_controller = ChatController()
@@ -17,7 +19,7 @@ async def send_chat_message(request: Request):
         print(data)
     except Exception as e:
         raise HTTPException(status_code=400, detail="Invalid JSON format")
-    response = chat_controller.start_chat(data)
+    response = await chat_controller.start_chat(data)
     return {"response": response}
 
 
@@ -47,13 +49,15 @@ async def send_custom_chat_message(request: Request, response: Response):
     except Exception:
         raise HTTPException(status_code=400, detail="Invalid JSON format")
     print("cookies: " + str(SessionUtils.get_session_id(request)))
-    response_data = chat_controller.start_custom_chat(data)
+    response_data = await chat_controller.start_custom_chat(data)
     return {"response": response_data}
 
 
 
 @router.get("/platforms")
-async def get_platforms(response: Response, request: Request):
+async def get_platforms(request: Request):
+    # the payload is serialized once by the platform registry
+    response = Response(content=chat_controller.get_llm_platforms_json(), media_type="application/json")
     uuid = SessionUtils.get_session_id(request)
     if uuid is None:
         response.set_cookie(
@@ -64,8 +68,7 @@ async def get_platforms(response: Response, request: Request):
             samesite="None",  # Allow cross-site cookies
             secure=False,  # Only send cookie over HTTPS if True
         )
-    platforms = chat_controller.get_llm_platforms()
-    return platforms
+    return response
 
 
 @router.post("/stream_chat")
@@ -82,7 +85,7 @@ async def stream_chat(request: Request):
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
     
-    return StreamingResponse(generator, media_type="text/event-stream")
+    return StreamUtils.response(request, generator)
 
 
 
@@ -90,17 +93,14 @@ async def stream_chat(request: Request):
 async def stream_chat_memory(request: Request):
     data = await request.json()
     gen = await chat_controller.stream_chat_memory(data)
-    return StreamingResponse(gen, media_type="text/event-stream")
+    return StreamUtils.response(request, gen)
 
 
 @router.post("/stream_chat_es")
 async def stream_chat_es(request: Request):
     data = await request.json()
-    gen = chat_controller.stream_chat_es(data)
-    return StreamingResponse(
-            gen,
-            media_type="text/event-stream"
-        )
+    gen = await chat_controller.stream_chat_es(data)
+    return StreamUtils.response(request, gen)
 
 
 @router.get('/chat_tool')
@@ -145,7 +145,7 @@ async def chat_with_tool(request: Request, response: Response):
     except Exception:
         raise HTTPException(status_code=400, detail="Invalid JSON format")
     print("cookies: " + str(SessionUtils.get_session_id(request)))
-    response_data = chat_controller.start_chat_with_tool(data)
+    response_data = await chat_controller.start_chat_with_tool(data)
     return {"response": response_data}
 
 @router.post('/chat_with_doc')
@@ -174,7 +174,7 @@ async def chat_with_doc(request: Request, response: Response):
     except Exception:
         raise HTTPException(status_code=400, detail="Invalid JSON format")
     print("cookies: " + str(SessionUtils.get_session_id(request)))
-    response_data = chat_controller.start_chat_with_doc(data)
+    response_data = await chat_controller.start_chat_with_doc(data)
     return {"response": response_data}
 
 
@@ -261,7 +261,7 @@ async def rag():
     uuids = [str(uuid4()) for _ in range(len(documents))]
 
     from rag.vector_stores.milvus_db import MilvusStore
-    milvus = MilvusStore()
+    milvus = MilvusStore.get_instance()
     # store = milvus.add_document(docs=documents, ids=uuids)
     # return store
     # search = milvus.search_document()
@@ -270,29 +270,38 @@ async def rag():
     return delete
 
 @router.post('/split')
-async def split(file: UploadFile = File(...)):
+async def split(file: UploadFile = File(...), mode: str = "incremental"):
     # Import inside the route if dynamic imports are needed, 
     # otherwise, move them to top-level imports
-    from rag.vector_stores.text_splitter import text_splitter
-    from rag.vector_stores.milvus_db import MilvusStore
+    from rag.vector_stores.ingest_pipeline import IngestPipeline
+
+    if mode not in ("incremental", "full"):
+        raise HTTPException(status_code=400, detail="Invalid mode. Expected 'incremental' or 'full'")
 
     # Create a directory to store uploaded files if it doesn't exist
     os.makedirs("uploaded_files", exist_ok=True)
 
-    # Save the uploaded file to the local filesystem
-    file_location = f"uploaded_files/{file.filename}"
+    # Save the uploaded file to the local filesystem, a chunk at a time. Each upload gets its
+    # own path, so concurrent uploads of the same name don't overwrite a file still being read
+    source = os.path.basename(file.filename)
+    file_location = os.path.join("uploaded_files", f"{uuid4().hex}_{source}")
     with open(file_location, "wb") as f:
-        content = await file.read()
-        f.write(content)
+        while chunk := await file.read(1024 * 1024):
+            f.write(chunk)
 
-    documents, uuids = text_splitter(file_location)
-    
-    # Initialize the Milvus store and add the documents
-    milvus = MilvusStore()
-    store = milvus.add_document(docs=documents, ids=uuids)
+    # Loading, embedding and inserting run as a background job, which deletes the upload when done
+    job = IngestPipeline.submit(file_location, source=source, mode=mode, delete_file=True)
+    return job
 
-    # Return the search results
-    return "success"
+
+@router.get('/split/{job_id}')
+async def split_status(job_id: str):
+    from rag.vector_stores.ingest_pipeline import IngestJobs
+
+    job = IngestJobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Ingest job not found")
+    return job
 
 
 @router.get('/graph')
@@ -0,0 +1,17 @@
+from fastapi import APIRouter, Depends
+from dependencies import require_metrics_token
+from utils.metrics_util import MetricsUtils
+from utils.response_cache_util import ResponseCache
+from utils.search_cache_util import SearchCache
+from rag.vector_stores.embedding_cache import EmbeddingCache
+
+
+router = APIRouter()
+
+@router.get("/metrics", dependencies=[Depends(require_metrics_token)])
+async def get_metrics():
+    metrics = MetricsUtils.snapshot()
+    metrics["embedding_cache"] = EmbeddingCache.stats()
+    metrics["response_cache"] = ResponseCache.stats()
+    metrics["search_cache"] = SearchCache.stats()
+    return metrics
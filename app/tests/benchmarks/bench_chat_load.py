@@ -0,0 +1,113 @@
+"""
+Throughput of /chat/custom and /chat/chat_with_doc with 1, 8, 32 and 64
+requests in flight. Serialized requests would stay at about 1/latency
+requests per second whatever the concurrency; overlapping ones scale with it.
+
+The LLM and the vector search are stubs that await a fixed latency, as a
+remote provider would, and chat history is kept in memory, so the numbers
+are the app's own overhead on top of those round trips.
+
+    python -m tests.benchmarks.bench_chat_load [rounds]    (from app/)
+"""
+import io
+import sys
+import asyncio
+import contextlib
+import time
+
+import httpx
+from fastapi import FastAPI
+from langchain_core.documents import Document
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+
+import models.chat as chat_model
+import utils.memory_util as memory_util
+from rag.vector_stores.keyword_index import KeywordIndex
+from routers import chat as chat_router
+
+# stand-ins for network round trips: one LLM call, one vector search
+LLM_LATENCY = 0.05
+RETRIEVAL_LATENCY = 0.02
+IN_FLIGHT = (1, 8, 32, 64)
+ROUTES = ("/custom", "/chat_with_doc")
+
+
+class SlowChatModel(BaseChatModel):
+    """Answers after LLM_LATENCY seconds, awaiting like a remote provider would."""
+
+    @property
+    def _llm_type(self) -> str:
+        return "slow"
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        time.sleep(LLM_LATENCY)
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content="ok"))])
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs):
+        await asyncio.sleep(LLM_LATENCY)
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content="ok"))])
+
+
+class SlowMilvus:
+    async def adocument_retriever(self, query, k=4):
+        await asyncio.sleep(RETRIEVAL_LATENCY)
+        return [Document(page_content=f"context for {query}", metadata={"source": "stub"})]
+
+
+def build_app():
+    model = chat_router.chat_controller.model
+    llm = SlowChatModel()
+    milvus = SlowMilvus()
+
+    async def aget_instance():
+        return milvus
+
+    memory_util.CHAT_HISTORY_BACKEND = "memory"
+    model.platform_utils.load_yaml_and_get_model = lambda name: ("slow-1", "slow_platform")
+    model.get_llm = lambda *args: llm
+    chat_model.MilvusStore.aget_instance = aget_instance
+    KeywordIndex._instance = KeywordIndex()
+    app = FastAPI()
+    app.include_router(chat_router.router)
+    return app
+
+
+def throughput(app, route, in_flight, rounds):
+    """Requests per second with `in_flight` requests outstanding at all times."""
+
+    async def worker(client, worker_id):
+        for turn in range(rounds):
+            response = await client.post(
+                route,
+                json={"model": "slow", "messages": f"question {worker_id}.{turn}", "temperature": 0},
+                headers={"Cookie": f"uuid=load-{worker_id}"},
+            )
+            assert response.status_code == 200, response.text
+
+    async def scenario():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            started = time.perf_counter()
+            await asyncio.gather(*(worker(client, i) for i in range(in_flight)))
+            return time.perf_counter() - started
+
+    elapsed = asyncio.run(scenario())
+    return in_flight * rounds / elapsed
+
+
+def main(rounds=2):
+    app = build_app()
+    # the routes print every prompt and response
+    with contextlib.redirect_stdout(io.StringIO()):
+        rates = {route: [throughput(app, route, n, rounds) for n in IN_FLIGHT] for route in ROUTES}
+
+    print(f"LLM {LLM_LATENCY * 1000:.0f} ms, retrieval {RETRIEVAL_LATENCY * 1000:.0f} ms, {rounds} requests per client")
+    print(f"{'route':<16}" + "".join(f"{f'{n} in flight':>14}" for n in IN_FLIGHT) + "  (req/s)")
+    for route, row in rates.items():
+        print(f"{route:<16}" + "".join(f"{rate:>14.0f}" for rate in row))
+
+
+if __name__ == "__main__":
+    main(*(int(arg) for arg in sys.argv[1:]))
@@ -0,0 +1,81 @@
+"""
+Read/search benchmark for FileOpsTool.read_file: the original directory scan
+(read every file, substring match) against the FileCabinetIndex queries.
+
+    python -m tests.benchmarks.bench_file_cabinet [files] [kib per file]    (from app/)
+"""
+import os
+import sys
+import random
+import tempfile
+import time
+
+from utils.file_cabinet_util import FileCabinetIndex
+
+WORDS = ("retrieval", "embedding", "ranking", "latency", "cache", "vector", "index", "token", "chunk", "query")
+
+
+def baseline_read(directory, query_type, value, max_results=5):
+    """read_file as it was before the index: every .txt file is opened and read in full."""
+    files = [f for f in os.listdir(directory) if f.endswith('.txt')]
+    files.sort(key=lambda x: os.path.getmtime(os.path.join(directory, x)), reverse=True)
+    results = []
+    for file in files:
+        if len(results) >= max_results:
+            break
+        with open(os.path.join(directory, file), 'r', encoding='utf-8') as f:
+            content = f.read()
+        if query_type == 'latest' \
+                or (query_type == 'by_name' and value.lower() in file.lower()) \
+                or (query_type == 'search' and value.lower() in content.lower()):
+            results.append((file, content[:500]))
+    return results
+
+
+def indexed_read(query_type, value, max_results=5):
+    if query_type == 'by_name':
+        return FileCabinetIndex.by_name(value, max_results)
+    if query_type == 'search':
+        return FileCabinetIndex.search(value, max_results)
+    return FileCabinetIndex.latest(max_results)
+
+
+def timed(func, *args, repeat=5):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        func(*args)
+    return (time.perf_counter() - start) / repeat * 1000
+
+
+def main(count=2000, kib=16):
+    rng = random.Random(7)
+    with tempfile.TemporaryDirectory() as directory:
+        for i in range(count):
+            text = " ".join(rng.choice(WORDS) for _ in range(kib * 1024 // 8))
+            if i == count // 2:
+                text += " needle-in-the-cabinet"
+            with open(os.path.join(directory, f"report_{i:05d}.txt"), "w", encoding="utf-8") as f:
+                f.write(text)
+        FileCabinetIndex.directory = directory
+        FileCabinetIndex.path = os.path.join(directory, ".cabinet_index.db")
+        start = time.perf_counter()
+        FileCabinetIndex.available()
+        print(f"{count} files x {kib} KiB, initial index build {time.perf_counter() - start:.2f}s")
+
+        cases = [
+            ("latest", "latest", ""),
+            ("by_name", "by_name", "report_0199"),
+            ("search, rare term", "search", "needle-in-the"),
+            ("search, no match", "search", "absent-term"),
+            ("search, common", "search", "embedding"),
+        ]
+        print(f"{'query':<22}{'scan ms':>10}{'index ms':>10}{'speedup':>10}")
+        for name, query_type, value in cases:
+            before = timed(baseline_read, directory, query_type, value)
+            after = timed(indexed_read, query_type, value)
+            print(f"{name:<22}{before:>10.2f}{after:>10.2f}{before / after:>9.0f}x")
+        FileCabinetIndex.stop()
+
+
+if __name__ == "__main__":
+    main(*(int(arg) for arg in sys.argv[1:]))
@@ -0,0 +1,109 @@
+"""
+Offline recall/latency benchmark for chat_with_doc retrieval: the original
+top-4 similarity search (raw Document list pasted into the prompt) against
+the HybridRetriever (BM25 + vector fused, packed into RAG_CONTEXT_TOKENS).
+
+The fixture corpus is generated: every topic has one chunk stating a fact
+about an identifier (e.g. "kx0042") and a few distractor chunks on the same
+terms without it; each query names the identifier and some of the terms.
+Milvus Lite runs in a temporary directory with the hashing embedder, so
+nothing is downloaded or called.
+
+    python -m tests.benchmarks.bench_hybrid_retrieval [topics] [distractors]    (from app/)
+"""
+import os
+import sys
+import asyncio
+import random
+import tempfile
+import time
+
+os.environ["EMBEDDING_PLATFORM"] = "local_platform"
+os.environ["EMBEDDING_MODEL"] = "hashing"
+os.environ["MILVUS_COLLECTION"] = "BenchCollection"
+
+from rag.vector_stores import milvus_db
+from rag.vector_stores.milvus_db import MilvusStore
+from rag.vector_stores.keyword_index import KeywordIndex
+from rag.vector_stores.hybrid_retriever import HybridRetriever
+from rag.vector_stores.text_splitter import chunk_id
+from utils.metrics_util import estimate_tokens
+
+SYLLABLES = ("ka", "lo", "mi", "ne", "ru", "sa", "te", "vo", "zi", "po", "da", "fe", "gu", "hi", "jo", "ba")
+FILLER = ("the", "a", "of", "and", "to", "in", "for", "with", "on", "is", "by", "when", "that", "this", "each")
+
+
+def sentence(rng, words, length):
+    return " ".join(rng.choice(words) for _ in range(length))
+
+
+def build_corpus(topics, distractors, rng):
+    """Topics have their own terms, so every topic's chunks look alike and only its fact names the identifier."""
+    vocabulary = sorted({"".join(rng.sample(SYLLABLES, 3)) for _ in range(topics * 4)})
+    texts, queries = [], []
+    for i in range(topics):
+        terms = rng.sample(vocabulary, 10)
+        words = terms + list(FILLER)
+        name = f"kx{i:04d}"
+        fact = f"The {name} service {sentence(rng, words, 40)}. {sentence(rng, words, 60)}."
+        texts.append(fact)
+        texts.extend(f"{sentence(rng, words, 50)}. {sentence(rng, words, 50)}." for _ in range(distractors))
+        queries.append((f"what does {name} do with {' '.join(rng.sample(terms, 3))}", chunk_id(fact, "bench")))
+    return texts, queries
+
+
+def seed(texts):
+    store = MilvusStore.get_instance()
+    ids = [chunk_id(text, "bench") for text in texts]
+    for start in range(0, len(texts), 256):
+        batch, batch_ids = texts[start:start + 256], ids[start:start + 256]
+        store.add_embeddings(batch, store.embedded_model.embed_documents(batch), [{"source": "bench"}] * len(batch), batch_ids)
+    index = KeywordIndex()
+    index.add(ids, texts, "bench")
+    return store, index
+
+
+async def evaluate(retrieve, render, queries):
+    hits, chunks, tokens, latencies = 0, 0, 0, []
+    for query, relevant in queries:
+        start = time.perf_counter()
+        docs = await retrieve(query)
+        latencies.append((time.perf_counter() - start) * 1000)
+        hits += any(chunk_id(doc.page_content, doc.metadata.get("source", "")) == relevant for doc in docs)
+        chunks += len(docs)
+        tokens += estimate_tokens(render(docs))
+    latencies.sort()
+    n = len(queries)
+    return hits / n, chunks / n, tokens / n, latencies[n // 2], latencies[min(int(n * 0.99), n - 1)]
+
+
+def main(topics=300, distractors=4):
+    rng = random.Random(7)
+    with tempfile.TemporaryDirectory() as directory:
+        milvus_db.URI = os.path.join(directory, "milvus_rag.db")
+        texts, queries = build_corpus(topics, distractors, rng)
+        store, index = seed(texts)
+        retriever = HybridRetriever(store, keyword_index=index)
+        # same chunk count as the baseline, to compare at an equal prompt size
+        retriever_4 = HybridRetriever(store, keyword_index=index)
+        retriever_4.max_chunks = 4
+
+        async def baseline(query):
+            # what start_chat_with_doc did before: top-4 by vector similarity
+            return await store.adocument_retriever(query, k=4)
+
+        rows = [
+            ("top-4 vector", asyncio.run(evaluate(baseline, str, queries))),
+            (f"hybrid, {retriever.max_chunks} max", asyncio.run(evaluate(retriever.aretrieve, HybridRetriever.format_context, queries))),
+            ("hybrid, 4 max", asyncio.run(evaluate(retriever_4.aretrieve, HybridRetriever.format_context, queries))),
+        ]
+        MilvusStore.close()
+
+    print(f"{len(texts)} chunks, {len(queries)} queries")
+    print(f"{'retriever':<16}{'recall':>8}{'chunks':>8}{'tokens':>8}{'p50 ms':>8}{'p99 ms':>8}")
+    for name, (recall, chunks, tokens, p50, p99) in rows:
+        print(f"{name:<16}{recall:>8.2f}{chunks:>8.1f}{tokens:>8.0f}{p50:>8.2f}{p99:>8.2f}")
+
+
+if __name__ == "__main__":
+    main(*(int(arg) for arg in sys.argv[1:]))
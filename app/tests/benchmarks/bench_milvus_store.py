@@ -0,0 +1,107 @@
+"""
+/chat/chat_with_doc latency with a MilvusStore built per request (as before)
+against the process-wide store opened once.
+
+Runs offline: Milvus Lite in a temporary directory, the hashing embedder
+(local_platform) and a stub LLM, so the numbers are the store overhead alone;
+a remote embedding client would add its connection setup to the per-request
+column on top of this.
+
+    python -m tests.benchmarks.bench_milvus_store [requests] [chunks]    (from app/)
+"""
+import io
+import os
+import sys
+import asyncio
+import contextlib
+import random
+import tempfile
+import time
+
+os.environ["EMBEDDING_PLATFORM"] = "local_platform"
+os.environ["EMBEDDING_MODEL"] = "hashing"
+os.environ["MILVUS_COLLECTION"] = "BenchCollection"
+
+import httpx
+from fastapi import FastAPI
+from langchain_core.language_models.fake_chat_models import FakeListChatModel
+
+import models.chat as chat_model
+from rag.vector_stores import milvus_db
+from rag.vector_stores.milvus_db import MilvusStore
+from rag.vector_stores.keyword_index import KeywordIndex
+from rag.vector_stores.text_splitter import chunk_id
+from routers import chat as chat_router
+from utils.concurrency_util import ConcurrencyUtils
+
+WORDS = ("retrieval", "embedding", "ranking", "latency", "cache", "vector", "index", "token", "chunk", "query",
+         "milvus", "cohere", "session", "stream", "prompt", "context", "model", "worker", "pool", "budget")
+
+
+def seed(chunks, rng):
+    store = MilvusStore()
+    texts = [" ".join(rng.choice(WORDS) for _ in range(120)) for _ in range(chunks)]
+    ids = [chunk_id(text, "bench") for text in texts]
+    for start in range(0, chunks, 256):
+        batch, batch_ids = texts[start:start + 256], ids[start:start + 256]
+        store.add_embeddings(batch, store.embedded_model.embed_documents(batch), [{"source": "bench"}] * len(batch), batch_ids)
+    index = KeywordIndex()
+    index.add(ids, texts, "bench")
+    KeywordIndex._instance = index
+
+
+def percentile(samples, q):
+    ordered = sorted(samples)
+    return ordered[min(int(len(ordered) * q), len(ordered) - 1)]
+
+
+async def run(app, requests, rng):
+    latencies = []
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        for i in range(requests):
+            # distinct questions, so the query embedding cache doesn't hide the store cost
+            question = f"{i} " + " ".join(rng.choice(WORDS) for _ in range(6))
+            start = time.perf_counter()
+            response = await client.post("/chat_with_doc", json={"model": "bench", "messages": question, "temperature": 0})
+            latencies.append((time.perf_counter() - start) * 1000)
+            assert response.status_code == 200, response.text
+    return latencies
+
+
+def main(requests=200, chunks=2000):
+    rng = random.Random(7)
+    with tempfile.TemporaryDirectory() as directory:
+        milvus_db.URI = os.path.join(directory, "milvus_rag.db")
+        os.environ["KEYWORD_INDEX_PATH"] = os.path.join(directory, "keywords.json")
+        seed(chunks, rng)
+
+        model = chat_router.chat_controller.model
+        llm = FakeListChatModel(responses=["ok"])
+        model.platform_utils.load_yaml_and_get_model = lambda name: ("bench-1", "bench_platform")
+        model.get_llm = lambda *args: llm
+        app = FastAPI()
+        app.include_router(chat_router.router)
+
+        shared = chat_model.MilvusStore.aget_instance
+
+        async def per_request_store():
+            return await ConcurrencyUtils.run_blocking(MilvusStore)
+
+        # the route prints every prompt
+        with contextlib.redirect_stdout(io.StringIO()):
+            chat_model.MilvusStore.aget_instance = per_request_store
+            before = asyncio.run(run(app, requests, rng))
+            chat_model.MilvusStore.aget_instance = shared
+            MilvusStore.get_instance()
+            after = asyncio.run(run(app, requests, rng))
+        MilvusStore.close()
+
+        print(f"{requests} sequential requests, {chunks} chunks")
+        print(f"{'store':<14}{'p50 ms':>10}{'p99 ms':>10}")
+        for name, samples in (("per request", before), ("shared", after)):
+            print(f"{name:<14}{percentile(samples, 0.5):>10.2f}{percentile(samples, 0.99):>10.2f}")
+
+
+if __name__ == "__main__":
+    main(*(int(arg) for arg in sys.argv[1:]))
@@ -0,0 +1,54 @@
+"""
+Sanitizer benchmark for ResearchReportWriter: the pre-rewrite
+content_sanitizer (per-character filter, one regex pass per rule) against
+sanitize on generated reports of growing size.
+
+    python -m tests.benchmarks.bench_report_writer [max_paragraphs]    (from app/)
+"""
+import sys
+import random
+import time
+
+from tests.test_report_writer import baseline_sanitize
+from tools.report_writer_tool import ResearchReportWriter
+
+WORDS = ("retrieval", "augmented", "generation", "improves", "answers", "with", "context", "latency",
+         "ranking", "é", "«quoted»", "3.14", "v1.2.3", "e.g.", "—")
+
+
+def build_report(paragraphs, rng):
+    """Prose with the mess scraped research text carries: CRLFs, runs of spaces, blank lines, control chars."""
+    parts = []
+    for _ in range(paragraphs):
+        sentences = [" ".join(rng.choice(WORDS) for _ in range(rng.randint(4, 16))).capitalize() + rng.choice((".", "!", "?", "..."))
+                     for _ in range(rng.randint(2, 8))]
+        text = rng.choice((" ", "  ", " \n", "\t")).join(sentences)
+        if rng.random() < 0.1:
+            text += rng.choice(("\x00", "\x07", "\x1b[0m", "​"))
+        parts.append(text)
+    return rng.choice(("\n\n", "\n\n\n\n", "\r\n\r\n")).join(parts)
+
+
+def timed(func, content, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        func(content)
+    return (time.perf_counter() - start) / repeat * 1000
+
+
+def main(max_paragraphs=20000):
+    rng = random.Random(7)
+    print(f"{'paragraphs':>10}{'size':>12}{'baseline ms':>14}{'new ms':>10}{'speedup':>10}")
+    paragraphs = 200
+    while paragraphs <= max_paragraphs:
+        report = build_report(paragraphs, rng)
+        assert ResearchReportWriter.sanitize(report) == baseline_sanitize(report)
+        repeat = max(1, 2000 // paragraphs)
+        before = timed(baseline_sanitize, report, repeat)
+        after = timed(ResearchReportWriter.sanitize, report, repeat)
+        print(f"{paragraphs:>10}{len(report):>12}{before:>14.2f}{after:>10.2f}{before / after:>9.1f}x")
+        paragraphs *= 10
+
+
+if __name__ == "__main__":
+    main(*(int(arg) for arg in sys.argv[1:]))
@@ -0,0 +1,36 @@
+"""
+Parse benchmark for WebScrapingTool: the pre-rewrite extractor (html.parser,
+one find_all per field) against _process on the fixture pages and on a
+large synthetic page.
+
+    python -m tests.benchmarks.bench_web_scraping    (from app/)
+"""
+import time
+
+from tests.test_web_scraping import PAGES, URL, baseline_scrape, load_page
+from tools.web_scrapping_tool import PARSER, WebScrapingTool
+
+
+def timed(func, html, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        func(html, URL)
+    return (time.perf_counter() - start) / repeat * 1000
+
+
+def main():
+    article = load_page("article.html")
+    body = article.split("<article>", 1)[1].split("</article>", 1)[0]
+    large = article.replace(body, body * 400)
+    cases = [(page, load_page(page), 200) for page in PAGES] + [("article x400", large, 5)]
+
+    print(f"parser: {PARSER}")
+    print(f"{'page':<20}{'size':>10}{'baseline ms':>14}{'new ms':>10}{'speedup':>10}")
+    for name, html, repeat in cases:
+        before = timed(baseline_scrape, html, repeat)
+        after = timed(WebScrapingTool._process, html, repeat)
+        print(f"{name:<20}{len(html):>10}{before:>14.2f}{after:>10.2f}{before / after:>9.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+import importlib
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import jwt
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+import routers.auth
+from database.db_connector import DBConnector
+from database.Identity import Base
+
+LOGINS = 64
+CONCURRENCY = 16
+
+
+@pytest.fixture(params=[False, True], ids=["sync", "async"])
+def client(request, monkeypatch, tmp_path):
+    # SQLite file as a local stand-in for the database server
+    monkeypatch.setenv("DB_CONNECTION", "sqlite")
+    monkeypatch.setenv("DB_ASYNC_DRIVER", "sqlite+aiosqlite")
+    monkeypatch.setenv("DB_DATABASE", str(tmp_path / "auth.db"))
+    monkeypatch.setenv("JWT_SECRET_KEY", "test-secret")
+    monkeypatch.setattr(DBConnector, "use_async", request.param)
+    for attr in ("_engine", "_session_factory", "_async_engine", "_async_session_factory"):
+        monkeypatch.setattr(DBConnector, attr, None)
+    Base.metadata.create_all(DBConnector.get_engine())
+
+    # the routes pick their session dependency when the module is imported
+    app = FastAPI()
+    app.include_router(importlib.reload(routers.auth).router, prefix="/auth")
+    with TestClient(app) as test_client:
+        yield test_client
+        test_client.portal.call(DBConnector.dispose)
+    monkeypatch.undo()
+    importlib.reload(routers.auth)
+
+
+def checked_out():
+    """Connections currently lent out by the pools the routes use."""
+    count = DBConnector.get_engine().pool.checkedout()
+    if DBConnector._async_engine is not None:
+        count += DBConnector._async_engine.sync_engine.pool.checkedout()
+    return count
+
+
+def signup(client, name):
+    return client.post("/auth/signup", json={"username": name, "email": f"{name}@example.com", "password": "secret"})
+
+
+def login(client, name, password="secret"):
+    return client.post("/auth/login", json={"email": f"{name}@example.com", "password": password})
+
+
+def test_signup_and_login(client):
+    assert signup(client, "alice").json() == "success"
+
+    response = login(client, "alice")
+    assert response.status_code == 200
+    claims = jwt.decode(response.json()["token"], "test-secret", algorithms=["HS256"])
+    assert claims == {"username": "alice", "email": "alice@example.com"}
+
+    assert login(client, "alice", password="wrong").status_code == 401
+    assert login(client, "bob").status_code == 401
+
+
+def test_uses_the_configured_session_kind(client):
+    signup(client, "alice")
+    login(client, "alice")
+    assert (DBConnector._async_engine is not None) == DBConnector.use_async
+
+
+def test_sessions_are_released(client):
+    signup(client, "alice")
+    login(client, "alice")
+    login(client, "alice", password="wrong")
+    login(client, "bob")
+    assert checked_out() == 0
+
+
+def test_concurrent_logins(client):
+    for i in range(CONCURRENCY):
+        signup(client, f"user{i}")
+
+    engine = DBConnector.get_engine()
+    started = time.perf_counter()
+    with ThreadPoolExecutor(CONCURRENCY) as pool:
+        responses = list(pool.map(lambda i: login(client, f"user{i % CONCURRENCY}"), range(LOGINS)))
+    elapsed = time.perf_counter() - started
+
+    print(f"\n{'async' if DBConnector.use_async else 'sync'}: {LOGINS} logins, "
+          f"{CONCURRENCY} in flight, {LOGINS / elapsed:.0f} logins/s")
+    assert [r.status_code for r in responses] == [200] * LOGINS
+    assert checked_out() == 0
+    # one engine per process, not one per request
+    assert DBConnector.get_engine() is engine
@@ -0,0 +1,99 @@
+import asyncio
+import random
+import re
+import uuid
+
+import httpx
+import pytest
+from fastapi import FastAPI
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+
+import utils.memory_util as memory_util
+from routers import chat as chat_router
+from utils.chat_history_util import ConversationCache, InMemoryChatHistory
+
+SESSIONS = 100
+TURNS = 3
+UUID_PATTERN = re.compile(r"[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}")
+
+
+class EchoChatModel(BaseChatModel):
+    """Answers "echo: <question>" after a random delay, so concurrent runs interleave."""
+
+    max_delay: float = 0.01
+    prompts: dict = {}
+
+    @property
+    def _llm_type(self) -> str:
+        return "echo"
+
+    def _reply(self, messages):
+        prompt = str(messages[-1].content)
+        question = prompt.rsplit("Human:", 1)[1].split("\nAI:", 1)[0].strip()
+        self.prompts[question] = prompt
+        # report the prompt length as its usage, to tell apart whose callbacks counted it
+        message = AIMessage(content=f"echo: {question}",
+                            usage_metadata={"input_tokens": len(prompt), "output_tokens": 1,
+                                            "total_tokens": len(prompt) + 1})
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        return self._reply(messages)
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs):
+        await asyncio.sleep(random.uniform(0, self.max_delay))
+        return self._reply(messages)
+
+
+@pytest.fixture
+def echo_llm(monkeypatch):
+    llm = EchoChatModel(prompts={})
+    model = chat_router.chat_controller.model
+    monkeypatch.setattr(memory_util, "CHAT_HISTORY_BACKEND", "memory")
+    monkeypatch.setattr(model.platform_utils, "load_yaml_and_get_model", lambda name: ("echo-1", "echo_platform"))
+    monkeypatch.setattr(model, "get_llm", lambda *args: llm)
+    InMemoryChatHistory.reset()
+    yield llm
+    InMemoryChatHistory.reset()
+    ConversationCache._windows.clear()
+    ConversationCache._pending.clear()
+
+
+def test_overlapping_custom_chats_keep_their_sessions(echo_llm):
+    app = FastAPI()
+    app.include_router(chat_router.router)
+    sessions = [str(uuid.uuid4()) for _ in range(SESSIONS)]
+
+    async def converse(client, session):
+        replies = []
+        for turn in range(TURNS):
+            response = await client.post(
+                "/custom",
+                json={"model": "echo", "messages": f"{session} turn {turn}", "temperature": 0},
+                headers={"Cookie": f"uuid={session}"},
+            )
+            assert response.status_code == 200
+            replies.append(response.json()["response"])
+        return replies
+
+    async def scenario():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            return await asyncio.gather(*(converse(client, session) for session in sessions))
+
+    results = asyncio.run(scenario())
+
+    assert len(echo_llm.prompts) == SESSIONS * TURNS
+    for session, replies in zip(sessions, results):
+        for turn, reply in enumerate(replies):
+            question = f"{session} turn {turn}"
+            prompt = echo_llm.prompts[question]
+            assert reply["content"] == f"echo: {question}"
+            # the usage counted for this request is that of its own LLM call
+            assert reply["response_metadata"]["token_usage"]["prompt_tokens"] == len(prompt)
+            # the history the chain saw holds this session's earlier turns and nobody else's
+            assert set(UUID_PATTERN.findall(prompt)) == {session}
+            for earlier in range(turn):
+                assert f"echo: {session} turn {earlier}" in prompt
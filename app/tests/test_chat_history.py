@@ -0,0 +1,164 @@
+import asyncio
+
+import pytest
+from langchain_core.messages import AIMessage, HumanMessage
+
+import utils.memory_util as memory_util
+from utils.chat_history_util import (
+    CachedChatHistory, ConversationCache, InMemoryChatHistory, RedisChatHistory, UpstashChatHistory,
+)
+from utils.memory_util import MemoryUtils
+
+
+@pytest.fixture(autouse=True)
+def clean():
+    InMemoryChatHistory.reset()
+    ConversationCache._windows.clear()
+    ConversationCache._pending.clear()
+    yield
+    InMemoryChatHistory.reset()
+    ConversationCache._windows.clear()
+    ConversationCache._pending.clear()
+
+
+def test_writes_are_served_from_the_cache_before_the_flush():
+    history = CachedChatHistory(InMemoryChatHistory(session_id="s1"), window=4)
+    history.add_messages([HumanMessage(content="hi"), AIMessage(content="hello")])
+    assert [m.content for m in history.messages] == ["hi", "hello"]
+    assert InMemoryChatHistory(session_id="s1").messages == []
+
+
+def test_stop_flushes_pending_writes():
+    async def scenario():
+        ConversationCache.start()
+        history = CachedChatHistory(InMemoryChatHistory(session_id="s1"), window=4)
+        await history.aadd_messages([HumanMessage(content="hi"), AIMessage(content="hello")])
+        # shutdown comes before the next periodic flush
+        await ConversationCache.stop()
+
+    asyncio.run(scenario())
+    assert [m.content for m in InMemoryChatHistory(session_id="s1").messages] == ["hi", "hello"]
+
+
+class FakeRedis:
+    """The list commands the histories use, over a dict; records every LRANGE."""
+
+    def __init__(self):
+        self.lists = {}
+        self.ranges = []
+
+    def lpush(self, key, *values):
+        self.lists.setdefault(key, [])[:0] = reversed(values)
+
+    def lrange(self, key, start, end):
+        self.ranges.append((start, end))
+        items = self.lists.get(key, [])
+        return items[start:] if end == -1 else items[start:end + 1]
+
+    def llen(self, key):
+        return len(self.lists.get(key, []))
+
+    def ltrim(self, key, start, end):
+        self.lists[key] = self.lrange(key, start, end)
+
+    def expire(self, key, ttl):
+        pass
+
+    def delete(self, key):
+        self.lists.pop(key, None)
+
+    def pipeline(self, transaction=False):
+        return FakePipeline(self)
+
+
+class FakePipeline:
+    def __init__(self, client):
+        self.client = client
+        self.commands = []
+
+    def __getattr__(self, name):
+        return lambda *args: self.commands.append((name, args))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        pass
+
+    def execute(self):
+        for name, args in self.commands:
+            getattr(self.client, name)(*args)
+
+
+class FakeAsyncRedis:
+    def __init__(self, client):
+        self.client = client
+
+    def __getattr__(self, name):
+        async def call(*args):
+            return getattr(self.client, name)(*args)
+        return call
+
+    def pipeline(self, transaction=False):
+        return FakeAsyncPipeline(self.client)
+
+
+class FakeAsyncPipeline(FakePipeline):
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        pass
+
+    async def execute(self):
+        FakePipeline.execute(self)
+
+
+@pytest.fixture
+def redis(monkeypatch):
+    client = FakeRedis()
+    monkeypatch.setattr(RedisChatHistory, "get_client", classmethod(lambda cls: client))
+    monkeypatch.setattr(RedisChatHistory, "get_async_client", classmethod(lambda cls: FakeAsyncRedis(client)))
+    return client
+
+
+def turns(count):
+    return [HumanMessage(content=f"q{i}") if i % 2 == 0 else AIMessage(content=f"a{i}") for i in range(count)]
+
+
+def test_redis_history_reads_only_the_window(redis):
+    history = RedisChatHistory(session_id="s1", window=4)
+    history.add_messages(turns(10))
+    assert [m.content for m in history.messages] == ["q6", "a7", "q8", "a9"]
+    assert redis.ranges == [(0, 3)]
+    assert [m.content for m in asyncio.run(history.aget_messages())] == ["q6", "a7", "q8", "a9"]
+    assert [m.content for m in RedisChatHistory(session_id="s1").messages][:2] == ["q0", "a1"]
+
+
+def test_redis_history_trims_and_reads_after_an_offset(redis):
+    history = RedisChatHistory(session_id="s1", max_length=6)
+    asyncio.run(history.aadd_messages(turns(10)))
+    assert [m.content for m in history.messages] == ["q4", "a5", "q6", "a7", "q8", "a9"]
+    assert [m.content for m in asyncio.run(history.aget_messages_after(4))] == ["q8", "a9"]
+    assert history.get_messages_after(6) == []
+    history.clear()
+    assert history.messages == []
+
+
+def test_upstash_histories_share_one_client_and_read_only_the_window(monkeypatch):
+    import upstash_redis
+
+    created = []
+    monkeypatch.setattr(upstash_redis, "Redis", lambda **kwargs: created.append(FakeRedis()) or created[-1])
+    monkeypatch.setattr(UpstashChatHistory, "_client", None)
+    monkeypatch.setattr(memory_util, "CHAT_HISTORY_BACKEND", "upstash")
+    monkeypatch.setattr(memory_util, "CHAT_HISTORY_CACHE", False)
+
+    first = MemoryUtils().init_history("s1", window=2)
+    second = MemoryUtils().init_history("s2", window=2)
+    first.add_messages(turns(6))
+    second.add_messages(turns(2))
+    assert [m.content for m in first.messages] == ["q4", "a5"]
+    assert [m.content for m in second.messages] == ["q0", "a1"]
+    assert len(created) == 1
+    assert created[0].ranges == [(0, 1), (0, 1)]
@@ -0,0 +1,91 @@
+import multiprocessing
+
+import pytest
+
+pytest.importorskip("fcntl")
+
+from rag.vector_stores.embedding_cache import EmbeddingCache
+
+DIM = 8
+ROWS = 64
+
+
+def vector_for(query):
+    seed = sum(query.encode())
+    return [float(seed + i) for i in range(DIM)]
+
+
+@pytest.fixture
+def disk_cache(tmp_path, monkeypatch):
+    monkeypatch.setattr(EmbeddingCache, "disk_path", str(tmp_path / "embeddings"))
+    monkeypatch.setattr(EmbeddingCache, "disk_rows", ROWS)
+    reopen()
+    yield
+    reopen()
+
+
+def reopen():
+    # drop everything this process holds, as a restarted worker would
+    EmbeddingCache._entries.clear()
+    EmbeddingCache._vectors = EmbeddingCache._keys = EmbeddingCache._meta = None
+
+
+def write_queries(path, worker, count):
+    EmbeddingCache.disk_path = path
+    EmbeddingCache.disk_rows = ROWS
+    for i in range(count):
+        query = f"worker {worker} query {i}"
+        EmbeddingCache._write_disk(EmbeddingCache._key("model", query), vector_for(query))
+
+
+def test_vectors_survive_restart(disk_cache):
+    EmbeddingCache._write_disk(EmbeddingCache._key("model", "what is bm25"), vector_for("what is bm25"))
+    reopen()
+    assert EmbeddingCache.get("model", "What  is BM25") == vector_for("what is bm25")
+    assert EmbeddingCache.get("other-model", "what is bm25") is None
+
+
+def test_workers_never_map_a_key_to_another_vector(disk_cache):
+    # four processes race on a ring smaller than what they write, so rows get reused
+    ctx = multiprocessing.get_context("spawn")
+    workers = [ctx.Process(target=write_queries, args=(EmbeddingCache.disk_path, w, 40)) for w in range(4)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join(timeout=60)
+        assert worker.exitcode == 0
+
+    reopen()
+    found = 0
+    for w in range(4):
+        for i in range(40):
+            query = f"worker {w} query {i}"
+            vector = EmbeddingCache._read_disk(EmbeddingCache._key("model", query))
+            if vector is not None:
+                assert vector == vector_for(query)
+                found += 1
+    # every row of the ring holds exactly one live key
+    assert found == ROWS
+    assert len(set(EmbeddingCache._keys.tolist())) == ROWS
+
+
+def test_rows_written_by_other_workers_after_open_are_found(disk_cache):
+    write_queries(EmbeddingCache.disk_path, 0, 1)
+    # this worker maps the files now, the others keep writing afterwards
+    assert EmbeddingCache.get("model", "worker 0 query 0") == vector_for("worker 0 query 0")
+    ctx = multiprocessing.get_context("spawn")
+    worker = ctx.Process(target=write_queries, args=(EmbeddingCache.disk_path, 1, 10))
+    worker.start()
+    worker.join(timeout=60)
+    assert worker.exitcode == 0
+    for i in range(10):
+        assert EmbeddingCache._read_disk(EmbeddingCache._key("model", f"worker 1 query {i}")) == vector_for(f"worker 1 query {i}")
+
+
+def test_lapped_rows_are_misses(disk_cache):
+    write_queries(EmbeddingCache.disk_path, 0, 1)
+    assert EmbeddingCache._read_disk(EmbeddingCache._key("model", "worker 0 query 0")) is not None
+    # a whole lap of the ring between two lookups
+    write_queries(EmbeddingCache.disk_path, 1, ROWS)
+    assert EmbeddingCache._read_disk(EmbeddingCache._key("model", "worker 0 query 0")) is None
+    assert EmbeddingCache._read_disk(EmbeddingCache._key("model", f"worker 1 query {ROWS - 1}")) == vector_for(f"worker 1 query {ROWS - 1}")
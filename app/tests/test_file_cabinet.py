@@ -0,0 +1,116 @@
+import os
+import sqlite3
+import threading
+
+import pytest
+
+from tools.file_ops_tool import FileOpsTool
+from utils.file_cabinet_util import FileCabinetIndex
+
+FILES = {
+    "release.txt": "Version 2.4 brings incremental re-indexing of documents.",
+    "bread.txt": "Feed the sourdough Starter every twelve hours.",
+    "notes.txt": "BM25 saturates term frequency; see the Okapi paper.",
+    "page.html": "<p>The index page lists every document.</p>",
+}
+
+
+def reset_index():
+    FileCabinetIndex.stop()
+    FileCabinetIndex._unavailable = False
+    FileCabinetIndex._trigram = True
+
+
+@pytest.fixture
+def cabinet(tmp_path, monkeypatch):
+    monkeypatch.setattr(FileCabinetIndex, "directory", str(tmp_path))
+    monkeypatch.setattr(FileCabinetIndex, "path", str(tmp_path / ".cabinet_index.db"))
+    monkeypatch.setattr(FileOpsTool, "base_directory", str(tmp_path))
+    for i, (name, content) in enumerate(FILES.items()):
+        path = tmp_path / name
+        path.write_text(content, encoding="utf-8")
+        os.utime(path, (1_000_000 + i, 1_000_000 + i))
+    reset_index()
+    yield tmp_path
+    reset_index()
+
+
+def scan(directory, value):
+    """What a plain scan returns: every file containing `value`, newest first."""
+    names = sorted(os.listdir(directory), key=lambda name: os.path.getmtime(os.path.join(directory, name)), reverse=True)
+    matches = []
+    for name in names:
+        if name.endswith(FileCabinetIndex.EXTENSIONS):
+            with open(os.path.join(directory, name), encoding="utf-8") as f:
+                if value.lower() in f.read().lower():
+                    matches.append(name)
+    return matches
+
+
+@pytest.mark.parametrize("scan_first", [0, FileCabinetIndex.SEARCH_SCAN_FIRST])
+@pytest.mark.parametrize("value", ["index", "ndex", "STARTER", "bm", "e", "re-index", "okapi paper", "absent", '"quoted"'])
+def test_search_keeps_substring_semantics(cabinet, monkeypatch, value, scan_first):
+    # scan_first=0 narrows every search through the FTS index
+    monkeypatch.setattr(FileCabinetIndex, "SEARCH_SCAN_FIRST", scan_first)
+    assert [name for name, _ in FileCabinetIndex.search(value, 10)] == scan(cabinet, value)
+
+
+def test_writes_are_not_blocked_by_a_running_search(cabinet, monkeypatch):
+    snippet = FileCabinetIndex.snippet
+    written = []
+
+    def write_while_scanning(content, match):
+        # another thread indexes a file while this search is between rows
+        writer = threading.Thread(target=lambda: written.append(FileCabinetIndex.index_file("bread.txt")))
+        writer.start()
+        writer.join(timeout=2)
+        return snippet(content, match)
+
+    FileCabinetIndex.available()
+    monkeypatch.setattr(FileCabinetIndex, "snippet", staticmethod(write_while_scanning))
+    assert [name for name, _ in FileCabinetIndex.search("e", 1)] == scan(cabinet, "e")[:1]
+    assert written == [None]
+
+
+def test_search_without_trigram_tokenizer(cabinet, monkeypatch):
+    monkeypatch.setattr(FileCabinetIndex, "SEARCH_SCAN_FIRST", 0)
+    monkeypatch.setattr(FileCabinetIndex, "_trigram", False)
+    assert [name for name, _ in FileCabinetIndex.search("ndex", 10)] == scan(cabinet, "ndex")
+
+
+def test_empty_search_lists_latest(cabinet):
+    assert FileCabinetIndex.search("", 2) == FileCabinetIndex.latest(2)
+    assert [name for name, _ in FileCabinetIndex.latest(2)] == ["page.html", "notes.txt"]
+
+
+def test_search_snippet_is_centred_on_the_match(cabinet):
+    (cabinet / "long.txt").write_text("a" * 1000 + " needle " + "b" * 1000, encoding="utf-8")
+    FileCabinetIndex.sync()
+    (name, snippet), = FileCabinetIndex.search("NEEDLE", 5)
+    assert name == "long.txt"
+    assert snippet.startswith("...") and snippet.endswith("...")
+    assert "needle" in snippet
+    assert len(snippet) <= FileCabinetIndex.EXCERPT_CHARS + 6
+
+
+def test_word_tokenizer_index_is_rebuilt(cabinet, monkeypatch):
+    assert FileCabinetIndex.available()
+    FileCabinetIndex.stop()
+    db = sqlite3.connect(FileCabinetIndex.path)
+    db.execute("DROP TABLE files_fts")
+    db.execute("CREATE VIRTUAL TABLE files_fts USING fts5(name, content)")
+    db.commit()
+    db.close()
+    reset_index()
+    monkeypatch.setattr(FileCabinetIndex, "SEARCH_SCAN_FIRST", 0)
+    assert [name for name, _ in FileCabinetIndex.search("ndex", 10)] == scan(cabinet, "ndex")
+
+
+def test_write_succeeds_when_indexing_fails(cabinet, monkeypatch):
+    def broken(*args, **kwargs):
+        raise sqlite3.OperationalError("database is locked")
+
+    monkeypatch.setattr(FileCabinetIndex, "index_file", broken)
+    result = FileOpsTool.write_file.invoke({"content": "saved anyway", "filename": "saved.txt"})
+    assert result.startswith("Content successfully saved")
+    assert (cabinet / "saved.txt").read_text(encoding="utf-8") == "saved anyway"
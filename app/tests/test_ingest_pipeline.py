@@ -0,0 +1,120 @@
+import asyncio
+import os
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from langchain_core.documents import Document
+
+from rag.vector_stores import ingest_pipeline
+from rag.vector_stores.ingest_manifest import IngestManifest
+from rag.vector_stores.ingest_pipeline import IngestJobs, IngestPipeline
+from rag.vector_stores.keyword_index import KeywordIndex
+from routers import chat as chat_router
+
+
+class FakeEmbeddings:
+    async def aembed_documents(self, texts):
+        return [[float(len(text)), 1.0] for text in texts]
+
+
+class FakeStore:
+    """Records what would have gone into Milvus; `fail` makes every insert raise."""
+
+    def __init__(self, fail=False):
+        self.embedded_model = FakeEmbeddings()
+        self.fail = fail
+        self.rows = {}
+
+    def add_embeddings(self, texts, embeddings, metadatas, ids):
+        if self.fail:
+            raise RuntimeError("milvus is down")
+        self.rows.update(zip(ids, texts))
+        return len(ids)
+
+    def delete_document(self, ids):
+        for doc_id in ids:
+            self.rows.pop(doc_id, None)
+
+
+class LineLoader:
+    """Every line of the file is a page."""
+
+    def pdf_lazy_loader(self, file_path):
+        with open(file_path, encoding="utf-8") as f:
+            for line in f:
+                yield Document(page_content=line.strip())
+
+
+@pytest.fixture
+def pipeline(monkeypatch, tmp_path):
+    store = FakeStore()
+
+    async def aget_instance():
+        return store
+
+    monkeypatch.setattr(ingest_pipeline.MilvusStore, "aget_instance", aget_instance)
+    monkeypatch.setattr(ingest_pipeline, "LocalDocsLoader", LineLoader)
+    monkeypatch.setattr(IngestManifest, "directory", str(tmp_path / "manifests"))
+    monkeypatch.setattr(KeywordIndex, "path", str(tmp_path / "keywords.json"))
+    monkeypatch.setattr(KeywordIndex, "_instance", KeywordIndex())
+    monkeypatch.setattr(IngestPipeline, "max_retries", 0)
+    return store
+
+
+def upload(tmp_path, lines):
+    path = tmp_path / "upload.txt"
+    path.write_text("\n".join(lines), encoding="utf-8")
+    return str(path)
+
+
+def run(file_path, **kwargs):
+    async def scenario():
+        job = IngestPipeline.submit(file_path, **kwargs)
+        assert IngestJobs.get(job["job_id"])["status"] == "queued"
+        await asyncio.gather(*IngestPipeline._tasks)
+        return IngestJobs.get(job["job_id"])
+
+    return asyncio.run(scenario())
+
+
+def test_submitted_job_completes_and_reports_its_counts(pipeline, tmp_path):
+    job = run(upload(tmp_path, ["first page", "second page", "first page"]), source="doc.pdf", delete_file=True)
+    assert job["status"] == "completed" and job["error"] is None
+    assert (job["chunks"], job["inserted"], job["skipped"]) == (3, 2, 1)
+    assert sorted(pipeline.rows.values()) == ["first page", "second page"]
+    assert len(IngestManifest.load("doc.pdf")) == 2
+    assert not os.path.exists(tmp_path / "upload.txt")
+
+
+def test_a_failing_insert_fails_the_job(pipeline, tmp_path):
+    pipeline.fail = True
+    job = run(upload(tmp_path, ["first page"]), source="doc.pdf", delete_file=True)
+    assert job["status"] == "failed"
+    assert job["error"] == "milvus is down"
+    assert job["finished_at"] is not None
+    assert not os.path.exists(tmp_path / "upload.txt")
+
+
+def test_files_are_kept_unless_asked(pipeline, tmp_path):
+    run(upload(tmp_path, ["first page"]), source="doc.pdf")
+    assert os.path.exists(tmp_path / "upload.txt")
+
+
+def test_split_route_validates_before_saving_and_keeps_uploads_apart(monkeypatch, tmp_path):
+    monkeypatch.chdir(tmp_path)
+    submitted = []
+    monkeypatch.setattr(IngestPipeline, "submit", lambda path, **kwargs: submitted.append((path, kwargs)) or {"job_id": "1"})
+    app = FastAPI()
+    app.include_router(chat_router.router)
+    client = TestClient(app)
+
+    response = client.post("/split", params={"mode": "bogus"}, files={"file": ("doc.pdf", b"data")})
+    assert response.status_code == 400
+    assert not os.path.exists("uploaded_files")
+
+    for _ in range(2):
+        assert client.post("/split", files={"file": ("doc.pdf", b"data")}).status_code == 200
+    (first, first_kwargs), (second, second_kwargs) = submitted
+    assert first != second
+    assert first_kwargs == second_kwargs == {"source": "doc.pdf", "mode": "incremental", "delete_file": True}
@@ -0,0 +1,59 @@
+import json
+
+import pytest
+
+from rag.vector_stores.keyword_index import KeywordIndex
+
+
+@pytest.fixture
+def workers(monkeypatch, tmp_path):
+    """Two indexes over one file, as two workers on the same host would have."""
+    monkeypatch.setattr(KeywordIndex, "path", str(tmp_path / "keywords.json"))
+    monkeypatch.setattr(KeywordIndex, "refresh_interval", 0)
+    first, second = KeywordIndex(), KeywordIndex()
+    first.load()
+    second.load()
+    return first, second
+
+
+def stored_ids():
+    with open(KeywordIndex.path, encoding="utf-8") as f:
+        return set(json.load(f)["docs"])
+
+
+def test_saves_from_two_workers_are_merged(workers):
+    first, second = workers
+    first.add(["a"], ["milvus stores the vectors"], "one.pdf")
+    second.add(["b"], ["bm25 scores the keywords"], "two.pdf")
+    first.save()
+    second.save()
+    assert stored_ids() == {"a", "b"}
+    # the second worker picked up the first one's chunk while merging
+    assert "a" in second
+
+
+def test_searches_reload_after_another_worker_saves(workers):
+    first, second = workers
+    assert first.search("keywords") == []
+    version = first.version
+    second.add(["b"], ["bm25 scores the keywords"], "two.pdf")
+    second.save()
+    assert [doc_id for doc_id, _ in first.search("keywords")] == ["b"]
+    assert first.version > version
+    assert first.get("b").metadata == {"source": "two.pdf", "pk": "b"}
+
+
+def test_unsaved_changes_survive_a_reload(workers):
+    first, second = workers
+    second.add(["a", "b"], ["milvus stores the vectors", "bm25 scores the keywords"], "shared.pdf")
+    second.save()
+    first.search("anything")
+    first.remove(["a"])
+    first.add(["c"], ["rerank the fused candidates"], "three.pdf")
+    second.add(["d"], ["chunks carry their source"], "four.pdf")
+    second.save()
+
+    first.search("anything")
+    assert "a" not in first and "c" in first and "d" in first
+    first.save()
+    assert stored_ids() == {"b", "c", "d"}
@@ -0,0 +1,44 @@
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from routers.metrics import router
+from utils.metrics_util import MetricsUtils
+
+
+USAGE = {"prompt_tokens": 3, "completion_tokens": 2, "total_tokens": 5}
+
+
+def setup_function():
+    MetricsUtils.reset()
+
+
+def test_snapshot_hides_session_ids():
+    MetricsUtils.record("secret-session", "model-a", USAGE)
+    sessions = MetricsUtils.snapshot()["sessions"]
+    assert "secret-session" not in sessions
+    assert sessions[MetricsUtils.session_label("secret-session")]["total_tokens"] == 5
+
+
+def test_sessions_are_capped_least_recent_first(monkeypatch):
+    monkeypatch.setattr(MetricsUtils, "max_sessions", 2)
+    for session_id in ("a", "b", "a", "c"):
+        MetricsUtils.record(session_id, "model-a", USAGE)
+    snapshot = MetricsUtils.snapshot()
+    assert set(snapshot["sessions"]) == {MetricsUtils.session_label("a"), MetricsUtils.session_label("c")}
+    assert snapshot["totals"]["requests"] == 4
+
+
+def test_metrics_endpoint_needs_token(monkeypatch):
+    app = FastAPI()
+    app.include_router(router)
+    client = TestClient(app)
+
+    monkeypatch.delenv("METRICS_TOKEN", raising=False)
+    assert client.get("/metrics").status_code == 404
+
+    monkeypatch.setenv("METRICS_TOKEN", "s3cret")
+    assert client.get("/metrics").status_code == 401
+    assert client.get("/metrics", headers={"Authorization": "Bearer wrong"}).status_code == 401
+    response = client.get("/metrics", headers={"Authorization": "Bearer s3cret"})
+    assert response.status_code == 200
+    assert "totals" in response.json()
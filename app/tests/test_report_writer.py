@@ -0,0 +1,71 @@
+import random
+import re
+
+import pytest
+
+from tools.report_writer_tool import ResearchReportWriter
+
+
+def baseline_sanitize(content):
+    """content_sanitizer as it was before the single-pass rewrite."""
+    content = str(content)
+    content = ''.join(char for char in content if char.isprintable() or char in '\n\t')
+    content = content.replace('\r\n', '\n').replace('\r', '\n')
+    content = re.sub(r'([.!?])\s*', r'\1 ', content)
+    content = re.sub(r' +', ' ', content)
+    content = re.sub(r'\n{3,}', '\n\n', content)
+    return content.strip()
+
+
+CASES = [
+    "",
+    "   ",
+    "One sentence. Two sentences!  Three?Four.",
+    "Ends with a period.",
+    "Trailing spaces after the end.   ",
+    "Windows\r\nline\r\nendings.\r\n",
+    "Lone\rcarriage return.",
+    "Tabs\tstay.\tAfter a period\ttoo.",
+    "Paragraph one.\n\n\n\nParagraph two.\n\n\nThree.",
+    "Dot then newline.\nNext line.\n\nNext paragraph.",
+    "Ellipsis... and more!!! Really??",
+    "Decimal 3.14 and v1.2.3 and e.g. abbreviations.",
+    "Control\x00chars\x07and\x1b[0mescapes\x7f.",
+    "Zero​width and no-break separators.",
+    "Unicode — dashes, «quotes», and emoji 🎉. Done.",
+    "Period then two spaces.  Next.",
+    "Period, space, newline. \nNext.",
+    "Mixed .\t\n  whitespace ! after ?\n\n\n\n marks.",
+    12345,
+    {"not": "a string."},
+]
+
+
+@pytest.mark.parametrize("content", CASES, ids=range(len(CASES)))
+def test_sanitize_matches_baseline(content):
+    assert ResearchReportWriter.sanitize(content) == baseline_sanitize(content)
+
+
+def test_sanitize_matches_baseline_on_random_text():
+    alphabet = "ab .!?,\n\n\t\r  \x00\x0b\x0c\x1f\x85  ​ 　é🎉"
+    rng = random.Random(1234)
+    for _ in range(5000):
+        content = "".join(rng.choice(alphabet) for _ in range(rng.randint(0, 40)))
+        assert ResearchReportWriter.sanitize(content) == baseline_sanitize(content), repr(content)
+
+
+def test_sanitize_matches_baseline_on_prose():
+    rng = random.Random(99)
+    words = ["retrieval", "augmented", "generation", "improves", "answers", "with", "context"]
+    paragraphs = []
+    for _ in range(200):
+        sentences = [" ".join(rng.choice(words) for _ in range(rng.randint(3, 12))).capitalize() + rng.choice(".!?")
+                     for _ in range(rng.randint(1, 6))]
+        paragraphs.append(rng.choice([" ", "  ", " \n"]).join(sentences))
+    content = rng.choice(["\n\n", "\n\n\n", "\r\n\r\n"]).join(paragraphs)
+    assert ResearchReportWriter.sanitize(content) == baseline_sanitize(content)
+
+
+def test_tool_delegates_to_sanitize():
+    content = "Hello.World  again.\r\n\n\n\nBye!"
+    assert ResearchReportWriter.content_sanitizer.invoke({"content": content}) == baseline_sanitize(content)
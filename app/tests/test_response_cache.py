@@ -0,0 +1,62 @@
+import asyncio
+
+import numpy as np
+import pytest
+
+from utils.response_cache_util import ResponseCache
+
+
+@pytest.fixture
+def cache(monkeypatch):
+    monkeypatch.setattr(ResponseCache, "enabled", True)
+    monkeypatch.setattr(ResponseCache, "similarity_threshold", 0.9)
+    monkeypatch.setattr(ResponseCache, "shared_versions", False)
+    embedded = []
+
+    async def fake_embed(text):
+        embedded.append(str(text))
+        # "refund" questions point one way, everything else the other
+        vector = np.array([1.0, 0.0] if "refund" in str(text) else [0.0, 1.0], dtype=np.float32)
+        return vector
+
+    monkeypatch.setattr(ResponseCache, "_aembed", fake_embed)
+    ResponseCache.clear()
+    yield embedded
+    ResponseCache.clear()
+
+
+def test_put_does_not_embed(cache):
+    scope = ResponseCache.scope("chat", "model", 0)
+    asyncio.run(ResponseCache.aput(scope, "How do refunds work?", "answer"))
+    assert cache == []
+
+
+def test_exact_hit_needs_no_embedding(cache):
+    scope = ResponseCache.scope("chat", "model", 0)
+    asyncio.run(ResponseCache.aput(scope, "How do  refunds work?", "answer"))
+    assert asyncio.run(ResponseCache.aget(scope, "how do refunds work?")) == "answer"
+    assert cache == []
+
+
+def test_entries_are_embedded_once_on_first_semantic_lookup(cache):
+    scope = ResponseCache.scope("chat", "model", 0)
+    asyncio.run(ResponseCache.aput(scope, "How do refunds work?", "answer"))
+    assert asyncio.run(ResponseCache.aget(scope, "Explain the refund process")) == "answer"
+    assert asyncio.run(ResponseCache.aget(scope, "What about shipping?")) is None
+    assert cache == ["Explain the refund process", "How do refunds work?", "What about shipping?"]
+
+
+def test_empty_scope_lookup_does_not_embed(cache):
+    assert asyncio.run(ResponseCache.aget(ResponseCache.scope("other"), "anything")) is None
+    assert cache == []
+
+
+def test_bumped_version_moves_to_a_fresh_scope(cache):
+    async def scenario():
+        before = ResponseCache.scope("chat_with_doc", await ResponseCache.aversion("corpus"))
+        await ResponseCache.aput(before, "What is BM25?", "old answer")
+        await ResponseCache.abump("corpus")
+        after = ResponseCache.scope("chat_with_doc", await ResponseCache.aversion("corpus"))
+        return before != after and await ResponseCache.aget(after, "What is BM25?") is None
+
+    assert asyncio.run(scenario())
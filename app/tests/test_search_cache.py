@@ -0,0 +1,91 @@
+import sqlite3
+import threading
+import time
+
+import pytest
+from exa_py.api import Result
+
+import tools.online_search_tool as online_search_tool
+from tools.online_search_tool import OnlineSearchTool
+from utils.search_cache_util import SearchCache
+
+
+@pytest.fixture
+def cache(monkeypatch, tmp_path):
+    monkeypatch.setattr(SearchCache, "enabled", True)
+    monkeypatch.setattr(SearchCache, "path", str(tmp_path / "search_cache.db"))
+    SearchCache.close()
+    SearchCache._entries.clear()
+    yield SearchCache
+    SearchCache.close()
+    SearchCache._entries.clear()
+
+
+def restart():
+    """Drops the in-memory tier and the connection, as a new worker would start."""
+    SearchCache.close()
+    SearchCache._entries.clear()
+
+
+def test_results_survive_a_restart_as_json(cache):
+    results = [{"title": "BM25", "link": "https://example.com", "rank": 1}]
+    assert cache.fetch("ddg", "what is bm25", lambda: results) == results
+    restart()
+    assert cache.fetch("ddg", "What is  BM25", lambda: pytest.fail("should be cached")) == results
+
+    raw, = sqlite3.connect(cache.path).execute("SELECT value FROM search_cache").fetchone()
+    assert isinstance(raw, str)
+
+
+def test_exa_results_are_cached_as_plain_data(cache, monkeypatch):
+    class FakeExa:
+        calls = 0
+
+        def __init__(self, api_key):
+            pass
+
+        def search(self, query, **kwargs):
+            FakeExa.calls += 1
+            return type("SearchResponse", (), {"results": [Result(url="https://example.com/a", id="a", title="A")]})()
+
+    monkeypatch.setattr(online_search_tool, "Exa", FakeExa)
+    first = OnlineSearchTool.exa_search.func("query")
+    restart()
+    assert OnlineSearchTool.exa_search.func("query") == first
+    assert FakeExa.calls == 1
+    assert OnlineSearchTool._normalize_results("exa", first) == [{"title": "A", "url": "https://example.com/a", "snippet": ""}]
+
+
+def test_stale_results_are_served_while_refreshing(cache, monkeypatch):
+    monkeypatch.setenv("SEARCH_CACHE_TTL_DDG", "0")
+    cache.fetch("ddg", "query", lambda: ["old"])
+    refreshed = threading.Event()
+
+    def search():
+        refreshed.set()
+        return ["new"]
+
+    time.sleep(0.01)
+    assert cache.fetch("ddg", "query", search) == ["old"]
+    assert refreshed.wait(5)
+    for _ in range(100):
+        if cache._entries[cache._key("ddg", "query", ())][0] == ["new"]:
+            break
+        time.sleep(0.01)
+    assert cache._entries[cache._key("ddg", "query", ())][0] == ["new"]
+
+
+def test_errors_are_not_cached(cache):
+    assert cache.fetch("ddg", "query", lambda: [{"error": "rate limited"}]) == [{"error": "rate limited"}]
+    assert cache.fetch("ddg", "query", lambda: ["ok"]) == ["ok"]
+
+
+def test_memory_hits_do_not_wait_on_the_database(cache):
+    cache.fetch("ddg", "query", lambda: ["x"])
+    result = []
+    with cache._db_lock:
+        # a slow write holding the connection elsewhere
+        reader = threading.Thread(target=lambda: result.append(cache.fetch("ddg", "query", lambda: ["y"])))
+        reader.start()
+        reader.join(timeout=2)
+        assert result == [["x"]]
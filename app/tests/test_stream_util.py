@@ -0,0 +1,156 @@
+import asyncio
+import json
+
+import pytest
+from langchain_core.language_models.fake_chat_models import FakeListChatModel
+
+import utils.memory_util as memory_util
+from models.chat import GenerativeModel
+from utils.chat_history_util import InMemoryChatHistory
+from utils.stream_util import StreamCallbackHandler, StreamUtils
+
+
+class FakeRequest:
+    """Stands in for the starlette Request; disconnects once `disconnected` is set."""
+
+    def __init__(self):
+        self.disconnected = False
+
+    async def is_disconnected(self):
+        return self.disconnected
+
+
+async def source_of(*items, delay=0.0):
+    for item in items:
+        if delay:
+            await asyncio.sleep(delay)
+        yield item
+
+
+async def sse_chunks(source, request=None):
+    return [chunk async for chunk in StreamUtils.sse(request or FakeRequest(), source)]
+
+
+def collect(source):
+    return asyncio.run(sse_chunks(source))
+
+
+def parse(chunks):
+    """SSE chunks -> [(event, data)], heartbeats as ("keep-alive", None)."""
+    events = []
+    for chunk in chunks:
+        if chunk.startswith(":"):
+            events.append(("keep-alive", None))
+            continue
+        event, data = chunk.rstrip("\n").split("\n")
+        events.append((event[len("event: "):], json.loads(data[len("data: "):])))
+    return events
+
+
+@pytest.fixture
+def timings(monkeypatch):
+    monkeypatch.setattr(StreamUtils, "flush_interval", 0.01)
+    monkeypatch.setattr(StreamUtils, "flush_size", 64)
+    monkeypatch.setattr(StreamUtils, "heartbeat_interval", 15)
+    monkeypatch.setattr(StreamUtils, "disconnect_poll_interval", 0.01)
+    return StreamUtils
+
+
+def test_tokens_events_and_end_are_framed(timings):
+    events = parse(collect(source_of("Hel", "lo", {"event": "tool_start", "data": {"tool": "search"}}, "!", None, "ignored")))
+    assert events == [
+        ("token", {"content": "Hello"}),
+        ("tool_start", {"tool": "search"}),
+        ("token", {"content": "!"}),
+        ("done", {}),
+    ]
+
+
+def test_upstream_errors_end_the_stream_with_an_error_event(timings):
+    async def failing():
+        yield "partial"
+        raise RuntimeError("model went away")
+
+    assert parse(collect(failing())) == [("token", {"content": "partial"}), ("error", {"message": "model went away"})]
+
+
+def test_tokens_are_coalesced_up_to_the_flush_size(timings, monkeypatch):
+    monkeypatch.setattr(StreamUtils, "flush_interval", 10)
+    monkeypatch.setattr(StreamUtils, "flush_size", 4)
+    events = parse(collect(source_of("ab", "cd", "ef", "g")))
+    assert events == [("token", {"content": "abcd"}), ("token", {"content": "efg"}), ("done", {})]
+
+
+def test_idle_streams_get_a_heartbeat(timings, monkeypatch):
+    monkeypatch.setattr(StreamUtils, "heartbeat_interval", 0.02)
+    events = parse(collect(source_of("late", delay=0.1)))
+    assert events[0] == ("keep-alive", None)
+    assert events[-2:] == [("token", {"content": "late"}), ("done", {})]
+
+
+def test_a_disconnect_cancels_the_upstream(timings):
+    request = FakeRequest()
+    cancelled = asyncio.Event()
+
+    async def endless():
+        try:
+            yield "first"
+            await asyncio.sleep(60)
+            yield "never"
+        except asyncio.CancelledError:
+            cancelled.set()
+            raise
+
+    async def run():
+        chunks = []
+        async for chunk in StreamUtils.sse(request, endless()):
+            chunks.append(chunk)
+            request.disconnected = True
+        await asyncio.wait_for(cancelled.wait(), 1)
+        return chunks
+
+    assert parse(asyncio.run(run())) == [("token", {"content": "first"})]
+
+
+def test_handler_queues_tool_runs():
+    async def run():
+        handler = StreamCallbackHandler()
+        await handler.on_tool_start({"name": "search"}, "bm25")
+        return handler.queue.get_nowait()
+
+    assert asyncio.run(run()) == {"event": "tool_start", "data": {"tool": "search", "input": "bm25"}}
+
+
+@pytest.fixture
+def model(monkeypatch):
+    model = GenerativeModel()
+    llm = FakeListChatModel(responses=["hello there"])
+    monkeypatch.setattr(memory_util, "CHAT_HISTORY_BACKEND", "memory")
+    monkeypatch.setattr(model.platform_utils, "load_yaml_and_get_model", lambda name: ("fake-1", "fake_platform"))
+    monkeypatch.setattr(model, "get_llm", lambda *args: llm)
+    InMemoryChatHistory.reset()
+    yield model
+    InMemoryChatHistory.reset()
+
+
+def test_conversation_chain_stream_ends_with_usage_and_done(model, timings):
+    async def run():
+        generator = await model.start_chat_stream_memory_es("fake", "hi", 0.7, None, None)
+        # a stream that never ended would hang here
+        return await asyncio.wait_for(sse_chunks(generator), 5)
+
+    events = parse(asyncio.run(run()))
+    assert "".join(data["content"] for event, data in events if event == "token") == "hello there"
+    assert [event for event, _ in events[-2:]] == ["usage", "done"]
+    assert events[-2][1]["total_tokens"] > 0
+
+
+def test_plain_stream_sends_tokens_then_usage(model, timings):
+    async def run():
+        generator = await model.start_chat_stream("fake", "hi", 0.7, None, None)
+        return await asyncio.wait_for(sse_chunks(generator), 5)
+
+    events = parse(asyncio.run(run()))
+    assert "".join(data["content"] for event, data in events if event == "token") == "hello there"
+    assert [event for event, _ in events[-2:]] == ["usage", "done"]
+
@@ -0,0 +1,98 @@
+import asyncio
+
+import pytest
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+
+import utils.memory_util as memory_util
+from models.chat import GenerativeModel
+from utils.chat_history_util import InMemoryChatHistory, InMemorySummaryStore, UpstashSummaryStore
+from utils.memory_util import MemoryUtils
+from utils.summary_memory_util import RollingSummaryMemory
+
+
+class ScriptedChatModel(BaseChatModel):
+    """Returns `reply` and records every prompt it was given."""
+
+    reply: str
+    prompts: list = []
+
+    @property
+    def _llm_type(self) -> str:
+        return "scripted"
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        self.prompts.append(str(messages[-1].content))
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=self.reply))])
+
+
+@pytest.fixture
+def chat(monkeypatch):
+    summarizer = ScriptedChatModel(reply="SUMMARY OF EARLIER TURNS", prompts=[])
+    llm = ScriptedChatModel(reply="noted", prompts=[])
+    model = GenerativeModel()
+    monkeypatch.setattr(memory_util, "CHAT_HISTORY_BACKEND", "memory")
+    monkeypatch.setattr(memory_util, "CHAT_MEMORY", "summary")
+    monkeypatch.setattr(memory_util, "SUMMARY_MAX_TOKENS", 60)
+    monkeypatch.setattr(MemoryUtils, "init_ollama", lambda self: summarizer)
+    monkeypatch.setattr(model.platform_utils, "load_yaml_and_get_model", lambda name: ("scripted-1", "scripted_platform"))
+    monkeypatch.setattr(model, "get_llm", lambda *args: llm)
+    InMemoryChatHistory.reset()
+    InMemorySummaryStore._store.clear()
+    yield model, llm, summarizer
+    InMemoryChatHistory.reset()
+    InMemorySummaryStore._store.clear()
+
+
+def test_chat_memory_setting_selects_the_rolling_summary(monkeypatch):
+    monkeypatch.setattr(memory_util, "CHAT_HISTORY_BACKEND", "memory")
+    monkeypatch.setattr(memory_util, "CHAT_MEMORY", "summary")
+    monkeypatch.setattr(MemoryUtils, "init_ollama", lambda self: None)
+    assert isinstance(MemoryUtils().init_chat_memory("session"), RollingSummaryMemory)
+    monkeypatch.setattr(memory_util, "CHAT_MEMORY", "window")
+    assert not isinstance(MemoryUtils().init_chat_memory("session"), RollingSummaryMemory)
+
+
+def test_custom_chat_folds_old_turns_into_the_summary(chat):
+    model, llm, summarizer = chat
+
+    async def converse():
+        for turn in range(8):
+            message = f"turn {turn}: " + "please remember this detail about the project " * 2
+            await model.start_custom_chat("scripted", message, 0.7, None, None, "session-1")
+            # let the background summarization of evicted turns finish
+            await asyncio.gather(*RollingSummaryMemory._tasks)
+
+    asyncio.run(converse())
+
+    assert summarizer.prompts, "evicted turns were never summarized"
+    last_prompt = llm.prompts[-1]
+    assert "SUMMARY OF EARLIER TURNS" in last_prompt
+    assert "turn 0:" not in last_prompt
+    assert "turn 7:" in last_prompt
+    summary, summarized = InMemorySummaryStore().get("session-1")
+    assert summary == "SUMMARY OF EARLIER TURNS" and summarized > 0
+
+
+def test_upstash_sessions_keep_their_summary_in_upstash(monkeypatch):
+    monkeypatch.setattr(memory_util, "CHAT_HISTORY_BACKEND", "upstash")
+    monkeypatch.setattr(memory_util, "CHAT_MEMORY", "summary")
+    monkeypatch.setattr(MemoryUtils, "init_ollama", lambda self: None)
+    monkeypatch.setattr(MemoryUtils, "init_history", lambda self, uuid=None, window=None: InMemoryChatHistory(session_id=uuid))
+    assert isinstance(MemoryUtils().init_chat_memory("session").summary_store, UpstashSummaryStore)
+
+
+def test_in_memory_summaries_are_bounded(monkeypatch):
+    monkeypatch.setattr(InMemorySummaryStore, "max_sessions", 2)
+    InMemorySummaryStore._store.clear()
+    store = InMemorySummaryStore()
+    for session in ("a", "b", "c"):
+        store.set(session, f"summary of {session}", 2)
+    assert store.get("a") == ("", 0)
+    assert store.get("c") == ("summary of c", 2)
+
+    monkeypatch.setattr(InMemorySummaryStore, "ttl", -1)
+    store.set("d", "summary of d", 2)
+    assert store.get("d") == ("", 0)
+    InMemorySummaryStore._store.clear()
@@ -0,0 +1,113 @@
+import os
+from urllib.parse import urljoin
+
+import pytest
+from bs4 import BeautifulSoup
+
+import tools.web_scrapping_tool as scraping
+from tools.web_scrapping_tool import WebScrapingTool
+
+PAGES_DIR = os.path.join(os.path.dirname(__file__), "fixtures", "pages")
+PAGES = sorted(name for name in os.listdir(PAGES_DIR) if name.endswith(".html"))
+URL = "https://example.com/blog/post"
+
+
+def load_page(name):
+    with open(os.path.join(PAGES_DIR, name), encoding="utf-8") as f:
+        return f.read()
+
+
+def baseline_scrape(html, url):
+    """_extract_content followed by _clean_content as they were before the single-pass rewrite."""
+    soup = BeautifulSoup(html, 'html.parser')
+    for element in soup(['script', 'style', 'iframe', 'nav', 'footer', 'header', 'aside']):
+        element.decompose()
+    result = {'url': url, 'title': '', 'text': '', 'description': '', 'images': [], 'links': []}
+    if soup.title:
+        result['title'] = soup.title.string.strip()
+    meta_desc = soup.find('meta', attrs={'name': 'description'})
+    if meta_desc:
+        result['description'] = meta_desc.get('content', '').strip()
+    meta_author = soup.find('meta', attrs={'name': ['author', 'Author']})
+    if meta_author:
+        result['author'] = meta_author.get('content', '').strip()
+    main_content = None
+    for candidate in [
+        soup.find(['article', 'main']),
+        soup.find(id=['content', 'main-content', 'article-content']),
+        soup.find(class_=['content', 'main-content', 'article-content']),
+        soup.find('div', {'role': 'main'}),
+    ]:
+        if candidate:
+            main_content = candidate
+            break
+    if not main_content:
+        main_content = soup.body
+    if main_content:
+        paragraphs = []
+        for p in main_content.find_all(['p', 'h1', 'h2', 'h3', 'h4', 'h5', 'h6']):
+            text = p.get_text().strip()
+            if text and len(text) > 20:
+                paragraphs.append(text)
+        result['text'] = '\n\n'.join(paragraphs)
+        for img in main_content.find_all('img', src=True):
+            img_data = {'url': urljoin(url, img['src']), 'alt': img.get('alt', ''), 'title': img.get('title', '')}
+            if img_data['alt'] or img_data['title']:
+                result['images'].append(img_data)
+        for link in main_content.find_all('a', href=True):
+            link_url = urljoin(url, link['href'])
+            link_text = link.get_text().strip()
+            if link_text and WebScrapingTool._is_valid_url(link_url):
+                result['links'].append({'url': link_url, 'text': link_text})
+
+    cleaned = {}
+    if result['text']:
+        lines = [line.strip() for line in result['text'].split('\n')]
+        cleaned['text'] = '\n\n'.join(line for line in lines if line)
+    for field in ['title', 'url', 'description', 'author']:
+        if field in result and result[field]:
+            cleaned[field] = result[field].strip()
+    if result['images']:
+        cleaned['images'] = [img for img in result['images'] if img.get('url') and (img.get('alt') or img.get('title'))][:5]
+    if result['links']:
+        cleaned['links'] = [link for link in result['links'] if link.get('url') and link.get('text')][:10]
+    return cleaned
+
+
+@pytest.mark.parametrize("parser", sorted({"html.parser", scraping.PARSER}))
+@pytest.mark.parametrize("page", PAGES)
+def test_process_matches_baseline(page, parser, monkeypatch):
+    monkeypatch.setattr(scraping, "PARSER", parser)
+    html = load_page(page)
+    assert WebScrapingTool._process(html, URL) == baseline_scrape(html, URL)
+
+
+def test_fixtures_exercise_every_field():
+    results = [WebScrapingTool._process(load_page(page), URL) for page in PAGES]
+    for field in ("title", "text", "description", "author", "images", "links"):
+        assert any(field in result for result in results), field
+    gallery = WebScrapingTool._process(load_page("gallery.html"), URL)
+    assert len(gallery["images"]) == WebScrapingTool.MAX_IMAGES
+    assert len(gallery["links"]) == WebScrapingTool.MAX_LINKS
+
+
+def test_large_pages_parse_in_spawned_workers(monkeypatch):
+    monkeypatch.setattr(WebScrapingTool, "PROCESS_POOL_MIN_BYTES", 0)
+    monkeypatch.setattr(WebScrapingTool, "PROCESS_POOL_WORKERS", 1)
+    monkeypatch.setattr(WebScrapingTool, "_process_pool", None)
+    try:
+        html = load_page("article.html")
+        assert WebScrapingTool._parse(html, URL) == WebScrapingTool._process(html, URL)
+        assert WebScrapingTool._process_pool._mp_context.get_start_method() == "spawn"
+    finally:
+        WebScrapingTool._process_pool.shutdown()
+
+
+def test_non_html_responses_are_passed_through(monkeypatch):
+    import httpx
+
+    def handler(request):
+        return httpx.Response(200, headers={"content-type": "application/json"}, text='{"ok": true}')
+
+    monkeypatch.setattr(WebScrapingTool, "_client", httpx.Client(transport=httpx.MockTransport(handler)))
+    assert WebScrapingTool._get_page_content("https://example.com/api") == '{"ok": true}'
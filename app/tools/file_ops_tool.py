@@ -2,15 +2,21 @@ from typing import Dict, Any, Optional, List
 from datetime import datetime
 import os
 import re
+import mmap
 from langchain.tools import tool
 from dotenv import load_dotenv
 
+from utils.file_cabinet_util import FileCabinetIndex
+from utils.file_write_util import FileWriteUtils
+
 load_dotenv()
 
 class FileOpsTool:
     """Tool class for file operations"""
     
     base_directory = os.getenv('FILE_CABINET_PATH')
+    READ_CHUNK_CHARS = 64 * 1024
+    MMAP_MIN_BYTES = int(os.getenv('FILE_MMAP_MIN_BYTES', str(4 * 1024 * 1024)))
 
     @staticmethod
     def _sanitize_filename(text: str) -> str:
@@ -83,14 +89,22 @@ class FileOpsTool:
 
             # formatted_content = FileOpsTool._format_content(content)
             formatted_content = content
-            with open(filepath, 'w', encoding='utf-8') as f:
-                f.write(formatted_content)
-
-            return f"Content successfully saved to {filepath}"
+            FileWriteUtils.write(filepath, formatted_content)
 
         except Exception as e:
             return f"Error saving content: {str(e)}"
 
+        FileOpsTool._index_file(final_filename, formatted_content)
+        return f"Content successfully saved to {filepath}"
+
+    @staticmethod
+    def _index_file(filename: str, content: str) -> None:
+        # the file is already saved; a stale index is caught up by the cabinet watcher
+        try:
+            FileCabinetIndex.index_file(filename, content)
+        except Exception as e:
+            print(f"File cabinet indexing failed for {filename}: {e}")
+
 
     @staticmethod
     @tool()
@@ -106,39 +120,18 @@ class FileOpsTool:
             if query_type not in ['latest', 'by_name', 'search', 'all']:
                 return "Error: Invalid query type. Must be 'latest', 'by_name', 'search', or 'all'"
             
-            results = []
-            files = [f for f in os.listdir(FileOpsTool.base_directory) if f.endswith('.txt')]
-            files.sort(key=lambda x: os.path.getmtime(os.path.join(FileOpsTool.base_directory, x)), reverse=True)
-            
-            for file in files:
-                if len(results) >= max_results:
-                    break
-                    
-                filepath = os.path.join(FileOpsTool.base_directory, file)
-                
-                try:
-                    with open(filepath, 'r', encoding='utf-8') as f:
-                        content = f.read()
-                    
-                    if query_type == 'latest':
-                        results.append((file, content))
-                    elif query_type == 'by_name' and value.lower() in file.lower():
-                        results.append((file, content))
-                    elif query_type == 'search' and value.lower() in content.lower():
-                        results.append((file, content))
-                    elif query_type == 'all':
-                        results.append((file, content))
-                except Exception:
-                    continue
+            if FileCabinetIndex.available():
+                results = FileOpsTool._query_index(query_type, value, max_results)
+            else:
+                results = FileOpsTool._scan_files(query_type, value, max_results)
             
             if not results:
                 return "No matching content found."
             
             output = []
-            for i, (filename, content) in enumerate(results, 1):
+            for i, (filename, excerpt) in enumerate(results, 1):
                 output.append(f"\nResult {i} - File: {filename}")
                 output.append("-" * 40)
-                excerpt = content[:500] + "..." if len(content) > 500 else content
                 output.append(excerpt)
             
             return "\n".join(output)
@@ -146,6 +139,97 @@ class FileOpsTool:
         except Exception as e:
             return f"Error reading files: {str(e)}"
 
+    @staticmethod
+    def _query_index(query_type: str, value: str, max_results: int) -> List[tuple]:
+        if query_type == 'by_name':
+            return FileCabinetIndex.by_name(value, max_results)
+        if query_type == 'search':
+            return FileCabinetIndex.search(value, max_results)
+        return FileCabinetIndex.latest(max_results)
+
+    @staticmethod
+    def _scan_files(query_type: str, value: str, max_results: int) -> List[tuple]:
+        """Directory scan, used when the cabinet index can't be opened."""
+        results = []
+        files = [f for f in os.listdir(FileOpsTool.base_directory) if f.endswith('.txt')]
+        files.sort(key=lambda x: os.path.getmtime(os.path.join(FileOpsTool.base_directory, x)), reverse=True)
+        
+        for file in files:
+            if len(results) >= max_results:
+                break
+                
+            filepath = os.path.join(FileOpsTool.base_directory, file)
+            
+            try:
+                if query_type == 'search':
+                    excerpt = FileOpsTool._find_excerpt(filepath, value)
+                    if excerpt is not None:
+                        results.append((file, excerpt))
+                elif query_type in ('latest', 'all') or (query_type == 'by_name' and value.lower() in file.lower()):
+                    results.append((file, FileOpsTool._read_excerpt(filepath)))
+            except Exception:
+                continue
+        return results
+
+    @staticmethod
+    def _read_excerpt(filepath: str) -> str:
+        """The head of a file, reading no more than the excerpt needs."""
+        with open(filepath, 'r', encoding='utf-8') as f:
+            return FileCabinetIndex.excerpt(f.read(FileCabinetIndex.EXCERPT_CHARS + 1))
+
+    @staticmethod
+    def _find_excerpt(filepath: str, value: str) -> Optional[str]:
+        """
+        A snippet centred on the first case-insensitive match of `value`, or None.
+
+        Large files are scanned through mmap (for ASCII search terms), others
+        are streamed in chunks; either way reading stops at the first match,
+        so memory stays proportional to the chunk and the excerpt.
+        """
+        if not value:
+            return FileOpsTool._read_excerpt(filepath)
+        if value.isascii() and os.path.getsize(filepath) >= FileOpsTool.MMAP_MIN_BYTES:
+            return FileOpsTool._find_excerpt_mmap(filepath, value)
+
+        pattern = re.compile(re.escape(value), re.IGNORECASE)
+        half = max(FileCabinetIndex.EXCERPT_CHARS - len(value), 0) // 2
+        # keep enough of the previous chunk for a match straddling the boundary plus its leading context
+        keep = half + len(value)
+        with open(filepath, 'r', encoding='utf-8') as f:
+            window = ''
+            consumed = 0
+            while True:
+                chunk = f.read(FileOpsTool.READ_CHUNK_CHARS)
+                if not chunk:
+                    return None
+                window += chunk
+                match = pattern.search(window)
+                if match:
+                    break
+                consumed += max(len(window) - keep, 0)
+                window = window[-keep:]
+            end = match.end() + half
+            if len(window) < end:
+                window += f.read(end - len(window))
+            more = bool(f.read(1))
+        start = max(match.start() - half, 0)
+        prefix = "..." if consumed + start > 0 else ""
+        suffix = "..." if more or len(window) > end else ""
+        return prefix + window[start:end] + suffix
+
+    @staticmethod
+    def _find_excerpt_mmap(filepath: str, value: str) -> Optional[str]:
+        pattern = re.compile(re.escape(value.encode('utf-8')), re.IGNORECASE)
+        half = max(FileCabinetIndex.EXCERPT_CHARS - len(value), 0) // 2
+        with open(filepath, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            match = pattern.search(mm)
+            if not match:
+                return None
+            start = max(match.start() - half, 0)
+            end = min(match.end() + half, len(mm))
+            # the window may cut a multi-byte character at either edge
+            snippet = mm[start:end].decode('utf-8', errors='ignore')
+            return ("..." if start > 0 else "") + snippet + ("..." if end < len(mm) else "")
 
     @staticmethod
     def get_tools(include: List[str] = None) -> List[tool]:
@@ -221,10 +305,10 @@ class FileOpsTool:
                 </body>
                 </html>"""
 
-            with open(filepath, 'w', encoding='utf-8') as f:
-                f.write(html_content)
-
-            return f"HTML file successfully saved to {filepath}"
+            FileWriteUtils.write(filepath, html_content)
 
         except Exception as e:
-            return f"Error saving HTML file: {str(e)}"
\ No newline at end of file
+            return f"Error saving HTML file: {str(e)}"
+
+        FileOpsTool._index_file(filename, html_content)
+        return f"HTML file successfully saved to {filepath}"
\ No newline at end of file
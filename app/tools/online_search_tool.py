@@ -1,25 +1,52 @@
-import requests
 import os
+import re
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
+
+import httpx
 from dotenv import load_dotenv
 
-from langchain_core.tools import tool
+from langchain_core.tools import tool, StructuredTool
 from tavily import TavilyClient
 from duckduckgo_search import DDGS
 import wikipedia
 from exa_py import Exa
 
-from typing import List, Dict, Literal
+from typing import List, Dict, Literal, Optional
+
+from utils.client_util import ClientUtils
+from utils.concurrency_util import ConcurrencyUtils
+from utils.search_cache_util import SearchCache
 
 load_dotenv()
 
+
+TRACKING_PARAM = re.compile(r'^(utm_\w+|fbclid|gclid|ref|ref_src)$', re.IGNORECASE)
+
 class OnlineSearchTool:
     """Wrapper class for various online search tools."""
     
+    # seconds; each provider can be overridden with SEARCH_TIMEOUT_<PROVIDER>, e.g. SEARCH_TIMEOUT_EXA
+    http_timeout = float(os.getenv("SEARCH_HTTP_TIMEOUT", "10"))
+    provider_timeout = float(os.getenv("SEARCH_PROVIDER_TIMEOUT", "8"))
+    meta_deadline = float(os.getenv("SEARCH_META_DEADLINE", "10"))
+    meta_max_results = int(os.getenv("SEARCH_META_MAX_RESULTS", "10"))
+
+    # providers that can't run without a key are left out of meta search when it's missing
+    PROVIDER_KEYS = {
+        'google': 'GOOGLE_API_KEY',
+        'tavily': 'TAVILY_API_KEY',
+        'exa': 'EXA_API_KEY',
+        'you': 'YOU_API_KEY',
+    }
+
     def __init__(self):
         pass
     
     @staticmethod
     @tool
+    @SearchCache.cached('google')
     def google_search(query: str):
         """
         Perform a search using the Google Custom Search API.
@@ -42,7 +69,7 @@ class OnlineSearchTool:
             'num': 3
         }
 
-        response = requests.get(url, params=params)
+        response = ClientUtils.get_http_client().get(url, params=params, timeout=OnlineSearchTool.http_timeout)
 
         if response.status_code == 200:
             search_results = response.json().get('items', [])
@@ -54,6 +81,7 @@ class OnlineSearchTool:
 
     @staticmethod
     @tool
+    @SearchCache.cached('ddg')
     def ddg_search(query: str) -> List[Dict]:
         """DuckDuckGo Search - Get relevant search results from DuckDuckGo.
 
@@ -71,6 +99,7 @@ class OnlineSearchTool:
 
     @staticmethod
     @tool
+    @SearchCache.cached('tavily')
     def tavily_search(
                      query: str, 
                      search_depth: Literal["basic", "advanced"] = "basic",
@@ -109,6 +138,7 @@ class OnlineSearchTool:
         
     @staticmethod
     @tool
+    @SearchCache.cached('you')
     def you_search(query: str):
         """You.com Search - Perform a search query using the You.com API.
 
@@ -123,18 +153,20 @@ class OnlineSearchTool:
         headers = {"X-API-Key": you_api_key}
         params = {"query": query}
         try:
-            response = requests.get(
+            response = ClientUtils.get_http_client().get(
                 "https://api.ydc-index.io/search",
                 params=params,
-                headers=headers
+                headers=headers,
+                timeout=OnlineSearchTool.http_timeout
             )
             response.raise_for_status()  
             return response.json()
-        except requests.RequestException as e:
+        except httpx.HTTPError as e:
             return {"error": f"You.com search failed: {str(e)}"}
         
     @staticmethod
     @tool
+    @SearchCache.cached('exa')
     def exa_search(query):
         """
         Performs a search using the Exa API.
@@ -164,13 +196,25 @@ class OnlineSearchTool:
                 include_domains=["nytimes.com", "wsj.com"],
                 start_published_date="2023-06-12"
             )
-            return result
+            # plain data, so the search cache can store it as JSON
+            return {"results": [
+                {
+                    "title": getattr(r, "title", None),
+                    "url": getattr(r, "url", None),
+                    "text": getattr(r, "text", None),
+                    "published_date": getattr(r, "published_date", None),
+                    "author": getattr(r, "author", None),
+                    "score": getattr(r, "score", None),
+                }
+                for r in result.results
+            ]}
         except Exception as e:
             return {"error": f"Exa search failed: {str(e)}"}
 
         
     @staticmethod
     @tool
+    @SearchCache.cached('wikipedia')
     def wikipedia_search(query):
         """
         Performs a search using the Wikipedia API.
@@ -197,13 +241,143 @@ class OnlineSearchTool:
         except Exception as e:
             return [{"error": f"wikipedia search failed: {str(e)}"}]
 
+    @staticmethod
+    def _providers():
+        return {
+            'google': OnlineSearchTool.google_search,
+            'ddg': OnlineSearchTool.ddg_search,
+            'tavily': OnlineSearchTool.tavily_search,
+            'exa': OnlineSearchTool.exa_search,
+            'you': OnlineSearchTool.you_search,
+            'wikipedia': OnlineSearchTool.wikipedia_search,
+        }
+
+    @staticmethod
+    def normalize_url(url: str) -> str:
+        """Canonical form of a URL for de-duplication: no scheme/www/fragment/tracking params/trailing slash."""
+        parts = urlsplit(url.strip())
+        host = parts.netloc.lower()
+        if host.startswith('www.'):
+            host = host[4:]
+        query = urlencode(sorted((k, v) for k, v in parse_qsl(parts.query) if not TRACKING_PARAM.match(k)))
+        return urlunsplit(('', host, parts.path.rstrip('/'), query, '')).lstrip('/')
+
+    @staticmethod
+    def _normalize_results(provider: str, raw) -> List[Dict]:
+        """Maps each provider's response shape onto {title, url, snippet}."""
+        if isinstance(raw, dict) and 'error' in raw:
+            raise RuntimeError(raw['error'])
+        if isinstance(raw, list) and raw and isinstance(raw[0], dict) and 'error' in raw[0]:
+            raise RuntimeError(raw[0]['error'])
+
+        if provider == 'google':
+            items = [(r.get('title'), r.get('link'), r.get('snippet')) for r in raw or []]
+        elif provider == 'ddg':
+            items = [(r.get('title'), r.get('href'), r.get('body')) for r in raw or []]
+        elif provider == 'tavily':
+            items = [(r.get('title'), r.get('url'), r.get('content')) for r in raw or []]
+        elif provider == 'you':
+            items = [(r.get('title'), r.get('url'), r.get('description') or ' '.join(r.get('snippets', [])))
+                     for r in (raw or {}).get('hits', [])]
+        elif provider == 'exa':
+            items = [(r.get('title'), r.get('url'), r.get('text')) for r in (raw or {}).get('results', [])]
+        elif provider == 'wikipedia':
+            items = [(title, f"https://en.wikipedia.org/wiki/{title.replace(' ', '_')}", '') for title in raw or []]
+        else:
+            items = []
+        return [{'title': title or '', 'url': url, 'snippet': snippet or ''} for title, url, snippet in items if url]
+
+    @staticmethod
+    async def _search_provider(provider: str, query: str) -> List[Dict]:
+        # the provider SDKs are blocking, so each one runs on the shared pool and asyncio only waits
+        search = OnlineSearchTool._providers()[provider]
+        timeout = float(os.getenv(f"SEARCH_TIMEOUT_{provider.upper()}", OnlineSearchTool.provider_timeout))
+        raw = await asyncio.wait_for(ConcurrencyUtils.run_blocking(search.func, query), timeout)
+        return OnlineSearchTool._normalize_results(provider, raw)
+
+    @staticmethod
+    async def asearch_all(query: str, providers: Optional[List[str]] = None) -> Dict:
+        """Async implementation of search_all, used by the meta_search tool on async agent runs."""
+        available = OnlineSearchTool._providers()
+        if providers:
+            selected = [name for name in providers if name in available]
+        else:
+            selected = [name for name in available
+                        if name not in OnlineSearchTool.PROVIDER_KEYS or os.getenv(OnlineSearchTool.PROVIDER_KEYS[name])]
+
+        tasks = {asyncio.create_task(OnlineSearchTool._search_provider(name, query)): name for name in selected}
+        done, pending = await asyncio.wait(tasks, timeout=OnlineSearchTool.meta_deadline) if tasks else (set(), set())
+        for task in pending:
+            task.cancel()
+
+        answered, failed = {}, {name: "deadline exceeded" for name in (tasks[t] for t in pending)}
+        for task in done:
+            name = tasks[task]
+            try:
+                answered[name] = task.result()
+            except asyncio.TimeoutError:
+                failed[name] = "timed out"
+            except Exception as e:
+                failed[name] = str(e)
+
+        # reciprocal rank fusion: a URL ranked high by several providers beats one found by a single provider
+        merged = {}
+        for name in selected:
+            for rank, result in enumerate(answered.get(name, [])):
+                key = OnlineSearchTool.normalize_url(result['url'])
+                entry = merged.setdefault(key, dict(result, providers=[], score=0.0))
+                if name not in entry['providers']:
+                    entry['providers'].append(name)
+                    entry['score'] += 1.0 / (60 + rank + 1)
+                if len(result['snippet']) > len(entry['snippet']):
+                    entry['snippet'] = result['snippet']
+        results = sorted(merged.values(), key=lambda entry: entry['score'], reverse=True)
+        for entry in results:
+            entry['score'] = round(entry['score'], 5)
+
+        return {
+            'query': query,
+            'results': results[:OnlineSearchTool.meta_max_results],
+            'providers': sorted(answered),
+            'failed': failed,
+        }
+
+    @staticmethod
+    def search_all(query: str, providers: Optional[List[str]] = None) -> Dict:
+        """Meta Search - Query several search providers at once and get one merged, de-duplicated result list.
+
+        Args:
+            query (str): The search query to be executed
+            providers (List[str]): Providers to query, any of ['google', 'ddg', 'tavily', 'exa', 'you', 'wikipedia'].
+                                   Defaults to every provider that is configured.
+
+        Returns:
+            Dict: 'results' ranked across providers (each with title, url, snippet and the providers that
+                  returned it), plus the providers that answered and those that failed or timed out.
+        """
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            return asyncio.run(OnlineSearchTool.asearch_all(query, providers))
+        # called synchronously from inside an event loop, fan out on a private loop instead
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            return executor.submit(asyncio.run, OnlineSearchTool.asearch_all(query, providers)).result()
+
+    @staticmethod
+    def meta_search() -> StructuredTool:
+        return StructuredTool.from_function(
+            func=OnlineSearchTool.search_all,
+            coroutine=OnlineSearchTool.asearch_all,
+            name="meta_search",
+        )
+
     @staticmethod
     def get_tools(include: List[str] = None) -> List[tool]:
         """
         Get list of search tools to pass to LLM.
 
         Args:
-            include (List[str]): List of tools to include. Options: ['google', 'ddg', 'tavily', 'exa','you', 'wikipedia']
+            include (List[str]): List of tools to include. Options: ['google', 'ddg', 'tavily', 'exa','you', 'wikipedia', 'meta']
                                If None, returns all available tools.
 
         Returns:
@@ -215,7 +389,8 @@ class OnlineSearchTool:
             'tavily': OnlineSearchTool().tavily_search,
             'exa': OnlineSearchTool().exa_search,
             'you': OnlineSearchTool().you_search,
-            'wikipedia': OnlineSearchTool().wikipedia_search
+            'wikipedia': OnlineSearchTool().wikipedia_search,
+            'meta': OnlineSearchTool.meta_search()
         }
         
         if include:
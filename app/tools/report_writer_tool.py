@@ -5,6 +5,33 @@ from langchain.tools import tool
 import re
 import json
 
+from utils.file_write_util import FileWriteUtils
+
+# reports at least this large are stored gzipped (0 disables compression)
+REPORT_COMPRESS_MIN_BYTES = int(os.getenv("REPORT_COMPRESS_MIN_BYTES", "0"))
+
+
+class _ControlCharTable(dict):
+    """str.translate table deleting every non-printable character except newline and tab."""
+
+    def __missing__(self, codepoint):
+        # characters outside the precomputed range are classified once, then cached
+        char = chr(codepoint)
+        value = codepoint if char.isprintable() or char in '\n\t' else None
+        self[codepoint] = value
+        return value
+
+
+CONTROL_CHARS = _ControlCharTable(
+    (codepoint, None) for codepoint in range(0x10000)
+    if not chr(codepoint).isprintable() and chr(codepoint) not in '\n\t'
+)
+# a sentence end swallows the whitespace after it and gets one space; any other run of
+# spaces collapses to one (the unmatched group expands to nothing). Sentence ends already
+# followed by exactly one space are skipped, in prose that's nearly all of them.
+PUNCTUATION_AND_SPACES = re.compile(r'([.!?])(?! (?!\s))\s*| {2,}')
+BLANK_LINES = re.compile(r'\n{3,}')
+
 class ResearchReportWriter:
     """Tool class for research report writing operations"""
     
@@ -46,7 +73,7 @@ class ResearchReportWriter:
             file_path = os.path.join('research_reports', safe_filename)
             
             # First sanitize the content
-            clean_content = ResearchReportWriter.content_sanitizer(final_content)
+            clean_content = ResearchReportWriter.sanitize(final_content)
             
             # Format the content based on file type
             if safe_filename.endswith('.json'):
@@ -71,10 +98,9 @@ class ResearchReportWriter:
                 )
             
             # Write formatted content to file
-            with open(file_path, 'w', encoding='utf-8') as f:
-                f.write(formatted_content)
+            written_path = FileWriteUtils.write(file_path, formatted_content, compress_min_bytes=REPORT_COMPRESS_MIN_BYTES)
                 
-            return f"Successfully wrote formatted research report to {safe_filename}"
+            return f"Successfully wrote formatted research report to {os.path.basename(written_path)}"
             
         except Exception as e:
             return f"Error writing research report: {str(e)}"
@@ -91,22 +117,23 @@ class ResearchReportWriter:
         Returns:
             str: Sanitized and formatted content
         """
+        return ResearchReportWriter.sanitize(content)
+
+    @staticmethod
+    def sanitize(content: Any) -> str:
+        """Implementation of content_sanitizer, callable without going through the tool layer."""
         # Convert content to string if it isn't already
         content = str(content)
         
-        # Remove control characters while preserving legitimate whitespace
-        content = ''.join(char for char in content if char.isprintable() or char in '\n\t')
-        
-        # Normalize line endings
-        content = content.replace('\r\n', '\n').replace('\r', '\n')
+        # Remove control characters while preserving legitimate whitespace.
+        # \r is not printable either, so it is deleted here (CRLF becomes LF, a lone CR disappears).
+        content = content.translate(CONTROL_CHARS)
         
-        # Fix common formatting issues
-        # Ensure consistent spacing after punctuation
-        content = re.sub(r'([.!?])\s*', r'\1 ', content)
-        # Remove multiple spaces
-        content = re.sub(r' +', ' ', content)
+        # Ensure consistent spacing after punctuation and remove multiple spaces, in one pass
+        content = PUNCTUATION_AND_SPACES.sub(r'\1 ', content)
         # Ensure consistent paragraph spacing
-        content = re.sub(r'\n{3,}', '\n\n', content)
+        if '\n\n\n' in content:
+            content = BLANK_LINES.sub('\n\n', content)
         
         # Remove any trailing/leading whitespace
         content = content.strip()
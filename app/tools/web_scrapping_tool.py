@@ -1,11 +1,24 @@
-from typing import Dict, List, Optional
-from langchain_core.tools import tool
+from typing import Any, Dict, List, Optional
+from langchain_core.tools import tool, StructuredTool
 from bs4 import BeautifulSoup
-import requests
+import httpx
+import os
+import asyncio
+import threading
+import multiprocessing
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 from urllib.parse import urlparse, urljoin
 import json
 from dotenv import load_dotenv
-from typing import Dict, Any, Optional, List
+
+from utils.concurrency_util import ConcurrencyUtils
+
+try:
+    import lxml  # noqa: F401
+    PARSER = 'lxml'
+except ImportError:  # the C parser is much faster, html.parser is the pure-Python fallback
+    PARSER = 'html.parser'
 
 
 load_dotenv()
@@ -16,7 +29,76 @@ class WebScrapingTool:
     HEADERS = {
         'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
     }
-    
+
+    # pages are read as a stream and cut off at MAX_BYTES or at the closing body tag
+    MAX_BYTES = int(os.getenv("SCRAPE_MAX_BYTES", str(2 * 1024 * 1024)))
+    TIMEOUT = httpx.Timeout(float(os.getenv("SCRAPE_TIMEOUT", "10")), connect=5.0)
+    LIMITS = httpx.Limits(
+        max_connections=int(os.getenv("SCRAPE_MAX_CONNECTIONS", "32")),
+        max_keepalive_connections=int(os.getenv("SCRAPE_MAX_KEEPALIVE", "16")),
+        keepalive_expiry=30.0,
+    )
+    PER_HOST_CONCURRENCY = int(os.getenv("SCRAPE_PER_HOST_CONCURRENCY", "4"))
+    MAX_URLS = int(os.getenv("SCRAPE_MANY_MAX_URLS", "10"))
+
+    UNWANTED_TAGS = ['script', 'style', 'iframe', 'nav', 'footer', 'header', 'aside']
+    CONTENT_TAGS = ['p', 'h1', 'h2', 'h3', 'h4', 'h5', 'h6', 'img', 'a']
+    MAX_IMAGES = 5
+    MAX_LINKS = 10
+    # pages at least this large are parsed in a worker process so they don't hold the GIL
+    PROCESS_POOL_MIN_BYTES = int(os.getenv("SCRAPE_PROCESS_POOL_MIN_BYTES", str(512 * 1024)))
+    PROCESS_POOL_WORKERS = int(os.getenv("SCRAPE_PROCESS_WORKERS", "0")) or None
+
+    _lock = threading.Lock()
+    _client = None
+    _async_client = None
+    _process_pool = None
+
+    @classmethod
+    def _new_client(cls, client_class):
+        return client_class(headers=cls.HEADERS, timeout=cls.TIMEOUT, limits=cls.LIMITS, follow_redirects=True)
+
+    @classmethod
+    def get_client(cls) -> httpx.Client:
+        if cls._client is None:
+            with cls._lock:
+                if cls._client is None:
+                    cls._client = cls._new_client(httpx.Client)
+        return cls._client
+
+    @classmethod
+    def get_async_client(cls) -> httpx.AsyncClient:
+        """Shared async client, bound to the app's event loop."""
+        if cls._async_client is None:
+            with cls._lock:
+                if cls._async_client is None:
+                    cls._async_client = cls._new_client(httpx.AsyncClient)
+        return cls._async_client
+
+    @classmethod
+    async def aclose(cls):
+        if cls._async_client is not None:
+            await cls._async_client.aclose()
+            cls._async_client = None
+        if cls._client is not None:
+            cls._client.close()
+            cls._client = None
+        if cls._process_pool is not None:
+            cls._process_pool.shutdown(wait=False, cancel_futures=True)
+            cls._process_pool = None
+
+    @classmethod
+    def _get_process_pool(cls) -> ProcessPoolExecutor:
+        if cls._process_pool is None:
+            with cls._lock:
+                if cls._process_pool is None:
+                    # fork would copy the held locks of the server's threads and clients, spawn starts clean
+                    cls._process_pool = ProcessPoolExecutor(
+                        max_workers=cls.PROCESS_POOL_WORKERS,
+                        mp_context=multiprocessing.get_context("spawn"),
+                    )
+        return cls._process_pool
+
     @staticmethod
     def _is_valid_url(url: str) -> bool:
         """Validate if the given string is a proper URL."""
@@ -26,23 +108,58 @@ class WebScrapingTool:
         except ValueError:
             return False
     
+    @staticmethod
+    def _read_enough(chunks: List[bytes], chunk: bytes, size: int) -> bool:
+        """True once the cap is reached or the body has closed, past that there's nothing worth extracting."""
+        if size >= WebScrapingTool.MAX_BYTES:
+            return True
+        tail = (chunks[-2][-16:] if len(chunks) > 1 else b'') + chunk
+        return b'</body' in tail.lower()
+
+    @staticmethod
+    def _decode(response: httpx.Response, chunks: List[bytes]) -> str:
+        body = b''.join(chunks)[:WebScrapingTool.MAX_BYTES]
+        return body.decode(response.encoding or 'utf-8', errors='replace')
+
     @staticmethod
     def _get_page_content(url: str) -> Optional[str]:
         """Fetch the raw HTML content of a webpage."""
         try:
-            response = requests.get(url, headers=WebScrapingTool.HEADERS, timeout=10)
-            response.raise_for_status()
-            return response.text
-        except requests.RequestException:
+            with WebScrapingTool.get_client().stream('GET', url) as response:
+                response.raise_for_status()
+                chunks, size = [], 0
+                for chunk in response.iter_bytes():
+                    chunks.append(chunk)
+                    size += len(chunk)
+                    if WebScrapingTool._read_enough(chunks, chunk, size):
+                        break
+                return WebScrapingTool._decode(response, chunks)
+        except (httpx.HTTPError, LookupError):
+            return None
+
+    @staticmethod
+    async def _aget_page_content(client: httpx.AsyncClient, url: str) -> Optional[str]:
+        """Async counterpart of _get_page_content."""
+        try:
+            async with client.stream('GET', url) as response:
+                response.raise_for_status()
+                chunks, size = [], 0
+                async for chunk in response.aiter_bytes():
+                    chunks.append(chunk)
+                    size += len(chunk)
+                    if WebScrapingTool._read_enough(chunks, chunk, size):
+                        break
+                return WebScrapingTool._decode(response, chunks)
+        except (httpx.HTTPError, LookupError):
             return None
             
     @staticmethod
     def _extract_content(html: str, url: str) -> Dict:
-        """Extract content using BeautifulSoup."""
-        soup = BeautifulSoup(html, 'html.parser')
+        """Extract content using BeautifulSoup, on the lxml parser when it's installed."""
+        soup = BeautifulSoup(html, PARSER)
         
         # Remove unwanted elements
-        for element in soup(['script', 'style', 'iframe', 'nav', 'footer', 'header', 'aside']):
+        for element in soup(WebScrapingTool.UNWANTED_TAGS):
             element.decompose()
             
         result = {
@@ -55,7 +172,7 @@ class WebScrapingTool:
         }
         
         # Extract title
-        if soup.title:
+        if soup.title and soup.title.string:
             result['title'] = soup.title.string.strip()
             
         # Extract meta description
@@ -68,55 +185,50 @@ class WebScrapingTool:
         if meta_author:
             result['author'] = meta_author.get('content', '').strip()
             
-        # Try to find main content
-        main_content = None
-        
-        # Look for common content containers
-        content_candidates = [
-            soup.find(['article', 'main']),  # Semantic HTML5 tags
-            soup.find(id=['content', 'main-content', 'article-content']),  # Common IDs
-            soup.find(class_=['content', 'main-content', 'article-content']),  # Common classes
-            soup.find('div', {'role': 'main'})  # ARIA role
-        ]
-        
-        for candidate in content_candidates:
-            if candidate:
-                main_content = candidate
-                break
+        # Look for common content containers, stopping at the first that exists
+        content_candidates = (
+            lambda: soup.find(['article', 'main']),  # Semantic HTML5 tags
+            lambda: soup.find(id=['content', 'main-content', 'article-content']),  # Common IDs
+            lambda: soup.find(class_=['content', 'main-content', 'article-content']),  # Common classes
+            lambda: soup.find('div', {'role': 'main'})  # ARIA role
+        )
+        main_content = next(filter(None, (find() for find in content_candidates)), None)
                 
         # If no main content found, use body
         if not main_content:
             main_content = soup.body
             
         if main_content:
-            # Extract text content
+            # One walk over the content collects paragraphs, images and links in document order
             paragraphs = []
-            for p in main_content.find_all(['p', 'h1', 'h2', 'h3', 'h4', 'h5', 'h6']):
-                text = p.get_text().strip()
-                if text and len(text) > 20:  # Filter out short fragments
-                    paragraphs.append(text)
+            for element in main_content.find_all(WebScrapingTool.CONTENT_TAGS):
+                if element.name == 'img':
+                    src = element.get('src')
+                    if src is None or len(result['images']) == WebScrapingTool.MAX_IMAGES:
+                        continue
+                    img_data = {
+                        'url': urljoin(url, src),
+                        'alt': element.get('alt', ''),
+                        'title': element.get('title', '')
+                    }
+                    if img_data['alt'] or img_data['title']:  # Only include images with metadata
+                        result['images'].append(img_data)
+                elif element.name == 'a':
+                    href = element.get('href')
+                    if href is None or len(result['links']) == WebScrapingTool.MAX_LINKS:
+                        continue
+                    link_url = urljoin(url, href)
+                    link_text = element.get_text().strip()
+                    if link_text and WebScrapingTool._is_valid_url(link_url):
+                        result['links'].append({
+                            'url': link_url,
+                            'text': link_text
+                        })
+                else:
+                    text = element.get_text().strip()
+                    if text and len(text) > 20:  # Filter out short fragments
+                        paragraphs.append(text)
             result['text'] = '\n\n'.join(paragraphs)
-            
-            # Extract images with absolute URLs
-            for img in main_content.find_all('img', src=True):
-                img_url = urljoin(url, img['src'])
-                img_data = {
-                    'url': img_url,
-                    'alt': img.get('alt', ''),
-                    'title': img.get('title', '')
-                }
-                if img_data['alt'] or img_data['title']:  # Only include images with metadata
-                    result['images'].append(img_data)
-                    
-            # Extract links with absolute URLs
-            for link in main_content.find_all('a', href=True):
-                link_url = urljoin(url, link['href'])
-                link_text = link.get_text().strip()
-                if link_text and WebScrapingTool._is_valid_url(link_url):
-                    result['links'].append({
-                        'url': link_url,
-                        'text': link_text
-                    })
         
         return result
 
@@ -143,11 +255,11 @@ class WebScrapingTool:
         # Clean images and links
         if 'images' in content and content['images']:
             cleaned['images'] = [img for img in content['images'] 
-                               if img.get('url') and (img.get('alt') or img.get('title'))][:5]
+                               if img.get('url') and (img.get('alt') or img.get('title'))][:WebScrapingTool.MAX_IMAGES]
             
         if 'links' in content and content['links']:
             cleaned['links'] = [link for link in content['links'] 
-                              if link.get('url') and link.get('text')][:10]
+                              if link.get('url') and link.get('text')][:WebScrapingTool.MAX_LINKS]
                 
         return cleaned
 
@@ -185,6 +297,22 @@ class WebScrapingTool:
         if not html_content:
             return {"error": "Failed to fetch webpage content"}
             
+        return WebScrapingTool._parse(html_content, url)
+
+    @staticmethod
+    def _parse(html_content: str, url: str) -> Dict:
+        """Run _process inline, or in the process pool for large pages."""
+        if len(html_content) < WebScrapingTool.PROCESS_POOL_MIN_BYTES:
+            return WebScrapingTool._process(html_content, url)
+        try:
+            return WebScrapingTool._get_process_pool().submit(WebScrapingTool._process, html_content, url).result()
+        except BrokenProcessPool:
+            WebScrapingTool._process_pool = None
+            return WebScrapingTool._process(html_content, url)
+
+    @staticmethod
+    def _process(html_content: str, url: str) -> Dict:
+        """Extract and clean a fetched page."""
         content = WebScrapingTool._extract_content(html_content, url)
         if not content:
             return {"error": "Failed to extract content from webpage"}
@@ -195,20 +323,79 @@ class WebScrapingTool:
             
         return cleaned_content
 
+    @staticmethod
+    async def _ascrape_all(client: httpx.AsyncClient, urls: List[str]) -> List[Dict]:
+        host_limits = {}
+
+        async def scrape(url):
+            if not WebScrapingTool._is_valid_url(url):
+                return {"url": url, "error": "Invalid URL provided"}
+            host = urlparse(url).netloc.lower()
+            limit = host_limits.setdefault(host, asyncio.Semaphore(WebScrapingTool.PER_HOST_CONCURRENCY))
+            async with limit:
+                html_content = await WebScrapingTool._aget_page_content(client, url)
+            if not html_content:
+                return {"url": url, "error": "Failed to fetch webpage content"}
+            # parsing is CPU-bound, keep it off the event loop
+            result = await ConcurrencyUtils.run_blocking(WebScrapingTool._parse, html_content, url)
+            return dict(result, url=url) if "error" in result else result
+
+        unique_urls = list(dict.fromkeys(str(url).strip() for url in urls))[:WebScrapingTool.MAX_URLS]
+        return await asyncio.gather(*(scrape(url) for url in unique_urls))
+
+    @staticmethod
+    async def ascrape_many(urls: List[str]) -> List[Dict]:
+        """Async implementation of scrape_many, used by the scrape_many tool on async agent runs."""
+        return await WebScrapingTool._ascrape_all(WebScrapingTool.get_async_client(), urls)
+
+    @staticmethod
+    def scrape_many(urls: List[str]) -> List[Dict]:
+        """
+        Scrape several webpage URLs in parallel.
+
+        Args:
+            urls (List[str]): The URLs to scrape (duplicates are dropped, at most 10 are fetched)
+
+        Returns:
+            List[Dict]: One entry per URL, in order, in the same format as scrape_webpage.
+                        Pages that fail have an 'error' and their 'url'.
+        """
+        async def run():
+            # the shared async client belongs to the app's loop, this private loop gets its own
+            async with WebScrapingTool._new_client(httpx.AsyncClient) as client:
+                return await WebScrapingTool._ascrape_all(client, urls)
+
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            return asyncio.run(run())
+        # called synchronously from inside an event loop, fan out on a private loop instead
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            return executor.submit(asyncio.run, run()).result()
+
+    @staticmethod
+    def scrape_many_tool() -> StructuredTool:
+        return StructuredTool.from_function(
+            func=WebScrapingTool.scrape_many,
+            coroutine=WebScrapingTool.ascrape_many,
+            name="scrape_many",
+        )
+
     @staticmethod
     def get_tools(include: List[str] = None) -> List[tool]:
         """
         Get list of web scraping tools to pass to LLM.
         
         Args:
-            include (List[str]): List of tools to include. Options: ['scrape']
+            include (List[str]): List of tools to include. Options: ['scrape', 'scrape_many']
                                If None, returns all available tools.
                                
         Returns:
             List[tool]: List of tool functions to pass to LLM
         """
         scraping_tools = {
-            'scrape': WebScrapingTool.scrape_webpage
+            'scrape': WebScrapingTool.scrape_webpage,
+            'scrape_many': WebScrapingTool.scrape_many_tool()
         }
         
         if include:
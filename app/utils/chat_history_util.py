@@ -0,0 +1,527 @@
+import os
+import json
+import time
+import asyncio
+import threading
+import contextlib
+from collections import OrderedDict, defaultdict, deque
+from typing import List, Optional, Sequence
+
+from dotenv import load_dotenv
+from langchain_core.chat_history import BaseChatMessageHistory
+from langchain_core.messages import BaseMessage, message_to_dict, messages_from_dict
+
+load_dotenv()
+
+
+class RedisChatHistory(BaseChatMessageHistory):
+    """
+    Chat history stored in a Redis list, read through shared connection pools.
+
+    Messages are LPUSHed newest-first under the same key layout as LangChain's
+    RedisChatMessageHistory, so existing sessions stay readable. When `window`
+    is set only the newest `window` messages are fetched (LRANGE 0 window-1),
+    which keeps the cost of a turn constant as the conversation grows.
+    """
+
+    key_prefix = "message_store:"
+
+    _lock = threading.Lock()
+    _pool = None
+    _async_pool = None
+
+    def __init__(self, session_id: str, window: Optional[int] = None, ttl: Optional[int] = None,
+                 max_length: Optional[int] = None):
+        self.session_id = session_id
+        self.window = window
+        self.ttl = ttl
+        self.max_length = max_length
+
+    @property
+    def key(self) -> str:
+        return self.key_prefix + str(self.session_id)
+
+    @classmethod
+    def get_client(cls):
+        import redis
+
+        if cls._pool is None:
+            with cls._lock:
+                if cls._pool is None:
+                    cls._pool = redis.ConnectionPool.from_url(
+                        os.getenv("REDIS_URL", "redis://localhost:6379/0"),
+                        max_connections=int(os.getenv("REDIS_MAX_CONNECTIONS", "50")),
+                    )
+        return redis.Redis(connection_pool=cls._pool)
+
+    @classmethod
+    def get_async_client(cls):
+        import redis.asyncio as aioredis
+
+        if cls._async_pool is None:
+            with cls._lock:
+                if cls._async_pool is None:
+                    cls._async_pool = aioredis.ConnectionPool.from_url(
+                        os.getenv("REDIS_URL", "redis://localhost:6379/0"),
+                        max_connections=int(os.getenv("REDIS_MAX_CONNECTIONS", "50")),
+                    )
+        return aioredis.Redis(connection_pool=cls._async_pool)
+
+    @classmethod
+    async def aclose(cls):
+        if cls._async_pool is not None:
+            await cls._async_pool.disconnect()
+            cls._async_pool = None
+        if cls._pool is not None:
+            cls._pool.disconnect()
+            cls._pool = None
+
+    def _range_end(self) -> int:
+        return self.window - 1 if self.window else -1
+
+    @staticmethod
+    def _decode(items) -> List[BaseMessage]:
+        # stored newest-first, return oldest-first
+        return messages_from_dict([json.loads(item) for item in reversed(items)])
+
+    def _queue_writes(self, pipe, messages: Sequence[BaseMessage]) -> None:
+        pipe.lpush(self.key, *[json.dumps(message_to_dict(m)) for m in messages])
+        if self.max_length:
+            pipe.ltrim(self.key, 0, self.max_length - 1)
+        if self.ttl:
+            pipe.expire(self.key, self.ttl)
+
+    @property
+    def messages(self) -> List[BaseMessage]:
+        return self._decode(self.get_client().lrange(self.key, 0, self._range_end()))
+
+    async def aget_messages(self) -> List[BaseMessage]:
+        return self._decode(await self.get_async_client().lrange(self.key, 0, self._range_end()))
+
+    def get_messages_after(self, start: int) -> List[BaseMessage]:
+        # messages are stored newest-first, so the ones after `start` are the head of the list
+        client = self.get_client()
+        length = client.llen(self.key)
+        if length <= start:
+            return []
+        return self._decode(client.lrange(self.key, 0, length - start - 1))
+
+    async def aget_messages_after(self, start: int) -> List[BaseMessage]:
+        client = self.get_async_client()
+        length = await client.llen(self.key)
+        if length <= start:
+            return []
+        return self._decode(await client.lrange(self.key, 0, length - start - 1))
+
+    def add_messages(self, messages: Sequence[BaseMessage]) -> None:
+        if not messages:
+            return
+        with self.get_client().pipeline(transaction=False) as pipe:
+            self._queue_writes(pipe, messages)
+            pipe.execute()
+
+    async def aadd_messages(self, messages: Sequence[BaseMessage]) -> None:
+        if not messages:
+            return
+        async with self.get_async_client().pipeline(transaction=False) as pipe:
+            self._queue_writes(pipe, messages)
+            await pipe.execute()
+
+    def clear(self) -> None:
+        self.get_client().delete(self.key)
+
+    async def aclear(self) -> None:
+        await self.get_async_client().delete(self.key)
+
+
+class UpstashChatHistory(BaseChatMessageHistory):
+    """
+    Chat history in Upstash Redis, with the key layout of LangChain's
+    UpstashRedisChatMessageHistory so existing sessions stay readable.
+
+    Every session goes through one REST client per process (instead of a new
+    client per history), and when `window` is set only the newest `window`
+    messages are fetched, as in RedisChatHistory.
+    """
+
+    key_prefix = "message_store:"
+
+    _lock = threading.Lock()
+    _client = None
+    _async_client = None
+
+    def __init__(self, session_id: str, window: Optional[int] = None, ttl: Optional[int] = None):
+        self.session_id = session_id
+        self.window = window
+        self.ttl = ttl
+
+    @property
+    def key(self) -> str:
+        return self.key_prefix + str(self.session_id)
+
+    @classmethod
+    def get_client(cls):
+        from upstash_redis import Redis
+
+        if cls._client is None:
+            with cls._lock:
+                if cls._client is None:
+                    cls._client = Redis(url=os.getenv("UPSTASH_REDIS_URL"), token=os.getenv("UPSTASH_REDIS_TOKEN"))
+        return cls._client
+
+    @classmethod
+    def get_async_client(cls):
+        from upstash_redis.asyncio import Redis
+
+        if cls._async_client is None:
+            with cls._lock:
+                if cls._async_client is None:
+                    cls._async_client = Redis(url=os.getenv("UPSTASH_REDIS_URL"), token=os.getenv("UPSTASH_REDIS_TOKEN"))
+        return cls._async_client
+
+    @classmethod
+    async def aclose(cls):
+        if cls._async_client is not None:
+            await cls._async_client.close()
+            cls._async_client = None
+        if cls._client is not None:
+            cls._client.close()
+            cls._client = None
+
+    def _range_end(self) -> int:
+        return self.window - 1 if self.window else -1
+
+    @property
+    def messages(self) -> List[BaseMessage]:
+        return RedisChatHistory._decode(self.get_client().lrange(self.key, 0, self._range_end()))
+
+    async def aget_messages(self) -> List[BaseMessage]:
+        return RedisChatHistory._decode(await self.get_async_client().lrange(self.key, 0, self._range_end()))
+
+    def get_messages_after(self, start: int) -> List[BaseMessage]:
+        client = self.get_client()
+        length = client.llen(self.key)
+        if length <= start:
+            return []
+        return RedisChatHistory._decode(client.lrange(self.key, 0, length - start - 1))
+
+    async def aget_messages_after(self, start: int) -> List[BaseMessage]:
+        client = self.get_async_client()
+        length = await client.llen(self.key)
+        if length <= start:
+            return []
+        return RedisChatHistory._decode(await client.lrange(self.key, 0, length - start - 1))
+
+    def add_messages(self, messages: Sequence[BaseMessage]) -> None:
+        if not messages:
+            return
+        client = self.get_client()
+        client.lpush(self.key, *[json.dumps(message_to_dict(m)) for m in messages])
+        if self.ttl:
+            client.expire(self.key, self.ttl)
+
+    async def aadd_messages(self, messages: Sequence[BaseMessage]) -> None:
+        if not messages:
+            return
+        client = self.get_async_client()
+        await client.lpush(self.key, *[json.dumps(message_to_dict(m)) for m in messages])
+        if self.ttl:
+            await client.expire(self.key, self.ttl)
+
+    def clear(self) -> None:
+        self.get_client().delete(self.key)
+
+    async def aclear(self) -> None:
+        await self.get_async_client().delete(self.key)
+
+
+class InMemoryChatHistory(BaseChatMessageHistory):
+    """Process-local chat history, for tests and single-worker development."""
+
+    _lock = threading.Lock()
+    _store = defaultdict(deque)
+
+    def __init__(self, session_id: str, window: Optional[int] = None, max_length: Optional[int] = None, **kwargs):
+        self.session_id = session_id
+        self.window = window
+        self.max_length = max_length
+
+    @property
+    def messages(self) -> List[BaseMessage]:
+        with self._lock:
+            stored = self._store.get(self.session_id, ())
+            if self.window:
+                return list(stored)[-self.window:]
+            return list(stored)
+
+    def add_messages(self, messages: Sequence[BaseMessage]) -> None:
+        with self._lock:
+            stored = self._store[self.session_id]
+            stored.extend(messages)
+            if self.max_length:
+                while len(stored) > self.max_length:
+                    stored.popleft()
+
+    def clear(self) -> None:
+        with self._lock:
+            self._store.pop(self.session_id, None)
+
+    @classmethod
+    def reset(cls) -> None:
+        with cls._lock:
+            cls._store.clear()
+
+
+class ConversationCache:
+    """
+    Per-worker write-behind cache of recent session windows.
+
+    Reads are served from an LRU of the last `window` messages per session
+    (evicted after CHAT_HISTORY_CACHE_TTL seconds). Appended messages update
+    the cached window immediately and are queued for the backing store, which
+    is written in batches by a background flusher and once more on shutdown.
+    """
+
+    max_sessions = int(os.getenv("CHAT_HISTORY_CACHE_SIZE", "1024"))
+    ttl = float(os.getenv("CHAT_HISTORY_CACHE_TTL", "900"))
+    flush_interval = float(os.getenv("CHAT_HISTORY_FLUSH_INTERVAL", "0.5"))
+
+    _lock = threading.Lock()
+    _windows = OrderedDict()
+    _pending = OrderedDict()
+    _inflight = {}
+    _flusher = None
+
+    @classmethod
+    def get(cls, session_id, window):
+        with cls._lock:
+            entry = cls._windows.get(session_id)
+            if entry is None:
+                return None
+            messages, cached_window, expires_at = entry
+            if expires_at < time.monotonic() or cached_window != window:
+                del cls._windows[session_id]
+                return None
+            cls._windows.move_to_end(session_id)
+            return list(messages)
+
+    @classmethod
+    def put(cls, session_id, window, messages):
+        with cls._lock:
+            # messages not yet written to the store are missing from the remote read
+            unwritten = list(cls._inflight.get(session_id, ()))
+            if session_id in cls._pending:
+                unwritten += cls._pending[session_id][1]
+            if unwritten:
+                messages = list(messages) + unwritten
+            cls._windows[session_id] = (deque(messages, maxlen=window), window, time.monotonic() + cls.ttl)
+            cls._windows.move_to_end(session_id)
+            while len(cls._windows) > cls.max_sessions:
+                cls._windows.popitem(last=False)
+            return list(cls._windows[session_id][0])
+
+    @classmethod
+    def append(cls, history, messages):
+        with cls._lock:
+            entry = cls._windows.get(history.session_id)
+            if entry is not None:
+                entry[0].extend(messages)
+                cls._windows[history.session_id] = (entry[0], entry[1], time.monotonic() + cls.ttl)
+                cls._windows.move_to_end(history.session_id)
+            if history.session_id in cls._pending:
+                cls._pending[history.session_id][1].extend(messages)
+            else:
+                cls._pending[history.session_id] = (history, list(messages))
+
+    @classmethod
+    def invalidate(cls, session_id):
+        with cls._lock:
+            cls._windows.pop(session_id, None)
+            cls._pending.pop(session_id, None)
+
+    @classmethod
+    def _take_pending(cls):
+        with cls._lock:
+            pending = list(cls._pending.values())
+            cls._pending.clear()
+            for history, messages in pending:
+                cls._inflight[history.session_id] = messages
+        return pending
+
+    @classmethod
+    def _done(cls, batches, failed):
+        with cls._lock:
+            for history, _ in batches:
+                cls._inflight.pop(history.session_id, None)
+            for history, messages in failed:
+                if history.session_id in cls._pending:
+                    cls._pending[history.session_id][1][:0] = messages
+                else:
+                    cls._pending[history.session_id] = (history, list(messages))
+
+    @classmethod
+    async def flush(cls):
+        batches = cls._take_pending()
+        if not batches:
+            return 0
+        redis_batches = [b for b in batches if isinstance(b[0], RedisChatHistory)]
+        other_batches = [b for b in batches if not isinstance(b[0], RedisChatHistory)]
+        failed = []
+        if redis_batches:
+            try:
+                # one round trip for every session touched since the last flush
+                async with RedisChatHistory.get_async_client().pipeline(transaction=False) as pipe:
+                    for history, messages in redis_batches:
+                        history._queue_writes(pipe, messages)
+                    await pipe.execute()
+            except Exception as e:
+                print(f"Chat history flush failed: {e}")
+                failed.extend(redis_batches)
+        for history, messages in other_batches:
+            try:
+                await history.aadd_messages(messages)
+            except Exception as e:
+                print(f"Chat history flush failed: {e}")
+                failed.append((history, messages))
+        cls._done(batches, failed)
+        return len(batches) - len(failed)
+
+    @classmethod
+    def start(cls):
+        if cls._flusher is None or cls._flusher.done():
+            cls._flusher = asyncio.create_task(cls._run_flusher())
+
+    @classmethod
+    async def stop(cls):
+        if cls._flusher is not None:
+            cls._flusher.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await cls._flusher
+            cls._flusher = None
+        await cls.flush()
+
+    @classmethod
+    async def _run_flusher(cls):
+        while True:
+            await asyncio.sleep(cls.flush_interval)
+            await cls.flush()
+
+
+class CachedChatHistory(BaseChatMessageHistory):
+    """Window-bounded history served from ConversationCache, written behind to `backend`."""
+
+    def __init__(self, backend: BaseChatMessageHistory, window: int):
+        self.backend = backend
+        self.session_id = backend.session_id
+        self.window = window
+
+    @property
+    def messages(self) -> List[BaseMessage]:
+        cached = ConversationCache.get(self.session_id, self.window)
+        if cached is not None:
+            return cached
+        return ConversationCache.put(self.session_id, self.window, self.backend.messages[-self.window:])
+
+    async def aget_messages(self) -> List[BaseMessage]:
+        cached = ConversationCache.get(self.session_id, self.window)
+        if cached is not None:
+            return cached
+        messages = await self.backend.aget_messages()
+        return ConversationCache.put(self.session_id, self.window, messages[-self.window:])
+
+    def add_messages(self, messages: Sequence[BaseMessage]) -> None:
+        if messages:
+            ConversationCache.append(self.backend, list(messages))
+
+    async def aadd_messages(self, messages: Sequence[BaseMessage]) -> None:
+        self.add_messages(messages)
+
+    def clear(self) -> None:
+        ConversationCache.invalidate(self.session_id)
+        self.backend.clear()
+
+
+class RedisSummaryStore:
+    """Running conversation summary kept in a Redis hash next to the session's messages."""
+
+    key_prefix = "summary_store:"
+
+    def _key(self, session_id) -> str:
+        return self.key_prefix + str(session_id)
+
+    @staticmethod
+    def _decode(raw):
+        raw = {(k.decode() if isinstance(k, bytes) else k): (v.decode() if isinstance(v, bytes) else v)
+               for k, v in (raw or {}).items()}
+        return raw.get("summary", ""), int(raw.get("summarized", 0))
+
+    def get(self, session_id):
+        return self._decode(RedisChatHistory.get_client().hgetall(self._key(session_id)))
+
+    async def aget(self, session_id):
+        return self._decode(await RedisChatHistory.get_async_client().hgetall(self._key(session_id)))
+
+    def set(self, session_id, summary, summarized):
+        RedisChatHistory.get_client().hset(self._key(session_id), mapping={"summary": summary, "summarized": summarized})
+
+    async def aset(self, session_id, summary, summarized):
+        await RedisChatHistory.get_async_client().hset(
+            self._key(session_id), mapping={"summary": summary, "summarized": summarized}
+        )
+
+
+class UpstashSummaryStore(RedisSummaryStore):
+    """Running conversation summary kept in an Upstash hash next to the session's messages."""
+
+    def get(self, session_id):
+        return self._decode(UpstashChatHistory.get_client().hgetall(self._key(session_id)))
+
+    async def aget(self, session_id):
+        return self._decode(await UpstashChatHistory.get_async_client().hgetall(self._key(session_id)))
+
+    def set(self, session_id, summary, summarized):
+        UpstashChatHistory.get_client().hset(self._key(session_id), values={"summary": summary, "summarized": summarized})
+
+    async def aset(self, session_id, summary, summarized):
+        await UpstashChatHistory.get_async_client().hset(
+            self._key(session_id), values={"summary": summary, "summarized": summarized}
+        )
+
+
+class InMemorySummaryStore:
+    """
+    Process-local running summaries, used with the memory backend. Bounded to
+    SUMMARY_STORE_SIZE sessions (least recently used evicted first), each
+    dropped SUMMARY_STORE_TTL seconds after it was last written.
+    """
+
+    max_sessions = int(os.getenv("SUMMARY_STORE_SIZE", "1024"))
+    ttl = float(os.getenv("SUMMARY_STORE_TTL", "86400"))
+
+    _lock = threading.Lock()
+    _store = OrderedDict()
+
+    def get(self, session_id):
+        with self._lock:
+            entry = self._store.get(session_id)
+            if entry is None:
+                return "", 0
+            summary, summarized, expires_at = entry
+            if expires_at < time.monotonic():
+                del self._store[session_id]
+                return "", 0
+            self._store.move_to_end(session_id)
+            return summary, summarized
+
+    async def aget(self, session_id):
+        return self.get(session_id)
+
+    def set(self, session_id, summary, summarized):
+        with self._lock:
+            self._store[session_id] = (summary, summarized, time.monotonic() + self.ttl)
+            self._store.move_to_end(session_id)
+            while len(self._store) > self.max_sessions:
+                self._store.popitem(last=False)
+
+    async def aset(self, session_id, summary, summarized):
+        self.set(session_id, summary, summarized)
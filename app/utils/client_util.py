@@ -0,0 +1,94 @@
+import os
+import threading
+from collections import OrderedDict
+
+import httpx
+from dotenv import load_dotenv
+
+load_dotenv()
+
+
+class ClientUtils:
+    """
+    Process-wide pool of LLM clients, and the HTTP transports shared by the
+    ones that accept an httpx client (OpenAI and Groq).
+
+    Clients are keyed by (platform, model_code, temperature, top_p, top_k) and
+    evicted least-recently-used once the pool is full, so a repeat request for
+    the same model reuses its client and the keep-alive connections behind it.
+    The other providers can't take a transport: Anthropic already shares one
+    cached httpx client per base URL, Gemini and NVIDIA keep a channel or
+    session per (pooled) client, and the Ollama and DeepInfra LLMs open a
+    connection per call.
+    """
+
+    max_clients = int(os.getenv("LLM_CLIENT_POOL_SIZE", "32"))
+    http_limits = httpx.Limits(
+        max_connections=int(os.getenv("LLM_HTTP_MAX_CONNECTIONS", "100")),
+        max_keepalive_connections=int(os.getenv("LLM_HTTP_MAX_KEEPALIVE", "20")),
+        keepalive_expiry=30.0,
+    )
+    http_timeout = httpx.Timeout(float(os.getenv("LLM_HTTP_TIMEOUT", "120")), connect=10.0)
+
+    _lock = threading.Lock()
+    _clients = OrderedDict()
+    _http_client = None
+    _http_async_client = None
+
+    @classmethod
+    def get_http_client(cls):
+        if cls._http_client is None:
+            with cls._lock:
+                if cls._http_client is None:
+                    cls._http_client = httpx.Client(limits=cls.http_limits, timeout=cls.http_timeout)
+        return cls._http_client
+
+    @classmethod
+    def get_http_async_client(cls):
+        if cls._http_async_client is None:
+            with cls._lock:
+                if cls._http_async_client is None:
+                    cls._http_async_client = httpx.AsyncClient(limits=cls.http_limits, timeout=cls.http_timeout)
+        return cls._http_async_client
+
+    @classmethod
+    def get_or_create(cls, key, factory):
+        try:
+            hash(key)
+        except TypeError:
+            # unhashable sampling params (e.g. a list from the request body) can't be pooled
+            return factory()
+
+        with cls._lock:
+            client = cls._clients.get(key)
+            if client is not None:
+                cls._clients.move_to_end(key)
+                return client
+
+        client = factory()
+
+        with cls._lock:
+            # another request may have built the same client meanwhile, keep the first one
+            existing = cls._clients.get(key)
+            if existing is not None:
+                cls._clients.move_to_end(key)
+                return existing
+            cls._clients[key] = client
+            while len(cls._clients) > cls.max_clients:
+                cls._clients.popitem(last=False)
+        return client
+
+    @classmethod
+    def clear(cls):
+        with cls._lock:
+            cls._clients.clear()
+
+    @classmethod
+    async def aclose(cls):
+        cls.clear()
+        if cls._http_async_client is not None:
+            await cls._http_async_client.aclose()
+            cls._http_async_client = None
+        if cls._http_client is not None:
+            cls._http_client.close()
+            cls._http_client = None
@@ -0,0 +1,35 @@
+import os
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+
+class ConcurrencyUtils:
+    """
+    Bounded thread pool for the blocking calls (SDK clients without an async API,
+    file and socket I/O) that async routes still need to make.
+    """
+
+    max_workers = int(os.getenv("BLOCKING_POOL_SIZE", "32"))
+    _executor = None
+
+    @classmethod
+    def get_executor(cls):
+        if cls._executor is None:
+            cls._executor = ThreadPoolExecutor(max_workers=cls.max_workers, thread_name_prefix="blocking")
+        return cls._executor
+
+    @classmethod
+    async def run_blocking(cls, func, *args, **kwargs):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(cls.get_executor(), functools.partial(func, *args, **kwargs))
+
+    @classmethod
+    def shutdown(cls):
+        if cls._executor is not None:
+            cls._executor.shutdown(wait=False)
+            cls._executor = None
@@ -0,0 +1,256 @@
+import os
+import re
+import sqlite3
+import threading
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+
+class FileCabinetIndex:
+    """
+    Persistent index of the files in FILE_CABINET_PATH, kept in SQLite.
+
+    A `files` table holds name, mtime, size and the head excerpt of every
+    cabinet file; a trigram FTS5 table holds their text. Listing, by-name
+    lookup and search are answered from the index without opening the files.
+    Search keeps the substring semantics of a plain scan: newest file first,
+    the stored text is checked for a case-insensitive match, and past the
+    newest SEARCH_SCAN_FIRST files an FTS query skips the files that cannot
+    contain the term. FileOpsTool updates the index on every write, and a watcher
+    thread re-syncs it with the directory every CABINET_SCAN_INTERVAL seconds
+    to pick up files changed outside the app (only stat() calls, files are
+    read again only when their mtime or size changed).
+    """
+
+    directory = os.getenv('FILE_CABINET_PATH')
+    path = os.getenv('CABINET_INDEX_PATH') or (os.path.join(directory, '.cabinet_index.db') if directory else None)
+    scan_interval = float(os.getenv('CABINET_SCAN_INTERVAL', '30'))
+    EXTENSIONS = ('.txt', '.html')
+    EXCERPT_CHARS = 500
+    SEARCH_SCAN_FIRST = 32
+
+    _lock = threading.RLock()
+    _db = None
+    _unavailable = False
+    # False when SQLite has no trigram tokenizer (before 3.34), search then checks every file
+    _trigram = True
+    _watcher = None
+    _stop_event = threading.Event()
+
+    @classmethod
+    def available(cls) -> bool:
+        return cls._open() is not None
+
+    @staticmethod
+    def excerpt(content: str) -> str:
+        limit = FileCabinetIndex.EXCERPT_CHARS
+        return content[:limit] + "..." if len(content) > limit else content
+
+    @staticmethod
+    def snippet(content: str, match) -> str:
+        """An excerpt-sized window of `content` centred on a regex match."""
+        half = max(FileCabinetIndex.EXCERPT_CHARS - len(match.group()), 0) // 2
+        start = max(match.start() - half, 0)
+        end = match.end() + half
+        return ("..." if start > 0 else "") + content[start:end] + ("..." if end < len(content) else "")
+
+    @classmethod
+    def index_file(cls, name: str, content: str = None) -> None:
+        """(Re)index one cabinet file; `content` skips re-reading a file the caller just wrote."""
+        db = cls._open()
+        if db is None or not name.endswith(cls.EXTENSIONS):
+            return
+        filepath = os.path.join(cls.directory, name)
+        try:
+            stat = os.stat(filepath)
+            if content is None:
+                with open(filepath, 'r', encoding='utf-8', errors='replace') as f:
+                    content = f.read()
+        except OSError:
+            cls.remove(name)
+            return
+        with cls._lock:
+            cls._delete(db, name)
+            cursor = db.execute(
+                "INSERT INTO files (name, mtime, size, excerpt) VALUES (?, ?, ?, ?)",
+                (name, stat.st_mtime, stat.st_size, cls.excerpt(content)),
+            )
+            db.execute("INSERT INTO files_fts (rowid, name, content) VALUES (?, ?, ?)",
+                       (cursor.lastrowid, name, content))
+            db.commit()
+
+    @classmethod
+    def remove(cls, name: str) -> None:
+        db = cls._open()
+        if db is None:
+            return
+        with cls._lock:
+            cls._delete(db, name)
+            db.commit()
+
+    @classmethod
+    def sync(cls) -> int:
+        """Brings the index in line with the directory, returns how many files changed."""
+        db = cls._open()
+        if db is None:
+            return 0
+        with cls._lock:
+            indexed = {name: (mtime, size) for name, mtime, size in db.execute("SELECT name, mtime, size FROM files")}
+        on_disk = {}
+        with os.scandir(cls.directory) as entries:
+            for entry in entries:
+                if entry.name.endswith(cls.EXTENSIONS) and entry.is_file():
+                    stat = entry.stat()
+                    on_disk[entry.name] = (stat.st_mtime, stat.st_size)
+
+        changed = [name for name, signature in on_disk.items() if indexed.get(name) != signature]
+        removed = [name for name in indexed if name not in on_disk]
+        for name in changed:
+            cls.index_file(name)
+        for name in removed:
+            cls.remove(name)
+        return len(changed) + len(removed)
+
+    @classmethod
+    def latest(cls, limit: int):
+        return cls._query("SELECT name, excerpt FROM files ORDER BY mtime DESC LIMIT ?", (limit,))
+
+    @classmethod
+    def by_name(cls, value: str, limit: int):
+        pattern = '%' + value.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_') + '%'
+        return cls._query(
+            "SELECT name, excerpt FROM files WHERE name LIKE ? ESCAPE '\\' ORDER BY mtime DESC LIMIT ?",
+            (pattern, limit),
+        )
+
+    @classmethod
+    def search(cls, value: str, limit: int):
+        """Files containing `value` (case-insensitive), newest first, each with a snippet around the match."""
+        if not value:
+            return cls.latest(limit)
+        pattern = re.compile(re.escape(value), re.IGNORECASE)
+        results = []
+        db = cls._open()
+        phrase = None
+        # keyset cursor over (mtime, rowid), newest first
+        cursor = (float('inf'), float('inf'))
+        scanned = 0
+        while True:
+            if phrase is None and scanned >= cls.SEARCH_SCAN_FIRST and cls._trigram and len(value) >= 3:
+                # not found enough among the newest files, so the term is rare: let FTS skip the rest
+                phrase = '"' + value.replace('"', '""') + '"'
+            page_size = cls.SEARCH_SCAN_FIRST - scanned if scanned < cls.SEARCH_SCAN_FIRST else 256
+            # the lock is held for one query at a time, never across the scan, so writers
+            # and the watcher get in between pages and rows
+            with cls._lock:
+                page = db.execute(
+                    "SELECT rowid, name, mtime FROM files WHERE (mtime < ? OR (mtime = ? AND rowid < ?))"
+                    + (" AND rowid IN (SELECT rowid FROM files_fts WHERE files_fts MATCH ?)" if phrase else "")
+                    + " ORDER BY mtime DESC, rowid DESC LIMIT ?",
+                    (cursor[0], cursor[0], cursor[1]) + ((phrase,) if phrase else ()) + (page_size,),
+                ).fetchall()
+            scanned += len(page)
+            # newest first, loading text one file at a time until `limit` matched
+            for rowid, name, _ in page:
+                with cls._lock:
+                    row = db.execute("SELECT content FROM files_fts WHERE rowid = ?", (rowid,)).fetchone()
+                if row is None:
+                    # removed or re-indexed since the page was read
+                    continue
+                match = pattern.search(row[0])
+                if match:
+                    results.append((name, cls.snippet(row[0], match)))
+                    if len(results) >= limit:
+                        return results
+            if len(page) < page_size:
+                return results
+            cursor = (page[-1][2], page[-1][0])
+
+    @classmethod
+    def start(cls) -> None:
+        if cls._watcher is not None or not cls.available():
+            return
+        cls._stop_event.clear()
+        cls._watcher = threading.Thread(target=cls._watch, name="cabinet-watcher", daemon=True)
+        cls._watcher.start()
+
+    @classmethod
+    def stop(cls) -> None:
+        cls._stop_event.set()
+        if cls._watcher is not None:
+            cls._watcher.join(timeout=5)
+            cls._watcher = None
+        with cls._lock:
+            if cls._db is not None:
+                cls._db.close()
+                cls._db = None
+
+    @classmethod
+    def _watch(cls) -> None:
+        # opening the index already synced once
+        while not cls._stop_event.wait(cls.scan_interval):
+            try:
+                cls.sync()
+            except Exception as e:
+                print(f"File cabinet sync failed: {e}")
+
+    @classmethod
+    def _query(cls, sql, params):
+        db = cls._open()
+        with cls._lock:
+            return db.execute(sql, params).fetchall()
+
+    @staticmethod
+    def _delete(db, name):
+        row = db.execute("SELECT rowid FROM files WHERE name = ?", (name,)).fetchone()
+        if row is not None:
+            db.execute("DELETE FROM files_fts WHERE rowid = ?", (row[0],))
+            db.execute("DELETE FROM files WHERE rowid = ?", (row[0],))
+
+    @classmethod
+    def _create_fts(cls, db):
+        row = db.execute("SELECT sql FROM sqlite_master WHERE name = 'files_fts'").fetchone()
+        if row is not None and 'trigram' in row[0]:
+            return
+        try:
+            db.execute("CREATE VIRTUAL TABLE temp.trigram_probe USING fts5(content, tokenize='trigram')")
+            db.execute("DROP TABLE temp.trigram_probe")
+        except sqlite3.OperationalError:
+            cls._trigram = False
+            db.execute("CREATE VIRTUAL TABLE IF NOT EXISTS files_fts USING fts5(name, content)")
+            return
+        if row is not None:
+            # built with the word tokenizer by an older version, the first sync refills it
+            db.execute("DROP TABLE files_fts")
+            db.execute("DELETE FROM files")
+        db.execute("CREATE VIRTUAL TABLE files_fts USING fts5(name, content, tokenize='trigram')")
+
+    @classmethod
+    def _open(cls):
+        if cls._db is not None or cls._unavailable:
+            return cls._db
+        with cls._lock:
+            if cls._db is not None or cls._unavailable:
+                return cls._db
+            if not cls.directory or not os.path.isdir(cls.directory):
+                cls._unavailable = True
+                return None
+            try:
+                db = sqlite3.connect(cls.path, check_same_thread=False)
+                db.execute("PRAGMA journal_mode=WAL")
+                db.execute("CREATE TABLE IF NOT EXISTS files "
+                           "(name TEXT UNIQUE NOT NULL, mtime REAL, size INTEGER, excerpt TEXT)")
+                db.execute("CREATE INDEX IF NOT EXISTS files_mtime ON files (mtime)")
+                cls._create_fts(db)
+                db.commit()
+            except sqlite3.Error as e:
+                # e.g. SQLite built without FTS5, FileOpsTool falls back to scanning the directory
+                print(f"File cabinet index unavailable: {e}")
+                cls._unavailable = True
+                return None
+            cls._db = db
+        # first use in this process: catch up with whatever changed while it wasn't running
+        cls.sync()
+        return cls._db
@@ -0,0 +1,154 @@
+import os
+import gzip
+import tempfile
+import threading
+from weakref import WeakValueDictionary
+
+from dotenv import load_dotenv
+
+from utils.concurrency_util import ConcurrencyUtils
+
+load_dotenv()
+
+
+def _default_file_mode() -> int:
+    # mkstemp creates 0600 files, give written files the mode open() would have
+    umask = os.umask(0)
+    os.umask(umask)
+    return 0o666 & ~umask
+
+
+class FileWriteUtils:
+    """
+    Atomic file writes shared by the file-writing tools.
+
+    Content goes to a temp file in the target directory and is moved into
+    place with os.replace, so readers see either the old file or the new one,
+    never a torn one. Writers of the same path are serialized by a per-path
+    lock. Durability follows WRITE_FSYNC: "always" fsyncs every file and its
+    directory before returning, "batch" (default) leaves that to a flusher
+    thread that fsyncs everything written in the last WRITE_FSYNC_INTERVAL
+    seconds in one go, "never" leaves it to the OS.
+    """
+
+    fsync_policy = os.getenv("WRITE_FSYNC", "batch").lower()
+    fsync_interval = float(os.getenv("WRITE_FSYNC_INTERVAL", "1.0"))
+
+    file_mode = _default_file_mode()
+
+    _lock = threading.Lock()
+    _path_locks = WeakValueDictionary()
+    _pending = set()
+    _flusher = None
+    _stop_event = threading.Event()
+
+    @classmethod
+    def _path_lock(cls, path: str) -> threading.Lock:
+        key = os.path.realpath(path)
+        with cls._lock:
+            lock = cls._path_locks.get(key)
+            if lock is None:
+                lock = threading.Lock()
+                cls._path_locks[key] = lock
+            return lock
+
+    @classmethod
+    def write(cls, path: str, content, compress_min_bytes: int = 0) -> str:
+        """
+        Atomically write `content` (str or bytes) to `path` and return the path written.
+
+        If `compress_min_bytes` is set and the content is at least that large,
+        it is gzipped and written to `path + ".gz"` instead.
+        """
+        data = content.encode('utf-8') if isinstance(content, str) else content
+        if compress_min_bytes and len(data) >= compress_min_bytes:
+            data = gzip.compress(data)
+            path += '.gz'
+
+        directory = os.path.dirname(os.path.abspath(path))
+        lock = cls._path_lock(path)
+        with lock:
+            fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=f".{os.path.basename(path)}.", suffix=".tmp")
+            try:
+                with os.fdopen(fd, 'wb') as f:
+                    os.fchmod(f.fileno(), cls.file_mode)
+                    f.write(data)
+                    if cls.fsync_policy == "always":
+                        f.flush()
+                        os.fsync(f.fileno())
+                os.replace(tmp_path, path)
+            except BaseException:
+                try:
+                    os.unlink(tmp_path)
+                except OSError:
+                    pass
+                raise
+        if cls.fsync_policy == "always":
+            cls._fsync_directory(directory)
+        elif cls.fsync_policy == "batch":
+            cls._schedule_fsync(path)
+        return path
+
+    @classmethod
+    async def awrite(cls, path: str, content, compress_min_bytes: int = 0) -> str:
+        return await ConcurrencyUtils.run_blocking(cls.write, path, content, compress_min_bytes)
+
+    @classmethod
+    def flush(cls) -> None:
+        """fsync every file written since the last flush, then their directories."""
+        with cls._lock:
+            paths = list(cls._pending)
+            cls._pending.clear()
+        directories = set()
+        for path in paths:
+            try:
+                fd = os.open(path, os.O_RDONLY)
+                try:
+                    os.fsync(fd)
+                finally:
+                    os.close(fd)
+            except OSError:
+                # replaced or removed since, nothing left to flush
+                continue
+            directories.add(os.path.dirname(os.path.abspath(path)))
+        for directory in directories:
+            cls._fsync_directory(directory)
+
+    @classmethod
+    def shutdown(cls) -> None:
+        cls._stop_event.set()
+        if cls._flusher is not None:
+            cls._flusher.join(timeout=5)
+            cls._flusher = None
+        cls.flush()
+
+    @classmethod
+    def _schedule_fsync(cls, path: str) -> None:
+        with cls._lock:
+            cls._pending.add(path)
+            if cls._flusher is None:
+                cls._stop_event.clear()
+                cls._flusher = threading.Thread(target=cls._flush_loop, name="fsync-flusher", daemon=True)
+                cls._flusher.start()
+
+    @classmethod
+    def _flush_loop(cls) -> None:
+        while not cls._stop_event.wait(cls.fsync_interval):
+            try:
+                cls.flush()
+            except Exception as e:
+                print(f"Batched fsync failed: {e}")
+
+    @staticmethod
+    def _fsync_directory(directory: str) -> None:
+        # makes the rename itself durable; not supported on every platform
+        try:
+            fd = os.open(directory, os.O_RDONLY)
+        except OSError:
+            return
+        try:
+            os.fsync(fd)
+        except OSError:
+            pass
+        finally:
+            os.close(fd)
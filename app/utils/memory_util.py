@@ -2,33 +2,50 @@ import os
 from dotenv import load_dotenv
 from datetime import datetime
 
-
-from langchain_community.chat_message_histories import (
-    UpstashRedisChatMessageHistory, RedisChatMessageHistory
-)
-from langchain.memory import ConversationBufferMemory, ConversationBufferWindowMemory, ConversationTokenBufferMemory, ConversationSummaryMemory, ConversationSummaryBufferMemory
+from langchain.memory import ConversationBufferMemory, ConversationBufferWindowMemory, ConversationTokenBufferMemory, ConversationSummaryMemory
 from langchain_community.llms import Ollama
 
 from utils.session_util import SessionUtils
+from utils.chat_history_util import (
+    RedisChatHistory, UpstashChatHistory, InMemoryChatHistory, CachedChatHistory,
+    RedisSummaryStore, UpstashSummaryStore, InMemorySummaryStore,
+)
+from utils.summary_memory_util import RollingSummaryMemory
+from utils.client_util import ClientUtils
 
 load_dotenv(override=True)
 
+# "upstash" (Upstash REST client, the default), "redis" (pooled client for a Redis you run) or "memory" (in-process)
+CHAT_HISTORY_BACKEND = os.getenv("CHAT_HISTORY_BACKEND", "upstash")
+# serve windowed histories from the per-worker write-behind cache
+CHAT_HISTORY_CACHE = os.getenv("CHAT_HISTORY_CACHE", "true").lower() == "true"
+# memory used by the chat endpoints: "window" (last BUFFER_WINDOW_K exchanges) or "summary" (rolling summary + token budget)
+CHAT_MEMORY = os.getenv("CHAT_MEMORY", "window")
+BUFFER_WINDOW_K = 5
+SUMMARY_MODEL = os.getenv("SUMMARY_MODEL", "llama3.1")
+SUMMARY_MAX_TOKENS = int(os.getenv("SUMMARY_MAX_TOKENS", "1000"))
+
 class MemoryUtils:
-        
-    def init_upstash(self, uuid=None):
-        upstash_redis_url = os.getenv("UPSTASH_REDIS_URL")
-        upstash_redis_token = os.getenv("UPSTASH_REDIS_TOKEN")
 
+    def init_history(self, uuid=None, window=None):
+        if CHAT_HISTORY_BACKEND == "redis":
+            history = self.init_redis(uuid, window)
+        elif CHAT_HISTORY_BACKEND == "memory":
+            history = InMemoryChatHistory(session_id=uuid, window=window)
+        else:
+            history = self.init_upstash(uuid, window)
+        if window and CHAT_HISTORY_CACHE:
+            return CachedChatHistory(history, window)
+        return history
 
-        history = UpstashRedisChatMessageHistory(
-            url=upstash_redis_url, token=upstash_redis_token, ttl=0, session_id=uuid
-        )
-        return history    
+    def init_upstash(self, uuid=None, window=None):
+        # one client per process, shared by every session
+        history = UpstashChatHistory(session_id=uuid, window=window)
+        return history
 
 
-    def init_redis(self):
-        redis_url = os.getenv("REDIS_URL")
-        history = RedisChatMessageHistory(url=redis_url, ttl=0, session_id=self.generate_session_id)
+    def init_redis(self, uuid=None, window=None):
+        history = RedisChatHistory(session_id=uuid, window=window)
         return history
 
 
@@ -39,9 +56,14 @@ class MemoryUtils:
     #     return f"{timestamp}-{sequence}"
     
 
+    def init_chat_memory(self, uuid=None):
+        if CHAT_MEMORY == "summary":
+            return self.init_summary_buffer_memory(uuid)
+        return self.init_buffer_window_memory(uuid)
+
     def init_buffer_memory(self):
         memory = ConversationBufferMemory(
-            chat_memory=self.init_upstash(),
+            chat_memory=self.init_history(),
             return_messages=True,
         )
         return memory
@@ -49,8 +71,9 @@ class MemoryUtils:
     def init_buffer_window_memory(self, uuid=None):
         memory = ConversationBufferWindowMemory(
             # memory_key="chat_history",
-            chat_memory=self.init_upstash(uuid),
-            k=5,
+            # the window memory only ever looks at the last k exchanges, so only fetch those
+            chat_memory=self.init_history(uuid, window=BUFFER_WINDOW_K * 2),
+            k=BUFFER_WINDOW_K,
             return_messages=True,
             # output_key="output"
         )
@@ -61,7 +84,7 @@ class MemoryUtils:
     def init_token_buffer_memory(self):
         memory = ConversationTokenBufferMemory(
             llm=self.init_ollama(),
-            chat_memory=self.init_upstash(),
+            chat_memory=self.init_history(),
             max_token_limit=25,
             return_messages=False,
         )
@@ -70,22 +93,33 @@ class MemoryUtils:
     def init_summary_memory(self):
         memory = ConversationSummaryMemory(
             llm=self.init_ollama(),
-            chat_memory=self.init_upstash(),
+            chat_memory=self.init_history(),
             return_messages=True,
         )
         print('Here is memory: ')
         return memory
     
-    def init_summary_buffer_memory(self):
-        memory = ConversationSummaryBufferMemory(
+    def init_summary_buffer_memory(self, uuid=None):
+        # ConversationSummaryBufferMemory re-summarizes on the response path and counts
+        # tokens through the llm (broken with ollama), so use the rolling summary instead
+        # the summary lives next to the history, so every worker sees the same one
+        if CHAT_HISTORY_BACKEND == "redis":
+            summary_store = RedisSummaryStore()
+        elif CHAT_HISTORY_BACKEND == "memory":
+            summary_store = InMemorySummaryStore()
+        else:
+            summary_store = UpstashSummaryStore()
+        memory = RollingSummaryMemory(
             llm=self.init_ollama(),
-            chat_memory=self.init_upstash(),
-            max_token_limit=100,
+            chat_memory=self.init_history(uuid),
+            session_id=str(uuid),
+            summary_store=summary_store,
+            max_token_limit=SUMMARY_MAX_TOKENS,
             return_messages=True,
         )
         return memory
 
     def init_ollama(self):
-        llm = Ollama(model='llama3.1')
+        llm = ClientUtils.get_or_create(("memory", "ollama_platform", SUMMARY_MODEL), lambda: Ollama(model=SUMMARY_MODEL))
         return llm
     
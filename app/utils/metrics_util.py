@@ -0,0 +1,164 @@
+import os
+import hashlib
+import threading
+from collections import OrderedDict, defaultdict
+from typing import Any, Dict, List
+
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain.schema import LLMResult
+
+_encoding = None
+_encoding_loaded = False
+_encoding_lock = threading.Lock()
+
+
+def _get_encoding():
+    # loading the BPE ranks is slow (and may download them), so only do it on first use
+    global _encoding, _encoding_loaded
+    if not _encoding_loaded:
+        with _encoding_lock:
+            if not _encoding_loaded:
+                try:
+                    import tiktoken
+                    _encoding = tiktoken.get_encoding("cl100k_base")
+                except Exception:  # tiktoken is optional, fall back to a character heuristic
+                    _encoding = None
+                _encoding_loaded = True
+    return _encoding
+
+
+def estimate_tokens(text) -> int:
+    if not text:
+        return 0
+    text = str(text)
+    encoding = _get_encoding()
+    if encoding is not None:
+        return len(encoding.encode(text, disallowed_special=()))
+    # roughly 4 characters per token for English text
+    return max(1, (len(text) + 3) // 4)
+
+
+def empty_usage() -> Dict[str, int]:
+    return {"completion_tokens": 0, "prompt_tokens": 0, "total_tokens": 0}
+
+
+class UsageCallbackHandler(BaseCallbackHandler):
+    """
+    Collects token usage for every LLM call made during one request.
+
+    Providers that report usage (usage_metadata on chat messages, or
+    token_usage/usage in llm_output) are counted as reported; for calls that
+    report nothing the prompt and completion are estimated locally.
+    """
+
+    run_inline = True
+
+    def __init__(self):
+        self.usage = empty_usage()
+        self.estimated = False
+        self._prompts = {}
+
+    def on_llm_start(self, serialized: Dict[str, Any], prompts: List[str], **kwargs: Any) -> None:
+        self._prompts[kwargs.get("run_id")] = "\n".join(prompts)
+
+    def on_chat_model_start(self, serialized: Dict[str, Any], messages: List[List[Any]], **kwargs: Any) -> None:
+        self._prompts[kwargs.get("run_id")] = "\n".join(
+            str(message.content) for batch in messages for message in batch
+        )
+
+    def on_llm_end(self, response: LLMResult, **kwargs: Any) -> None:
+        prompt = self._prompts.pop(kwargs.get("run_id"), "")
+        usage = self._usage_from_generations(response) or self._usage_from_llm_output(response.llm_output)
+        if usage is None:
+            completion = "".join(g.text for gens in response.generations for g in gens)
+            usage = {
+                "prompt_tokens": estimate_tokens(prompt),
+                "completion_tokens": estimate_tokens(completion),
+            }
+            self.estimated = True
+        self.add(usage)
+
+    def add(self, usage: Dict[str, int]) -> None:
+        prompt_tokens = int(usage.get("prompt_tokens") or 0)
+        completion_tokens = int(usage.get("completion_tokens") or 0)
+        self.usage["prompt_tokens"] += prompt_tokens
+        self.usage["completion_tokens"] += completion_tokens
+        self.usage["total_tokens"] += int(usage.get("total_tokens") or prompt_tokens + completion_tokens)
+
+    @staticmethod
+    def _usage_from_generations(response: LLMResult):
+        usage = None
+        for gens in response.generations:
+            for generation in gens:
+                metadata = getattr(getattr(generation, "message", None), "usage_metadata", None)
+                if metadata:
+                    usage = usage or empty_usage()
+                    usage["prompt_tokens"] += metadata.get("input_tokens", 0)
+                    usage["completion_tokens"] += metadata.get("output_tokens", 0)
+                    usage["total_tokens"] += metadata.get("total_tokens", 0)
+        return usage
+
+    @staticmethod
+    def _usage_from_llm_output(llm_output):
+        llm_output = llm_output or {}
+        raw = llm_output.get("token_usage") or llm_output.get("usage")
+        if not raw:
+            return None
+        if not isinstance(raw, dict):
+            raw = {key: getattr(raw, key) for key in dir(raw) if key.endswith("tokens")}
+        return {
+            "prompt_tokens": raw.get("prompt_tokens", raw.get("input_tokens", 0)),
+            "completion_tokens": raw.get("completion_tokens", raw.get("output_tokens", 0)),
+            "total_tokens": raw.get("total_tokens", 0),
+        }
+
+
+class MetricsUtils:
+    """
+    In-process token usage totals, aggregated per session and per model.
+
+    Only the METRICS_MAX_SESSIONS most recently active sessions are kept, and
+    snapshots identify them by a hash: the raw id is the chat history key.
+    """
+
+    max_sessions = int(os.getenv("METRICS_MAX_SESSIONS", "1000"))
+
+    _lock = threading.Lock()
+    _sessions = OrderedDict()
+    _models = defaultdict(lambda: dict(empty_usage(), requests=0))
+
+    @staticmethod
+    def session_label(session_id: str) -> str:
+        return hashlib.sha256(session_id.encode("utf-8")).hexdigest()[:16]
+
+    @classmethod
+    def record(cls, session_id, model_code, usage: Dict[str, int]) -> None:
+        with cls._lock:
+            session_key = session_id or "anonymous"
+            session = cls._sessions.pop(session_key, None) or dict(empty_usage(), requests=0)
+            cls._sessions[session_key] = session
+            while len(cls._sessions) > cls.max_sessions:
+                cls._sessions.popitem(last=False)
+            for entry in (session, cls._models[model_code or "unknown"]):
+                entry["requests"] += 1
+                for field in ("completion_tokens", "prompt_tokens", "total_tokens"):
+                    entry[field] += usage.get(field, 0)
+
+    @classmethod
+    def snapshot(cls) -> Dict[str, Any]:
+        with cls._lock:
+            totals = dict(empty_usage(), requests=0)
+            for entry in cls._models.values():
+                for field in totals:
+                    totals[field] += entry[field]
+            return {
+                "totals": totals,
+                "models": {key: dict(value) for key, value in cls._models.items()},
+                "sessions": {cls.session_label(key): dict(value) for key, value in cls._sessions.items()},
+            }
+
+    @classmethod
+    def reset(cls) -> None:
+        with cls._lock:
+            cls._sessions.clear()
+            cls._models.clear()
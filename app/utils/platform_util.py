@@ -1,41 +1,102 @@
+import os
+import json
+import time
+import threading
+
 import yaml
 from yaml import SafeLoader
 
 
+PLATFORM_CONFIG_PATH = '../app/configs/llm_platform.yaml'
+PLATFORM_SETTING_PATH = '../app/configs/llm_platform_setting.yaml'
+
+# how often (in seconds) the config files are stat'ed for changes
+RELOAD_CHECK_INTERVAL = float(os.getenv("PLATFORM_RELOAD_CHECK_INTERVAL", "2"))
+
+
 class PlatformUtils:
+    """
+    Model registry backed by llm_platform.yaml and llm_platform_setting.yaml.
 
-    def load_yaml_and_get_model(self, model_name):
-        with open('../app/configs/llm_platform.yaml') as f:
-            data = yaml.load(f, Loader=SafeLoader)
-        model_code, platform = self.get_model_code_and_platform(model_name, data)
+    The files are parsed once per process into lookup dicts shared by every
+    PlatformUtils instance, and re-parsed only when their mtime changes.
+    """
+
+    _lock = threading.Lock()
+    _mtimes = None
+    _last_check = 0.0
+    _models = {}
+    _platforms = {}
+    _platforms_json = b""
+
+    @classmethod
+    def load_registry(cls, force=False):
+        with cls._lock:
+            mtimes = cls._get_mtimes()
+            if not force and mtimes == cls._mtimes:
+                return
+
+            with open(PLATFORM_CONFIG_PATH) as f:
+                data = yaml.load(f, Loader=SafeLoader) or {}
+            with open(PLATFORM_SETTING_PATH) as f:
+                settings = yaml.load(f, Loader=SafeLoader)
 
-        return model_code, platform
+            models = {}
+            formatted_data = {}
+            for platform, entries in data.items():
+                for model in entries or []:
+                    for model_name, model_code in model.items():
+                        # first match wins, same as the old linear scan
+                        models.setdefault(model_name, (model_code, platform))
+                        models.setdefault(model_code, (model_code, platform))
+                formatted_key = platform.replace('_platform', '').capitalize()
+                formatted_data[formatted_key.split('(')[0]] = [list(item.keys())[0] for item in entries or []]
 
-    def get_model_code_and_platform(self, model_name, data):
+            platforms = {
+                "platforms": formatted_data,
+                "platform_settings": settings
+            }
+
+            cls._models = models
+            cls._platforms = platforms
+            cls._platforms_json = json.dumps(platforms).encode("utf-8")
+            cls._mtimes = mtimes
+            cls._last_check = time.monotonic()
+
+    @classmethod
+    def reload_if_changed(cls):
+        now = time.monotonic()
+        if cls._mtimes is not None and now - cls._last_check < RELOAD_CHECK_INTERVAL:
+            return
+        cls._last_check = now
+        if cls._get_mtimes() != cls._mtimes:
+            cls.load_registry()
+
+    @staticmethod
+    def _get_mtimes():
+        return (os.path.getmtime(PLATFORM_CONFIG_PATH), os.path.getmtime(PLATFORM_SETTING_PATH))
+
+    def load_yaml_and_get_model(self, model_name):
+        self.reload_if_changed()
+        return self._models.get(model_name, (None, None))
+
+    def get_model_code_and_platform(self, model_name, data=None):
+        if data is None:
+            return self.load_yaml_and_get_model(model_name)
         for platform, models in data.items():
             for model in models:
                 if model_name in model:
                     return model[model_name], platform
         return None, None
-    
+
     def get_llm_platforms(self):
-        with open('../app/configs/llm_platform.yaml') as f:
-            data = yaml.load(f, Loader=SafeLoader)
-        
-        formatted_data = {}
-        for key, value in data.items():
-            formatted_key = key.replace('_platform', '').capitalize()
-            model_names = [list(item.keys())[0] for item in value]
-            formatted_data[formatted_key.split('(')[0]] = model_names
-            llm_platform_setting = self.get_platform_setting()
-        return {
-            "platforms": formatted_data,
-            "platform_settings": llm_platform_setting
-        }
-    
+        self.reload_if_changed()
+        return self._platforms
+
+    def get_llm_platforms_json(self):
+        self.reload_if_changed()
+        return self._platforms_json
 
     def get_platform_setting(self):
-        with open('../app/configs/llm_platform_setting.yaml') as f:
-            data = yaml.load(f, Loader=SafeLoader)
-        # return it as json
-        return data
\ No newline at end of file
+        self.reload_if_changed()
+        return self._platforms["platform_settings"]
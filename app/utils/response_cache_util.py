@@ -0,0 +1,231 @@
+import os
+import time
+import asyncio
+import hashlib
+import threading
+from collections import OrderedDict
+
+import numpy as np
+from dotenv import load_dotenv
+
+load_dotenv()
+
+
+class ResponseCache:
+    """
+    Optional cache of LLM responses, enabled with RESPONSE_CACHE=true.
+
+    Entries live in a scope (model, sampling params and whatever else the
+    answer depends on, e.g. the corpus version) and are looked up by the
+    normalized prompt text: first an exact match, then, if
+    RESPONSE_CACHE_SIMILARITY is above 0, the most similar cached prompt in
+    the same scope by embedding cosine similarity. Entries expire after
+    RESPONSE_CACHE_TTL seconds and the least recently used are evicted past
+    RESPONSE_CACHE_SIZE. Calls with temperature above
+    RESPONSE_CACHE_MAX_TEMPERATURE are not cached, and neither is the tool
+    agent, whose answers depend on what the tools return.
+
+    Prompts are only embedded once their scope is looked up again, so turns
+    whose scope never repeats cost no embedding call. Scopes can carry a
+    shared version (aversion/abump), kept in Redis when the Redis chat history
+    backend is in use, so that every worker stops serving answers once e.g.
+    the corpus changes.
+    """
+
+    enabled = os.getenv("RESPONSE_CACHE", "false").lower() == "true"
+    max_entries = int(os.getenv("RESPONSE_CACHE_SIZE", "1024"))
+    ttl = float(os.getenv("RESPONSE_CACHE_TTL", "3600"))
+    similarity_threshold = float(os.getenv("RESPONSE_CACHE_SIMILARITY", "0.95"))
+    max_temperature = float(os.getenv("RESPONSE_CACHE_MAX_TEMPERATURE", "0.3"))
+
+    _lock = threading.Lock()
+    _entries = OrderedDict()
+    _scopes = {}
+    _stats = {"hits": 0, "semantic_hits": 0, "misses": 0, "bypassed": 0, "stores": 0, "evictions": 0, "expired": 0}
+
+    _embeddings = None
+    _embedding_model = None
+
+    version_key_prefix = "response_cache:version:"
+    shared_versions = os.getenv("CHAT_HISTORY_BACKEND", "upstash") == "redis"
+    _versions = {}
+
+    @classmethod
+    def cacheable(cls, temperature) -> bool:
+        if not cls.enabled:
+            return False
+        try:
+            cold = temperature is not None and float(temperature) <= cls.max_temperature
+        except (TypeError, ValueError):
+            cold = False
+        if not cold:
+            with cls._lock:
+                cls._stats["bypassed"] += 1
+            return False
+        return True
+
+    @staticmethod
+    def normalize(text) -> str:
+        return " ".join(str(text).split()).casefold()
+
+    @staticmethod
+    def scope(*parts) -> str:
+        return hashlib.sha1(repr(parts).encode("utf-8")).hexdigest()
+
+    @classmethod
+    def _key(cls, scope: str, text) -> str:
+        return hashlib.sha1(f"{scope}\x00{cls.normalize(text)}".encode("utf-8")).hexdigest()
+
+    @classmethod
+    async def aget(cls, scope: str, text):
+        key = cls._key(scope, text)
+        with cls._lock:
+            entry = cls._live(key)
+            if entry is not None:
+                cls._stats["hits"] += 1
+                return entry["response"]
+            semantic = cls.similarity_threshold > 0 and bool(cls._scopes.get(scope))
+        if semantic:
+            vector = await cls._aembed(text)
+            if vector is not None:
+                await cls._aembed_entries(scope)
+                with cls._lock:
+                    entry = cls._most_similar(scope, vector)
+                    if entry is not None:
+                        cls._stats["semantic_hits"] += 1
+                        return entry["response"]
+        with cls._lock:
+            cls._stats["misses"] += 1
+        return None
+
+    @classmethod
+    async def aput(cls, scope: str, text, response) -> None:
+        key = cls._key(scope, text)
+        with cls._lock:
+            cls._drop(key)
+            cls._entries[key] = {
+                "scope": scope,
+                "text": str(text),
+                "response": response,
+                # embedded on the first semantic lookup in this scope
+                "vector": None,
+                "expires_at": time.monotonic() + cls.ttl,
+            }
+            cls._scopes.setdefault(scope, set()).add(key)
+            cls._stats["stores"] += 1
+            while len(cls._entries) > cls.max_entries:
+                cls._drop(next(iter(cls._entries)))
+                cls._stats["evictions"] += 1
+
+    @classmethod
+    async def aversion(cls, name: str) -> int:
+        """Current version of `name`, shared by all workers when Redis is configured."""
+        if cls.shared_versions:
+            try:
+                from utils.chat_history_util import RedisChatHistory
+                value = await RedisChatHistory.get_async_client().get(cls.version_key_prefix + name)
+                return int(value or 0)
+            except Exception as e:
+                print(f"Response cache version read failed, using the local one: {e}")
+        with cls._lock:
+            return cls._versions.get(name, 0)
+
+    @classmethod
+    async def abump(cls, name: str) -> None:
+        """Moves every scope built with aversion(name) to a fresh, empty one."""
+        if not cls.enabled:
+            return
+        with cls._lock:
+            cls._versions[name] = cls._versions.get(name, 0) + 1
+        if cls.shared_versions:
+            try:
+                from utils.chat_history_util import RedisChatHistory
+                await RedisChatHistory.get_async_client().incr(cls.version_key_prefix + name)
+            except Exception as e:
+                print(f"Response cache version bump failed: {e}")
+
+    @classmethod
+    def stats(cls):
+        with cls._lock:
+            hits = cls._stats["hits"] + cls._stats["semantic_hits"]
+            lookups = hits + cls._stats["misses"]
+            return dict(cls._stats, enabled=cls.enabled, entries=len(cls._entries),
+                        hit_rate=round(hits / lookups, 4) if lookups else 0.0)
+
+    @classmethod
+    def clear(cls):
+        with cls._lock:
+            cls._entries.clear()
+            cls._scopes.clear()
+
+    @classmethod
+    def _live(cls, key):
+        entry = cls._entries.get(key)
+        if entry is None:
+            return None
+        if entry["expires_at"] <= time.monotonic():
+            cls._drop(key)
+            cls._stats["expired"] += 1
+            return None
+        cls._entries.move_to_end(key)
+        return entry
+
+    @classmethod
+    def _drop(cls, key):
+        entry = cls._entries.pop(key, None)
+        if entry is None:
+            return
+        keys = cls._scopes.get(entry["scope"])
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del cls._scopes[entry["scope"]]
+
+    @classmethod
+    def _most_similar(cls, scope, vector):
+        keys = [key for key in list(cls._scopes.get(scope, ())) if cls._live(key) is not None]
+        keys = [key for key in keys if cls._entries[key]["vector"] is not None]
+        if not keys:
+            return None
+        matrix = np.stack([cls._entries[key]["vector"] for key in keys])
+        similarities = matrix @ vector
+        best = int(np.argmax(similarities))
+        if similarities[best] < cls.similarity_threshold:
+            return None
+        entry = cls._entries[keys[best]]
+        cls._entries.move_to_end(keys[best])
+        return entry
+
+    @classmethod
+    async def _aembed_entries(cls, scope):
+        with cls._lock:
+            pending = [(key, cls._entries[key]["text"]) for key in list(cls._scopes.get(scope, ()))
+                       if cls._entries[key]["vector"] is None]
+        if not pending:
+            return
+        vectors = await asyncio.gather(*(cls._aembed(text) for _, text in pending))
+        with cls._lock:
+            for (key, _), vector in zip(pending, vectors):
+                entry = cls._entries.get(key)
+                if entry is not None:
+                    entry["vector"] = vector
+
+    @classmethod
+    async def _aembed(cls, text):
+        try:
+            # imported here so the cache module doesn't pull in the vector store stack
+            from rag.vector_stores.embedding_cache import EmbeddingCache
+            if cls._embeddings is None:
+                from rag.vector_stores.embedded_model import EmbeddedModel, load_embedding_config
+                config = load_embedding_config()
+                cls._embedding_model = f"{config['platform']}:{config['model']}"
+                cls._embeddings = getattr(EmbeddedModel(), config['platform'])(config['model'])
+            vector = np.asarray(
+                await EmbeddingCache.aembed_query(cls._embeddings, cls._embedding_model, str(text)),
+                dtype=np.float32,
+            )
+        except Exception as e:
+            print(f"Response cache embedding failed: {e}")
+            return None
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else None
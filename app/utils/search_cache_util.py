@@ -0,0 +1,208 @@
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import inspect
+import functools
+import threading
+from collections import OrderedDict
+
+from dotenv import load_dotenv
+
+from utils.concurrency_util import ConcurrencyUtils
+
+load_dotenv()
+
+
+class SearchCache:
+    """
+    Shared cache of search provider results: an in-memory LRU in front of a
+    SQLite file (SEARCH_CACHE_PATH), so results survive restarts and are
+    shared by every worker on the host.
+
+    Entries are keyed by provider, normalized query and the remaining call
+    arguments. Each provider has its own TTL (SEARCH_CACHE_TTL_<PROVIDER>).
+    For SEARCH_CACHE_STALE seconds past the TTL a stale result is still
+    returned immediately while a background refresh fetches a new one.
+    Errors are never cached. Results are stored as JSON, so cached search
+    functions return plain dicts and lists rather than SDK response objects.
+    """
+
+    enabled = os.getenv("SEARCH_CACHE", "true").lower() == "true"
+    path = os.getenv("SEARCH_CACHE_PATH", "./search_cache.db")
+    max_entries = int(os.getenv("SEARCH_CACHE_SIZE", "2048"))
+    stale_window = float(os.getenv("SEARCH_CACHE_STALE", "300"))
+    default_ttl = float(os.getenv("SEARCH_CACHE_TTL", "3600"))
+    PROVIDER_TTLS = {
+        'google': 86400,
+        'wikipedia': 7 * 86400,
+    }
+
+    _lock = threading.Lock()
+    _entries = OrderedDict()
+    _refreshing = set()
+    _stats = {"hits": 0, "stale_hits": 0, "misses": 0, "refreshes": 0, "stores": 0, "errors": 0}
+    # the SQLite connection has its own lock, so lookups served from memory never wait on disk
+    _db_lock = threading.Lock()
+    _db = None
+
+    @classmethod
+    def ttl(cls, provider: str) -> float:
+        default = cls.PROVIDER_TTLS.get(provider, cls.default_ttl)
+        return float(os.getenv(f"SEARCH_CACHE_TTL_{provider.upper()}", default))
+
+    @staticmethod
+    def normalize(query) -> str:
+        return " ".join(str(query).split()).casefold()
+
+    @classmethod
+    def _key(cls, provider: str, query, params) -> str:
+        raw = f"{provider}\x00{cls.normalize(query)}\x00{params!r}"
+        return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+    @staticmethod
+    def is_error(result) -> bool:
+        if result is None:
+            return True
+        if isinstance(result, dict) and "error" in result:
+            return True
+        return isinstance(result, list) and bool(result) and isinstance(result[0], dict) and "error" in result[0]
+
+    @classmethod
+    def cached(cls, provider: str):
+        """Decorator for a search function whose first argument is the query."""
+        def decorator(func):
+            signature = inspect.signature(func)
+
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                bound = signature.bind(*args, **kwargs)
+                bound.apply_defaults()
+                query, *params = bound.arguments.values()
+                return cls.fetch(provider, query, lambda: func(*args, **kwargs), tuple(params))
+            return wrapper
+        return decorator
+
+    @classmethod
+    def fetch(cls, provider: str, query, search, params=()):
+        if not cls.enabled:
+            return search()
+        key = cls._key(provider, query, params)
+        now = time.time()
+        with cls._lock:
+            entry = cls._entries.get(key)
+            if entry is not None:
+                cls._entries.move_to_end(key)
+        if entry is None:
+            entry = cls._read(key)
+            if entry is not None:
+                with cls._lock:
+                    cls._remember(key, *entry)
+        with cls._lock:
+            if entry is not None:
+                value, fetched_at = entry
+                age = now - fetched_at
+                ttl = cls.ttl(provider)
+                if age <= ttl:
+                    cls._stats["hits"] += 1
+                    return value
+                if age <= ttl + cls.stale_window:
+                    cls._stats["stale_hits"] += 1
+                    if key not in cls._refreshing:
+                        cls._refreshing.add(key)
+                        ConcurrencyUtils.get_executor().submit(cls._refresh, key, provider, query, search)
+                    return value
+            cls._stats["misses"] += 1
+        value = search()
+        cls._store(key, provider, query, value)
+        return value
+
+    @classmethod
+    def stats(cls):
+        with cls._lock:
+            hits = cls._stats["hits"] + cls._stats["stale_hits"]
+            lookups = hits + cls._stats["misses"]
+            return dict(cls._stats, entries=len(cls._entries),
+                        hit_rate=round(hits / lookups, 4) if lookups else 0.0)
+
+    @classmethod
+    def close(cls):
+        with cls._db_lock:
+            if cls._db is not None:
+                cls._db.close()
+                cls._db = None
+
+    @classmethod
+    def _refresh(cls, key, provider, query, search):
+        try:
+            cls._store(key, provider, query, search())
+            with cls._lock:
+                cls._stats["refreshes"] += 1
+        except Exception as e:
+            print(f"Search cache refresh failed for {provider}: {e}")
+        finally:
+            with cls._lock:
+                cls._refreshing.discard(key)
+
+    @classmethod
+    def _store(cls, key, provider, query, value):
+        if cls.is_error(value):
+            with cls._lock:
+                cls._stats["errors"] += 1
+            return
+        fetched_at = time.time()
+        with cls._lock:
+            cls._remember(key, value, fetched_at)
+            cls._stats["stores"] += 1
+        try:
+            encoded = json.dumps(value)
+            with cls._db_lock:
+                db = cls._open()
+                db.execute(
+                    "INSERT OR REPLACE INTO search_cache (key, provider, query, value, fetched_at) VALUES (?, ?, ?, ?, ?)",
+                    (key, provider, cls.normalize(query), encoded, fetched_at),
+                )
+                db.commit()
+        except Exception as e:
+            print(f"Search cache write failed: {e}")
+
+    @classmethod
+    def _read(cls, key):
+        try:
+            with cls._db_lock:
+                row = cls._open().execute(
+                    "SELECT value, fetched_at FROM search_cache WHERE key = ?", (key,)
+                ).fetchone()
+            if row is None:
+                return None
+            return json.loads(row[0]), row[1]
+        except Exception as e:
+            print(f"Search cache read failed: {e}")
+            return None
+
+    @classmethod
+    def _remember(cls, key, value, fetched_at):
+        cls._entries[key] = (value, fetched_at)
+        cls._entries.move_to_end(key)
+        while len(cls._entries) > cls.max_entries:
+            cls._entries.popitem(last=False)
+
+    @classmethod
+    def _open(cls):
+        if cls._db is None:
+            directory = os.path.dirname(cls.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            db = sqlite3.connect(cls.path, check_same_thread=False)
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute(
+                "CREATE TABLE IF NOT EXISTS search_cache "
+                "(key TEXT PRIMARY KEY, provider TEXT, query TEXT, value BLOB, fetched_at REAL)"
+            )
+            # rows past every provider's TTL + stale window are never served again
+            oldest = time.time() - max([cls.default_ttl] + [cls.ttl(p) for p in cls.PROVIDER_TTLS]) - cls.stale_window
+            db.execute("DELETE FROM search_cache WHERE fetched_at < ?", (oldest,))
+            db.commit()
+            cls._db = db
+        return cls._db
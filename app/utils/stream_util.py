@@ -0,0 +1,226 @@
+import os
+import json
+import asyncio
+import contextlib
+from typing import Any, Dict, List
+
+from fastapi.responses import StreamingResponse
+from langchain_core.callbacks import AsyncCallbackHandler
+from langchain_core.outputs import LLMResult
+from dotenv import load_dotenv
+
+from utils.metrics_util import UsageCallbackHandler
+
+load_dotenv()
+
+
+class StreamUtils:
+    """
+    Turns a chat token generator into a framed Server-Sent Events stream.
+
+    The source is any async iterable yielding either token strings or event
+    dicts of the form {"event": "tool_start", "data": {...}}; a None item marks
+    the end of the stream. Tokens are coalesced into flush windows, a comment
+    heartbeat keeps idle connections open, and the upstream task is cancelled
+    as soon as the client goes away.
+    """
+
+    flush_interval = float(os.getenv("STREAM_FLUSH_INTERVAL", "0.05"))
+    flush_size = int(os.getenv("STREAM_FLUSH_SIZE", "64"))
+    heartbeat_interval = float(os.getenv("STREAM_HEARTBEAT_INTERVAL", "15"))
+    disconnect_poll_interval = float(os.getenv("STREAM_DISCONNECT_POLL_INTERVAL", "1"))
+    queue_size = int(os.getenv("STREAM_QUEUE_SIZE", "256"))
+
+    HEADERS = {
+        "Cache-Control": "no-cache",
+        "Connection": "keep-alive",
+        "X-Accel-Buffering": "no",
+    }
+
+    _END = object()
+
+    @staticmethod
+    def format_event(event: str, data) -> str:
+        return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+    @staticmethod
+    async def from_callbacks(run, handler):
+        """
+        Starts the coroutine `run`, whose LangChain callbacks go to `handler`,
+        and yields what the handler queues until the stream ends. The run is
+        cancelled if the consumer stops early.
+        """
+        task = asyncio.create_task(run)
+        # a run that fails (or returns) without ending the stream itself still ends it
+        task.add_done_callback(lambda t: handler.finish(None if t.cancelled() else t.exception()))
+        try:
+            while True:
+                item = await handler.queue.get()
+                if item is None:
+                    break
+                if isinstance(item, Exception):
+                    raise item
+                yield item
+            # e.g. the chain still saves the turn to memory after the answer
+            await task
+        finally:
+            if not task.done():
+                task.cancel()
+
+    @classmethod
+    def response(cls, request, source) -> StreamingResponse:
+        return StreamingResponse(cls.sse(request, source), media_type="text/event-stream", headers=cls.HEADERS)
+
+    @classmethod
+    async def sse(cls, request, source):
+        loop = asyncio.get_running_loop()
+        # bounded, so a slow client pauses the producer instead of buffering the whole answer
+        queue = asyncio.Queue(maxsize=cls.queue_size)
+
+        async def produce():
+            try:
+                async for item in source:
+                    if item is None:
+                        break
+                    await queue.put(item)
+                await queue.put(cls._END)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                await queue.put(e)
+
+        producer = asyncio.create_task(produce())
+        buffer = []
+        buffered = 0
+        flush_at = None
+        last_sent = loop.time()
+
+        def flush():
+            nonlocal buffer, buffered, flush_at, last_sent
+            chunk = "".join(buffer)
+            buffer, buffered, flush_at = [], 0, None
+            last_sent = loop.time()
+            return cls.format_event("token", {"content": chunk})
+
+        try:
+            while True:
+                if await request.is_disconnected():
+                    break
+
+                now = loop.time()
+                deadline = flush_at if flush_at is not None else last_sent + cls.heartbeat_interval
+                timeout = max(0.0, min(deadline - now, cls.disconnect_poll_interval))
+                try:
+                    item = await asyncio.wait_for(queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    now = loop.time()
+                    if flush_at is not None and now >= flush_at:
+                        yield flush()
+                    elif flush_at is None and now - last_sent >= cls.heartbeat_interval:
+                        last_sent = now
+                        yield ": keep-alive\n\n"
+                    continue
+
+                if isinstance(item, str):
+                    if not item:
+                        continue
+                    buffer.append(item)
+                    buffered += len(item)
+                    if flush_at is None:
+                        flush_at = loop.time() + cls.flush_interval
+                    if buffered >= cls.flush_size:
+                        yield flush()
+                    continue
+
+                if buffer:
+                    yield flush()
+
+                if item is cls._END:
+                    yield cls.format_event("done", {})
+                    break
+                if isinstance(item, Exception):
+                    yield cls.format_event("error", {"message": str(item)})
+                    break
+                if isinstance(item, dict) and "event" in item:
+                    last_sent = loop.time()
+                    yield cls.format_event(item["event"], item.get("data", {}))
+        finally:
+            producer.cancel()
+            with contextlib.suppress(asyncio.CancelledError, Exception):
+                await producer
+            aclose = getattr(source, "aclose", None)
+            if aclose is not None:
+                with contextlib.suppress(Exception):
+                    await aclose()
+
+
+class StreamCallbackHandler(AsyncCallbackHandler):
+    """
+    LangChain callbacks -> StreamUtils items for one streamed request.
+
+    Tokens are queued as they arrive, tool runs as tool_start events, and the
+    token usage of the whole run as a usage event just before the end marker.
+    Without `agent` the stream ends with the LLM call; with it, only the
+    "action_input" of the conversational agent's "Final Answer" is streamed
+    and the stream ends there (or when the run itself finishes).
+    """
+
+    def __init__(self, agent: bool = False):
+        self.agent = agent
+        self.queue = asyncio.Queue()
+        self.usage = UsageCallbackHandler()
+        self.content = ""
+        self.final_answer = False
+        self.streamed = False
+        self.finished = False
+
+    async def on_llm_start(self, serialized: Dict[str, Any], prompts: List[str], **kwargs: Any) -> None:
+        self.usage.on_llm_start(serialized, prompts, **kwargs)
+
+    async def on_chat_model_start(self, serialized: Dict[str, Any], messages: List[List[Any]], **kwargs: Any) -> None:
+        self.usage.on_chat_model_start(serialized, messages, **kwargs)
+
+    async def on_llm_new_token(self, token: str, **kwargs: Any) -> None:
+        if not token or self.finished:
+            return
+        if not self.agent:
+            self.streamed = True
+            self.queue.put_nowait(token)
+            return
+        self.content += token
+        if self.final_answer:
+            if '"action_input": "' in self.content and token not in ['"', "}"]:
+                self.queue.put_nowait(token)
+        elif "Final Answer" in self.content:
+            self.final_answer = True
+            self.content = ""
+
+    async def on_tool_start(self, serialized: Dict[str, Any], input_str: str, **kwargs: Any) -> None:
+        self.queue.put_nowait({"event": "tool_start", "data": {"tool": (serialized or {}).get("name"), "input": input_str}})
+
+    async def on_llm_end(self, response: LLMResult, **kwargs: Any) -> None:
+        self.usage.on_llm_end(response, **kwargs)
+        if not self.agent:
+            if not self.streamed:
+                # the model didn't stream, send its answer in one piece
+                text = "".join(g.text for gens in response.generations for g in gens)
+                if text:
+                    self.queue.put_nowait(text)
+            self.finish()
+        elif self.final_answer:
+            self.finish()
+        else:
+            self.content = ""
+
+    async def on_llm_error(self, error: BaseException, **kwargs: Any) -> None:
+        self.finish(error)
+
+    def finish(self, error: BaseException = None) -> None:
+        """Queues the error (if any), the usage event and the end marker, once."""
+        if self.finished:
+            return
+        self.finished = True
+        if error is not None:
+            self.queue.put_nowait(error if isinstance(error, Exception) else Exception(str(error)))
+        self.queue.put_nowait({"event": "usage", "data": dict(self.usage.usage, estimated=self.usage.estimated)})
+        self.queue.put_nowait(None)
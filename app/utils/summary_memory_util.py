@@ -0,0 +1,121 @@
+import asyncio
+import threading
+from typing import Any, ClassVar, Dict, List
+
+from langchain.memory.chat_memory import BaseChatMemory
+from langchain.memory.prompt import SUMMARY_PROMPT
+from langchain_core.messages import BaseMessage, SystemMessage, get_buffer_string
+
+from utils.concurrency_util import ConcurrencyUtils
+from utils.metrics_util import estimate_tokens
+
+
+class RollingSummaryMemory(BaseChatMemory):
+    """
+    Summary + buffer memory that folds in only the turns it evicts.
+
+    The running summary and the number of messages it already covers are kept
+    in `summary_store` next to the session. Each load returns the summary plus
+    the newest messages that fit in `max_token_limit` (counted locally, not by
+    the LLM). Messages that fall out of that budget are summarized in the
+    background and merged into the stored summary; the current response never
+    waits on the summarizer.
+    """
+
+    llm: Any
+    session_id: str
+    summary_store: Any
+    max_token_limit: int = 1000
+    memory_key: str = "history"
+    human_prefix: str = "Human"
+    ai_prefix: str = "AI"
+
+    _lock: ClassVar[threading.Lock] = threading.Lock()
+    _in_progress: ClassVar[set] = set()
+    _tasks: ClassVar[set] = set()
+
+    @property
+    def memory_variables(self) -> List[str]:
+        return [self.memory_key]
+
+    def load_memory_variables(self, inputs: Dict[str, Any]) -> Dict[str, Any]:
+        summary, summarized = self.summary_store.get(self.session_id)
+        get_after = getattr(self.chat_memory, "get_messages_after", None)
+        messages = get_after(summarized) if get_after else self.chat_memory.messages[summarized:]
+        evicted, buffer = self._split(summary, messages)
+        if evicted and self._claim():
+            ConcurrencyUtils.get_executor().submit(self._summarize, summary, summarized, evicted)
+        return self._format(summary, buffer)
+
+    async def aload_memory_variables(self, inputs: Dict[str, Any]) -> Dict[str, Any]:
+        summary, summarized = await self.summary_store.aget(self.session_id)
+        get_after = getattr(self.chat_memory, "aget_messages_after", None)
+        if get_after:
+            messages = await get_after(summarized)
+        else:
+            messages = (await self.chat_memory.aget_messages())[summarized:]
+        evicted, buffer = self._split(summary, messages)
+        if evicted and self._claim():
+            task = asyncio.create_task(self._asummarize(summary, summarized, evicted))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+        return self._format(summary, buffer)
+
+    def _split(self, summary: str, messages: List[BaseMessage]):
+        budget = self.max_token_limit - estimate_tokens(summary)
+        used = 0
+        keep = 0
+        for message in reversed(messages):
+            cost = estimate_tokens(message.content)
+            # the newest message always stays, even if it alone is over budget
+            if keep and used + cost > budget:
+                break
+            used += cost
+            keep += 1
+        split_at = len(messages) - keep
+        return messages[:split_at], messages[split_at:]
+
+    def _format(self, summary: str, buffer: List[BaseMessage]) -> Dict[str, Any]:
+        if summary:
+            buffer = [SystemMessage(content=summary)] + buffer
+        if self.return_messages:
+            return {self.memory_key: buffer}
+        return {self.memory_key: get_buffer_string(buffer, human_prefix=self.human_prefix, ai_prefix=self.ai_prefix)}
+
+    def _claim(self) -> bool:
+        # one summarization per session at a time, the next load picks up whatever is left
+        with self._lock:
+            if self.session_id in self._in_progress:
+                return False
+            self._in_progress.add(self.session_id)
+            return True
+
+    def _release(self) -> None:
+        with self._lock:
+            self._in_progress.discard(self.session_id)
+
+    def _prompt(self, summary: str, evicted: List[BaseMessage]) -> str:
+        new_lines = get_buffer_string(evicted, human_prefix=self.human_prefix, ai_prefix=self.ai_prefix)
+        return SUMMARY_PROMPT.format(summary=summary, new_lines=new_lines)
+
+    @staticmethod
+    def _text(result) -> str:
+        return getattr(result, "content", result).strip()
+
+    def _summarize(self, summary: str, summarized: int, evicted: List[BaseMessage]) -> None:
+        try:
+            new_summary = self._text(self.llm.invoke(self._prompt(summary, evicted)))
+            self.summary_store.set(self.session_id, new_summary, summarized + len(evicted))
+        except Exception as e:
+            print(f"Summarization failed for session {self.session_id}: {e}")
+        finally:
+            self._release()
+
+    async def _asummarize(self, summary: str, summarized: int, evicted: List[BaseMessage]) -> None:
+        try:
+            new_summary = self._text(await self.llm.ainvoke(self._prompt(summary, evicted)))
+            await self.summary_store.aset(self.session_id, new_summary, summarized + len(evicted))
+        except Exception as e:
+            print(f"Summarization failed for session {self.session_id}: {e}")
+        finally:
+            self._release()